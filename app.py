@@ -1,26 +1,118 @@
+import asyncio
+import hashlib
+import json
 import os
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
+from functools import cache
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Annotated, cast
+from uuid import uuid4
 
+import pandas as pd
 import requests
 import uvicorn
-from fastapi import APIRouter, FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from pydantic_core import Url
 
-from data_handling.complexity_reduction import reduce_dataframe
-from data_handling.data_transformation import add_counts, add_states, transform_dict
-from data_handling.data_validation import validate_data
-from helpers import config_loader
-from model.input_model import InputBody
-from model.response_model import DiscoveryResponse
-from retrieval.metrics_retrieval import get_metrics
-from retrieval.process_model_retrieval import get_process_model
+from data_handling.activity_time_index import ActivityTimeIndex, build_activity_time_index
+from data_handling.columnar_storage import spill_csv
+from data_handling.dataset_store import DatasetStore, select_case_ids
+from data_handling.edge_index import EdgeIndex
+from data_handling.encoded_log import EncodedLog, encode_log
+from data_handling.event_log_import import import_event_log
+from data_handling.log_filter import filter_log
+from data_handling.request_parsing import parse_dataset_body, parse_input_body
+from data_handling.shared_log import share_log
+from helpers import config_loader, warm_up
+from helpers.admission_control import (
+    AdmissionController,
+    AdmissionMetrics,
+    AdmissionRejected,
+    RequestCost,
+    estimate_cost,
+)
+from helpers.cancellation import (
+    CancellationMetrics,
+    CancellationStatistics,
+    CancellationToken,
+    Cancelled,
+    cancellation_scope,
+)
+from helpers.single_flight import SingleFlight, SingleFlightMetrics
+from helpers.worker_pool import WorkerPool, WorkerPoolMetrics
+from model.input_model import (
+    ColumnMapping,
+    DatasetBody,
+    FileInputBody,
+    FilterParameters,
+    InputBody,
+    InputParameters,
+    OutOfCoreInputBody,
+)
+from model.response_model import (
+    DiscoveryResponse,
+    EdgeCases,
+    EdgeDurations,
+    Graph,
+    GraphLayout,
+    Metrics,
+    NodeCases,
+    SamplingSummary,
+    VariantCompletions,
+    VariantPrefix,
+)
+from retrieval.case_sampling import CaseSample, sample_cases
+from retrieval.drill_down import edge_cases, edge_durations, node_cases
+from retrieval.graph_layout import layout_graph
+from retrieval.graph_simplification import simplify_graph
+from retrieval.out_of_core_retrieval import get_metrics_out_of_core, get_process_model_out_of_core
+from retrieval.pipeline import run_pipeline, run_pipeline_on_shared_log
+from retrieval.variant_trie import VariantTrie, variant_completions, variant_prefix
 
 
 class ResponseReceived(BaseModel):
     ok: bool
 
 
+class UploadResponse(BaseModel):
+    path: str
+
+
+class DatasetResponse(BaseModel):
+    dataset_id: str
+    n_events: int
+    n_traces: int
+
+
+class ServiceMetrics(BaseModel):
+    admission: AdmissionMetrics
+    coalescing: SingleFlightMetrics
+    cancellation: CancellationMetrics
+    worker_pool: WorkerPoolMetrics | None = None
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    if config_loader.CONFIG.get("warm_up", True) and not warm_up.is_ready():
+        threading.Thread(target=warm_up.warm_up, daemon=True).start()
+    worker_pool = _get_worker_pool()
+    if worker_pool is not None:
+        threading.Thread(target=worker_pool.start, daemon=True).start()
+    yield
+    if worker_pool is not None:
+        worker_pool.shutdown()
+
+
 app = FastAPI(title="PROVIS onco-miner API",
+              lifespan=lifespan,
               description="This API is part of a project"
                           " to provide an process model based view on cancer patient data.",
               version="1.0.0",
@@ -36,6 +128,24 @@ app = FastAPI(title="PROVIS onco-miner API",
 process_model_callback_router = APIRouter()
 
 REQUEST_TIMEOUT_SECONDS = 60
+# Interval in which the connection of a client is checked while its discovery request is calculated.
+DISCONNECT_POLL_SECONDS = 0.5
+
+single_flight = SingleFlight()
+
+cancellation_statistics = CancellationStatistics()
+
+dataset_store = DatasetStore(Path(config_loader.CONFIG["dataset_directory"]),
+                             build_indexes=config_loader.CONFIG["dataset_indexes"],
+                             max_open=int(config_loader.CONFIG.get("dataset_cache_size", 16)))
+
+_admission_settings = config_loader.CONFIG["admission_control"]
+admission_controller = AdmissionController(
+    memory_budget=int(_admission_settings["memory_budget_mb"]) * 2 ** 20,
+    cpu_slots=int(_admission_settings["cpu_slots"]),
+    max_queue_length=int(_admission_settings["max_queue_length"]),
+    queue_timeout_seconds=float(_admission_settings["queue_timeout_seconds"]),
+)
 
 
 @process_model_callback_router.post("{$callback_url}", response_model=ResponseReceived)
@@ -43,54 +153,582 @@ def distribute_process_model(process_model: DiscoveryResponse) -> ResponseReceiv
     return ResponseReceived(ok=True)
 
 
-@app.post("/discover", callbacks=process_model_callback_router.routes)
-def discover_process_model(request: InputBody) -> DiscoveryResponse:
+def _request_body_schema(model: type[BaseModel]) -> dict[str, object]:
+    """
+    Documents the body of an endpoint that reads the raw request, referencing the schemas of the other endpoints.
+    """
+    schema = model.model_json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
+
+
+@app.post("/discover", callbacks=process_model_callback_router.routes,
+          openapi_extra=_request_body_schema(InputBody))
+async def discover_process_model(request: Request) -> DiscoveryResponse:
     """
-    API request to calculate a Process model and metrics based on the given data.
-    :param request: Input data as well as necessary parameters and an id that will be returned with the result.
+    API request to calculate a Process model and metrics based on the given data or a stored dataset.
+    The body has the structure of InputBody. It is parsed without validating each event through pydantic,
+    because that dominates the time of requests with many events.
+    :param request: Input data or the id of a stored dataset with an optional selection of cases,
+    as well as necessary parameters and an id that will be returned with the result.
     :return: Calculated Process Model, metrics, creation time and id provided in the request.
     """
-    params = request.parameters
+    token = CancellationToken()
+    body = await request.body()
+    watcher = asyncio.create_task(_cancel_on_disconnect(request, token))
     try:
-        validate_data(request.data)
+        return await run_in_threadpool(_discover, body, token)
+    finally:
+        watcher.cancel()
+
+
+async def _cancel_on_disconnect(request: Request, token: CancellationToken) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+    token.cancel("disconnected")
+
+
+@contextmanager
+def _parse_errors() -> Iterator[None]:
+    """
+    Answers invalid envelopes of a raw request body like pydantic validated bodies and invalid data with 400.
+    """
+    try:
+        yield
+    except ValidationError as e:
+        raise RequestValidationError(e.errors()) from e
     except (ValueError, TypeError) as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
-    if params.add_counts and params.state_changing_events:
-        raise HTTPException(status_code=400, detail="Can not have states and counts at the same time.")
-    pm_event_log = transform_dict(request.data)
-    if params.reduce_complexity_by:
-        pm_event_log = reduce_dataframe(pm_event_log, 1 - params.reduce_complexity_by)
-    if params.add_counts:
-        pm_event_log = add_counts(pm_event_log)
-    elif params.state_changing_events:
-        pm_event_log = add_states(pm_event_log, params.state_changing_events)
-    graph = get_process_model(pm_event_log, params.start_node_name, params.end_node_name)
-    metrics = get_metrics(pm_event_log, params.active_events, params.n_top_variants)
+
+
+def _discover(body: bytes, token: CancellationToken) -> DiscoveryResponse:
+    with _parse_errors():
+        request, data = parse_input_body(body)
+    params = request.parameters
+    _check_parameters(params)
+    token.set_timeout(_timeout_seconds(params))
+    key = _request_key(request, data)
+    with _cancellable(token):
+        while True:
+            try:
+                # Identical requests arriving while one of them is calculated share its result.
+                (graph, metrics, sampling_summary), _ = single_flight.run(
+                    key, lambda: _calculate(request, data, token), token)
+                break
+            except Cancelled:
+                # Unless this request was cancelled, the calculation it shared belonged to a cancelled request.
+                if token.reason() is not None:
+                    raise
     creation_time = str(datetime.now())
     response = DiscoveryResponse(graph=graph, metrics=metrics, created=creation_time,
-                                 id=None if request.id is None else str(request.id))
-    if request.callback_url is not None:
+                                 id=None if request.id is None else str(request.id), sampling=sampling_summary,
+                                 layout=_layout(graph, params))
+    _send_callback(response, request.callback_url)
+    return response
+
+
+def _check_parameters(params: InputParameters) -> None:
+    if params.add_counts and params.state_changing_events:
+        raise HTTPException(status_code=400, detail="Can not have states and counts at the same time.")
+    if params.max_count is not None and params.max_count < 1:
+        raise HTTPException(status_code=400, detail="max_count has to be at least 1.")
+    _check_simplification(params)
+    _check_layout(params)
+    sampling = params.sampling
+    if sampling is not None and not (0 < sampling.fraction <= 1 and 0 < sampling.confidence < 1):
+        raise HTTPException(status_code=400, detail="The sampling fraction has to be in (0, 1] "
+                                                    "and the confidence in (0, 1).")
+    _check_timeout(params)
+
+
+def _check_timeout(params: InputParameters) -> None:
+    if params.timeout_seconds is not None and params.timeout_seconds <= 0:
+        raise HTTPException(status_code=400, detail="timeout_seconds has to be positive.")
+
+
+def _timeout_seconds(params: InputParameters) -> float | None:
+    if params.timeout_seconds is not None:
+        return params.timeout_seconds
+    default: float | None = config_loader.CONFIG.get("default_timeout_seconds")
+    return default
+
+
+@contextmanager
+def _cancellable(token: CancellationToken) -> Iterator[None]:
+    """
+    Makes the token the one checked at the checkpoints of the calculation and answers cancelled requests.
+    """
+    try:
+        with cancellation_scope(token):
+            yield
+    except Cancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail) from e
+
+
+@contextmanager
+def _recorded(n_events: int) -> Iterator[None]:
+    """
+    Records the time of a calculation for the statistics of completed and cancelled calculations.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Cancelled as e:
+        cancellation_statistics.record_cancelled(e.reason, n_events, time.perf_counter() - started)
+        raise
+    cancellation_statistics.record_completed(n_events, time.perf_counter() - started)
+
+
+def _request_key(request: InputBody, data: pd.DataFrame | None) -> str:
+    """
+    Hashes everything the result of a discovery request depends on: its events, parameters and the config.
+    """
+    digest = hashlib.sha256()
+    digest.update(request.parameters.model_dump_json().encode())
+    digest.update(json.dumps([request.dataset_id, request.case_ids]).encode())
+    digest.update(json.dumps(config_loader.CONFIG, sort_keys=True, default=str).encode())
+    if data is not None:
+        digest.update(json.dumps(list(data.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _calculate(request: InputBody, data: pd.DataFrame | None, token: CancellationToken
+               ) -> tuple[Graph, Metrics, SamplingSummary | None]:
+    events, sample, time_index = _load_event_log(request, data)
+    return _calculate_admitted(events, request.parameters, time_index, sample, token)
+
+
+def _calculate_admitted(events: pd.DataFrame | EncodedLog, params: InputParameters,
+                        time_index: ActivityTimeIndex | None, sample: CaseSample | None, token: CancellationToken
+                        ) -> tuple[Graph, Metrics, SamplingSummary | None]:
+    """
+    Runs the pipeline once the admission control admitted the estimated cost of the request.
+    """
+    if isinstance(events, EncodedLog):
+        n_events, n_activities = events.n_events, events.n_activities
+    else:
+        n_events, n_activities = len(events), int(events["concept:name"].nunique())
+    cost = estimate_cost(n_events, n_activities, add_counts=params.add_counts,
+                         n_state_activities=len(set(params.state_changing_events or [])))
+    with _admitted(cost, token), _recorded(n_events):
+        return _execute_pipeline(events, params, time_index, sample, token)
+
+
+@cache
+def _get_worker_pool() -> WorkerPool | None:
+    settings = config_loader.CONFIG.get("worker_pool", {})
+    if int(settings.get("workers", 0)) < 1:
+        return None
+    return WorkerPool(int(settings["workers"]), int(settings.get("max_jobs_per_worker", 100)),
+                      initializer=warm_up.warm_up)
+
+
+def _execute_pipeline(events: pd.DataFrame | EncodedLog, params: InputParameters,
+                      time_index: ActivityTimeIndex | None, sample: CaseSample | None, token: CancellationToken
+                      ) -> tuple[Graph, Metrics, SamplingSummary | None]:
+    """
+    Runs the pipeline in the worker pool if one is configured, otherwise in the thread of the request.
+    Events and the cancellation token are handed over to the workers in shared memory blocks,
+    so a cancelled calculation stops in the worker and frees it for the next request.
+    """
+    worker_pool = _get_worker_pool()
+    if worker_pool is None:
+        return run_pipeline(events, params, time_index, sample)
+    block, handle = share_log(events if isinstance(events, EncodedLog) else encode_log(events))
+    try:
+        sample_design = None if sample is None else (sample.strata, sample.population_sizes, sample.sample_sizes)
+        with token.shared() as cancellation:
+            result: tuple[Graph, Metrics, SamplingSummary | None] = worker_pool.run(
+                run_pipeline_on_shared_log, handle, params, time_index, sample_design, cancellation)
+        return result
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _check_simplification(params: InputParameters) -> None:
+    if params.simplification is not None and any(
+            limit is not None and limit < 1 for limit in params.simplification.model_dump().values()):
+        raise HTTPException(status_code=400, detail="The limits of the simplification have to be at least 1.")
+
+
+def _check_layout(params: InputParameters) -> None:
+    layout = params.layout
+    if layout is not None and not (layout.layer_spacing > 0 and layout.node_spacing > 0
+                                   and layout.ordering_sweeps >= 0):
+        raise HTTPException(status_code=400, detail="The spacings of the layout have to be positive "
+                                                    "and ordering_sweeps must not be negative.")
+
+
+def _layout(graph: Graph, params: InputParameters) -> GraphLayout | None:
+    if params.layout is None:
+        return None
+    return layout_graph(graph, params.layout, params.start_node_name, params.end_node_name)
+
+
+@contextmanager
+def _admitted(cost: RequestCost, token: CancellationToken) -> Iterator[None]:
+    try:
+        with admission_controller.admit(cost, token):
+            yield
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": "1"}) from e
+
+
+def _load_event_log(request: InputBody, data: pd.DataFrame | None
+                    ) -> tuple[pd.DataFrame | EncodedLog, CaseSample | None, ActivityTimeIndex | None]:
+    """
+    Loads the events of a request and applies its filters and sampling.
+    Events are only decoded into a dataframe where the pipeline runs.
+    :param request: Request without its data.
+    :param data: Validated data of the request, if it does not reference a stored dataset.
+    :return: Events, the case sample they were drawn with, if any, and an activity time index of all events
+    that are left after filtering, if one is available.
+    """
+    params = request.parameters
+    time_index: ActivityTimeIndex | None = None
+    if request.dataset_id is not None:
+        try:
+            log = dataset_store.load(request.dataset_id)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0])) from e
+        if request.case_ids is not None:
+            try:
+                log = select_case_ids(log, request.case_ids, dataset_store.case_id_index(request.dataset_id))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+        elif params.filters is None:
+            time_index = dataset_store.time_index(request.dataset_id)
+    else:
+        data = cast(pd.DataFrame, data)
+        if params.filters is None and params.sampling is None:
+            return data, None, None
+        log = encode_log(data)
+    return _select_events(log, params, time_index)
+
+
+def _select_events(log: EncodedLog, params: InputParameters, time_index: ActivityTimeIndex | None
+                   ) -> tuple[EncodedLog, CaseSample | None, ActivityTimeIndex | None]:
+    """
+    Applies the filters and the sampling of a request.
+    :param log: Events of the request.
+    :param params: Parameters of the request.
+    :param time_index: Activity time index of all events, if one is available.
+    :return: Events, the case sample they were drawn with, if any, and an activity time index of all events
+    that are left after filtering, if one is available.
+    """
+    log = _filtered(log, params.filters)
+    if params.sampling is None:
+        return log, None, time_index
+    # Active events are counted on all events, so they stay exact when only a sample of the cases is processed.
+    if time_index is None:
+        time_index = build_activity_time_index(log)
+    sample = sample_cases(log, params.sampling)
+    return sample.log, sample, time_index
+
+
+def _filtered(log: EncodedLog, filters: FilterParameters | None) -> EncodedLog:
+    if filters is None:
+        return log
+    log = filter_log(log, filters)
+    if log.n_events == 0:
+        raise HTTPException(status_code=400, detail="No events are left after filtering.")
+    return log
+
+
+def _send_callback(response: DiscoveryResponse, callback_url: Url | None) -> None:
+    if callback_url is not None:
         try:
             requests.post(
-                url=str(request.callback_url),
+                url=str(callback_url),
                 json=response.model_dump(mode="python"),
                 timeout=REQUEST_TIMEOUT_SECONDS,
             )
         except requests.exceptions.RequestException as e:
             raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+def _resolve_data_path(path: str) -> Path:
+    data_directory = Path(config_loader.CONFIG["out_of_core"]["data_directory"]).resolve()
+    resolved_path = (data_directory / path).resolve()
+    if not resolved_path.is_relative_to(data_directory):
+        raise HTTPException(status_code=400, detail="Path has to be inside the data directory.")
+    if not resolved_path.is_file():
+        raise HTTPException(status_code=404, detail=f"File {path} does not exist.")
+    return resolved_path
+
+
+@app.post("/uploads")
+async def upload_event_log(request: Request) -> UploadResponse:
+    """
+    API request to store a csv event log in the data directory, streaming the request body to disk.
+    Uploads larger than the configured maximum size are aborted and the partially written file is deleted.
+    :param request: Request with the csv file as body.
+    :return: Path of the stored file that can be used with /discover/out-of-core.
+    """
+    settings = config_loader.CONFIG["out_of_core"]
+    max_upload_mb = int(settings.get("max_upload_mb", 1024))
+    too_large = HTTPException(status_code=413, detail=f"The upload exceeds the limit of {max_upload_mb} MB.")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_upload_mb * 2 ** 20:
+        raise too_large
+    data_directory = Path(settings["data_directory"])
+    data_directory.mkdir(parents=True, exist_ok=True)
+    path = f"{uuid4().hex}.csv"
+    size = 0
+    try:
+        with (data_directory / path).open("wb") as file:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > max_upload_mb * 2 ** 20:
+                    raise too_large
+                file.write(chunk)
+    except BaseException:
+        (data_directory / path).unlink(missing_ok=True)
+        raise
+    return UploadResponse(path=path)
+
+
+@app.post("/discover/out-of-core", callbacks=process_model_callback_router.routes)
+def discover_process_model_out_of_core(request: OutOfCoreInputBody) -> DiscoveryResponse:
+    """
+    API request to calculate a Process model and metrics based on a csv event log in the data directory.
+    The events are spilled to memory-mapped files and processed in chunks of cases,
+    so the memory used stays within the configured budget.
+    :param request: Path of the event log, necessary parameters and an id that will be returned with the result.
+    :return: Calculated Process model, metrics, creation time and id provided in the request.
+    """
+    params = request.parameters
+    if (params.reduce_complexity_by or params.add_counts or params.state_changing_events or params.filters
+            or params.sampling):
+        raise HTTPException(status_code=400, detail="Complexity reduction, counts, states, filters and sampling "
+                                                    "are not supported in out-of-core mode.")
+    _check_simplification(params)
+    _check_layout(params)
+    _check_timeout(params)
+    token = CancellationToken()
+    token.set_timeout(_timeout_seconds(params))
+    settings = config_loader.CONFIG["out_of_core"]
+    source = _resolve_data_path(request.path)
+    memory_budget = int(settings["memory_budget_mb"]) * 2 ** 20
+    Path(settings["spill_directory"]).mkdir(parents=True, exist_ok=True)
+    with _cancellable(token), _admitted(RequestCost(memory=memory_budget), token), \
+            TemporaryDirectory(dir=settings["spill_directory"]) as spill_directory:
+        try:
+            log = spill_csv(source, Path(spill_directory) / "log", memory_budget)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        with _recorded(log.n_events):
+            graph = get_process_model_out_of_core(log, params.start_node_name, params.end_node_name,
+                                                  memory_budget, Path(spill_directory) / "graph")
+            if params.simplification is not None:
+                graph = simplify_graph(graph, params.simplification, params.start_node_name,
+                                       params.end_node_name)
+            metrics = get_metrics_out_of_core(log, params.active_events, params.n_top_variants,
+                                              memory_budget, Path(spill_directory) / "metrics")
+    creation_time = str(datetime.now())
+    response = DiscoveryResponse(graph=graph, metrics=metrics, created=creation_time,
+                                 id=None if request.id is None else str(request.id), layout=_layout(graph, params))
+    _send_callback(response, request.callback_url)
     return response
 
 
+@app.post("/discover/file", callbacks=process_model_callback_router.routes)
+def discover_process_model_from_file(request: FileInputBody) -> DiscoveryResponse:
+    """
+    API request to calculate a Process model and metrics based on a csv or xes event log in the data directory.
+    The file is parsed in chunks straight into memory-mapped columnar files, so parsing needs bounded memory,
+    and the events are then processed like the data of /discover.
+    :param request: Path of the event log, its format and column mapping, necessary parameters
+    and an id that will be returned with the result.
+    :return: Calculated Process model, metrics, creation time and id provided in the request.
+    """
+    params = request.parameters
+    _check_parameters(params)
+    token = CancellationToken()
+    token.set_timeout(_timeout_seconds(params))
+    settings = config_loader.CONFIG["out_of_core"]
+    source = _resolve_data_path(request.path)
+    column_mapping = request.column_mapping or ColumnMapping.model_validate(
+        config_loader.CONFIG.get("file_import", {}).get("column_mapping", {}))
+    Path(settings["spill_directory"]).mkdir(parents=True, exist_ok=True)
+    with TemporaryDirectory(dir=settings["spill_directory"]) as spill_directory, _cancellable(token):
+        try:
+            log = import_event_log(source, Path(spill_directory), int(settings["memory_budget_mb"]) * 2 ** 20,
+                                   request.format, column_mapping)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        events, sample, time_index = _select_events(log, params, None)
+        graph, metrics, sampling_summary = _calculate_admitted(events, params, time_index, sample, token)
+    creation_time = str(datetime.now())
+    response = DiscoveryResponse(graph=graph, metrics=metrics, created=creation_time,
+                                 id=None if request.id is None else str(request.id), sampling=sampling_summary,
+                                 layout=_layout(graph, params))
+    _send_callback(response, request.callback_url)
+    return response
+
+
+@app.post("/datasets", openapi_extra=_request_body_schema(DatasetBody))
+async def create_dataset(request: Request) -> DatasetResponse:
+    """
+    API request to store data once, so it can be referenced by its id in later requests to /discover.
+    The body has the structure of DatasetBody and is parsed like the body of /discover.
+    :param request: Input data in the same format as for /discover.
+    :return: Id of the stored dataset and its size.
+    """
+    return await run_in_threadpool(_create_dataset, await request.body())
+
+
+def _create_dataset(body: bytes) -> DatasetResponse:
+    with _parse_errors():
+        data = parse_dataset_body(body)
+    # Encoding the events and building the indexes of a dataset takes about as much memory as a discovery request.
+    cost = estimate_cost(len(data), int(data["concept:name"].nunique()))
+    with _admitted(cost, CancellationToken()):
+        log = encode_log(data)
+        dataset_id = dataset_store.add(log)
+    return DatasetResponse(dataset_id=dataset_id, n_events=log.n_events, n_traces=log.n_cases)
+
+
+@app.delete("/datasets/{dataset_id}")
+def delete_dataset(dataset_id: str) -> ResponseReceived:
+    try:
+        dataset_store.delete(dataset_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0])) from e
+    return ResponseReceived(ok=True)
+
+
+def _indexed_dataset(dataset_id: str) -> tuple[EncodedLog, EdgeIndex]:
+    try:
+        return dataset_store.load(dataset_id), dataset_store.edge_index(dataset_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0])) from e
+
+
+@app.get("/datasets/{dataset_id}/edges/cases")
+def get_edge_cases(dataset_id: str, source: str, target: str, start_node_name: str = "start_node",
+                   end_node_name: str = "end_node", limit: int | None = None) -> EdgeCases:
+    """
+    API request to drill down from an edge of the graph of a stored dataset to the cases traversing it.
+    :param dataset_id: Id of the dataset.
+    :param source: Activity or start node the edge starts at.
+    :param target: Activity or end node the edge ends at.
+    :param start_node_name: Name of the start node, as in the parameters of the discovery request.
+    :param end_node_name: Name of the end node, as in the parameters of the discovery request.
+    :param limit: Maximum number of cases that are returned.
+    :return: Cases with the positions of the edge within them.
+    """
+    log, index = _indexed_dataset(dataset_id)
+    try:
+        return edge_cases(log, index, source, target, start_node_name, end_node_name, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@app.get("/datasets/{dataset_id}/edges/durations")
+def get_edge_durations(dataset_id: str, source: str, target: str) -> EdgeDurations:
+    """
+    API request to drill down from an edge of the graph of a stored dataset to the distribution of its durations.
+    :param dataset_id: Id of the dataset.
+    :param source: Activity the edge starts at.
+    :param target: Activity the edge ends at.
+    :return: Histograms of the durations in total and per year.
+    """
+    log, index = _indexed_dataset(dataset_id)
+    try:
+        return edge_durations(log, index, source, target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@app.get("/datasets/{dataset_id}/nodes/cases")
+def get_node_cases(dataset_id: str, activity: str, limit: int | None = None) -> NodeCases:
+    """
+    API request to drill down from a node of the graph of a stored dataset to the cases containing it.
+    :param dataset_id: Id of the dataset.
+    :param activity: Activity of the node.
+    :param limit: Maximum number of cases that are returned.
+    :return: Cases with the positions of the activity within them.
+    """
+    log, index = _indexed_dataset(dataset_id)
+    try:
+        return node_cases(log, index, activity, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+def _variant_trie(dataset_id: str) -> VariantTrie:
+    try:
+        return dataset_store.variant_trie(dataset_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0])) from e
+
+
+@app.get("/datasets/{dataset_id}/variants/prefix")
+def get_variant_prefix(dataset_id: str, activity: Annotated[list[str] | None, Query()] = None) -> VariantPrefix:
+    """
+    API request to describe the cases of a stored dataset starting with a prefix and the activities following it.
+    :param dataset_id: Id of the dataset.
+    :param activity: Activities of the prefix, in order.
+    :return: Number of cases with the prefix, their elapsed time and the distribution of the next activity.
+    """
+    trie = _variant_trie(dataset_id)
+    try:
+        return variant_prefix(trie, activity or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@app.get("/datasets/{dataset_id}/variants/completions")
+def get_variant_completions(dataset_id: str, activity: Annotated[list[str] | None, Query()] = None,
+                            k: int = 10) -> VariantCompletions:
+    """
+    API request to find the most frequent variants of a stored dataset starting with a prefix.
+    :param dataset_id: Id of the dataset.
+    :param activity: Activities of the prefix, in order.
+    :param k: Number of variants.
+    :return: Variants with their frequency and mean duration.
+    """
+    trie = _variant_trie(dataset_id)
+    try:
+        return variant_completions(trie, activity or [], k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@app.get("/metrics")
+def get_service_metrics() -> ServiceMetrics:
+    """
+    API request to monitor the service.
+    :return: Queue depth, running requests and rejections of the admission control
+    the number of discovery requests that shared the result of an identical running request,
+    the number of cancelled calculations with the compute time they saved
+    and, if the worker pool is used, the utilization of each worker.
+    """
+    worker_pool = _get_worker_pool()
+    return ServiceMetrics(admission=admission_controller.metrics(), coalescing=single_flight.metrics(),
+                          cancellation=cancellation_statistics.metrics(),
+                          worker_pool=None if worker_pool is None else worker_pool.metrics())
+
+
 class HealthResponse(BaseModel):
     status: str
+    ready: bool
     timestamp: str
 
 
 @app.get("/health")
 async def get_health() -> HealthResponse:
+    """
+    API request to check the service.
+    The service is online as soon as it accepts requests and ready once the warm-up has run.
+    :return: Status, readiness and current time.
+    """
     status = "Online"
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    return HealthResponse(status=status, timestamp=ts)
+    return HealthResponse(status=status, ready=warm_up.is_ready(), timestamp=ts)
 
 
 if __name__ == "__main__":
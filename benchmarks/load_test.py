@@ -0,0 +1,309 @@
+"""
+Load test of the HTTP service with a seeded mix of synthetic /discover requests.
+
+Starts the service locally with uvicorn (or gunicorn with --server gunicorn), or targets a running service,
+for example the Docker image, with --url. A stub callback receiver is started for requests with a callback_url.
+Concurrent clients send requests until --requests requests are done, while the memory of the service is sampled.
+The report contains the throughput and the p50/p95/p99 latency per scenario and overall,
+the number of received callbacks and the memory over time.
+It is written as json and can be compared with an earlier report to catch capacity regressions.
+
+Usage:
+    python benchmarks/load_test.py --requests 200 --concurrency 8 --output report.json
+    docker run -p 8000:8000 --name onco-miner onco-miner
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --docker-container onco-miner \\
+        --callback-host host.docker.internal --output docker.json
+    python benchmarks/load_test.py --compare report.json docker.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import requests
+
+REPOSITORY_ROOT = Path(__file__).resolve().parents[1]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    weight: float
+    n_events: int
+    parameters: dict[str, Any]
+    callback: bool = False
+
+
+SCENARIOS = (
+    Scenario("small", 4, 1_000, {}),
+    Scenario("medium", 3, 20_000, {}),
+    Scenario("medium_counts", 1, 20_000, {"add_counts": True, "max_count": 3}),
+    Scenario("medium_sampled", 1, 20_000, {"sampling": {"fraction": 0.2, "method": "stratified"}}),
+    Scenario("medium_callback", 1, 20_000, {}, callback=True),
+    Scenario("large", 0.5, 200_000, {}),
+)
+
+
+def build_data(n_events: int, seed: int, events_per_case: int = 20, n_activities: int = 30) -> dict[str, Any]:
+    """
+    Creates synthetic data in the format of /discover with traces of random activities.
+    """
+    rng = np.random.default_rng(seed)
+    activities = rng.integers(n_activities, size=n_events).tolist()
+    hours = rng.integers(24, size=n_events).tolist()
+    data: dict[str, dict[str, str]] = {"concept:name": {}, "case:concept:name": {}, "time:timestamp": {}}
+    for event in range(n_events):
+        index = str(event)
+        data["concept:name"][index] = f"Activity {activities[event]}"
+        data["case:concept:name"][index] = f"Case {event // events_per_case}"
+        data["time:timestamp"][index] = f"2024-01-{1 + event % events_per_case:02d}T{hours[event]:02d}:00:00"
+    return data
+
+
+class _CallbackHandler(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:  # type: ignore[attr-defined]
+            self.server.received += 1  # type: ignore[attr-defined]
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+
+def start_callback_receiver() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("0.0.0.0", 0), _CallbackHandler)  # noqa: S104
+    server.lock = threading.Lock()  # type: ignore[attr-defined]
+    server.received = 0  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_local_service(server: str, port: int) -> subprocess.Popen[bytes]:
+    environment = {**os.environ, "BIND": f"127.0.0.1:{port}"}
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)]
+    return subprocess.Popen(command, cwd=REPOSITORY_ROOT, env=environment,  # noqa: S603
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url: str, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=5).json().get("ready"):
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"The service at {url} did not become ready.")
+
+
+def _process_tree_rss_mb(pid: int) -> float:
+    """
+    Sums the resident memory of a process and its descendants, read from /proc.
+    """
+    children: dict[int, list[int]] = {}
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit():
+            try:
+                parent = int((entry / "stat").read_text().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError):
+                continue
+            children.setdefault(parent, []).append(int(entry.name))
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            status = (Path("/proc") / str(current) / "status").read_text()
+        except OSError:
+            continue
+        total_kb += next((int(line.split()[1]) for line in status.splitlines() if line.startswith("VmRSS:")), 0)
+    return total_kb / 1024
+
+
+def _docker_memory_mb(container: str) -> float:
+    usage = subprocess.run(["docker", "stats", "--no-stream", "--format", "{{.MemUsage}}", container],  # noqa: S603, S607
+                           check=True, capture_output=True, text=True).stdout.split("/")[0].strip()
+    units = {"KiB": 1 / 1024, "MiB": 1, "GiB": 1024, "B": 1 / 2 ** 20}
+    unit = next(unit for unit in units if usage.endswith(unit))
+    return float(usage.removesuffix(unit)) * units[unit]
+
+
+@dataclass
+class MemorySampler:
+    pid: int | None
+    container: str | None
+    interval: float = 0.5
+    samples: list[tuple[float, float]] = field(default_factory=list)
+    _stop: threading.Event = field(default_factory=threading.Event)
+
+    def _run(self) -> None:
+        start = time.monotonic()
+        while not self._stop.wait(self.interval):
+            if self.pid is not None:
+                memory = _process_tree_rss_mb(self.pid)
+            elif self.container is not None:
+                memory = _docker_memory_mb(self.container)
+            else:
+                return
+            self.samples.append((round(time.monotonic() - start, 2), round(memory, 1)))
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _percentiles(latencies: list[float], duration: float) -> dict[str, float]:
+    if not latencies:
+        return {"count": 0}
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {"count": len(latencies), "throughput": len(latencies) / duration, "mean": statistics.fmean(latencies),
+            "p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98]}
+
+
+def run_load_test(url: str, n_requests: int, concurrency: int, seed: int, callback_url: str | None,
+                  scenarios: tuple[Scenario, ...] = SCENARIOS) -> dict[str, Any]:
+    """
+    Sends a seeded random mix of the scenarios with the given number of concurrent clients.
+    :return: Latency statistics per scenario and overall.
+    """
+    bodies = {scenario.name: json.dumps({
+        "data": build_data(scenario.n_events, seed),
+        "parameters": scenario.parameters,
+        "callback_url": callback_url if scenario.callback else None,
+    }).encode() for scenario in scenarios}
+    weights = np.asarray([scenario.weight for scenario in scenarios])
+    plan = [scenarios[index] for index in
+            np.random.default_rng(seed).choice(len(scenarios), size=n_requests, p=weights / weights.sum()).tolist()]
+    results: list[tuple[str, float, int]] = []
+    lock = threading.Lock()
+
+    def send(scenario: Scenario) -> None:
+        start = time.perf_counter()
+        try:
+            status = requests.post(f"{url}/discover", data=bodies[scenario.name], timeout=600,
+                                   headers={"Content-Type": "application/json"}).status_code
+        except requests.exceptions.RequestException:
+            status = 0
+        with lock:
+            results.append((scenario.name, time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, plan))
+    duration = time.perf_counter() - start
+    report: dict[str, Any] = {"duration": duration, "scenarios": {}}
+    for scenario in scenarios:
+        scenario_results = [result for result in results if result[0] == scenario.name]
+        report["scenarios"][scenario.name] = {
+            **_percentiles([latency for _, latency, status in scenario_results if status == 200], duration),
+            "errors": sum(status != 200 for _, _, status in scenario_results),
+            "n_events": scenario.n_events,
+        }
+    report["overall"] = {**_percentiles([latency for _, latency, status in results if status == 200], duration),
+                         "errors": sum(status != 200 for _, _, status in results)}
+    return report
+
+
+def compare_reports(baseline: dict[str, Any], current: dict[str, Any], max_regression: float) -> bool:
+    """
+    Prints the change of p95 latency and throughput per scenario.
+    :return: If no scenario regressed by more than max_regression.
+    """
+    passed = True
+    print(f"{'scenario':>16} {'p95 before':>11} {'p95 after':>10} {'change':>8} {'req/s before':>13} "
+          f"{'req/s after':>12} {'change':>8}")
+    for name, after in {**current["scenarios"], "overall": current["overall"]}.items():
+        before = baseline["overall"] if name == "overall" else baseline["scenarios"].get(name)
+        if not before or not before.get("count") or not after.get("count"):
+            continue
+        latency_change = after["p95"] / before["p95"] - 1
+        throughput_change = after["throughput"] / before["throughput"] - 1
+        regressed = latency_change > max_regression or throughput_change < -max_regression or after["errors"] > 0
+        passed &= not regressed
+        print(f"{name:>16} {before['p95']:>10.3f}s {after['p95']:>9.3f}s {latency_change:>+8.1%} "
+              f"{before['throughput']:>13.2f} {after['throughput']:>12.2f} {throughput_change:>+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base url of a running service. If not set, the service is started locally.")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--docker-container", help="Name of the container to sample the memory of.")
+    parser.add_argument("--callback-host", default="127.0.0.1",
+                        help="Host name under which the service reaches the callback receiver.")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two reports instead of running a load test.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (json.loads(path.read_text()) for path in args.compare)
+        sys.exit(0 if compare_reports(baseline, current, args.max_regression) else 1)
+
+    service = None
+    url = args.url
+    if url is None:
+        service = start_local_service(args.server, args.port)
+        url = f"http://127.0.0.1:{args.port}"
+    receiver = start_callback_receiver()
+    try:
+        wait_until_ready(url)
+        sampler = MemorySampler(pid=service.pid if service else None, container=args.docker_container)
+        sampler.start()
+        callback_url = f"http://{args.callback_host}:{receiver.server_address[1]}/callback"
+        report = run_load_test(url, args.requests, args.concurrency, args.seed, callback_url)
+        sampler.stop()
+    finally:
+        receiver.shutdown()
+        if service is not None:
+            service.terminate()
+            service.wait()
+    report.update({
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or f"local {args.server}",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "callbacks_received": receiver.received,  # type: ignore[attr-defined]
+        "memory_mb": {"peak": max((memory for _, memory in sampler.samples), default=None),
+                      "samples": sampler.samples},
+    })
+    for name, statistics_ in {**report["scenarios"], "overall": report["overall"]}.items():
+        if statistics_.get("count"):
+            print(f"{name:>16}: {statistics_['count']:>4} ok, {statistics_['errors']} errors, "
+                  f"{statistics_['throughput']:.2f} req/s, p50 {statistics_['p50']:.3f}s, "
+                  f"p95 {statistics_['p95']:.3f}s, p99 {statistics_['p99']:.3f}s")
+    print(f"callbacks received: {report['callbacks_received']}, peak memory: {report['memory_mb']['peak']} MiB")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
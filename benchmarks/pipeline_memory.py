@@ -0,0 +1,62 @@
+"""
+Measures the peak memory per event of a discovery request, which BYTES_PER_EVENT of the admission control estimates.
+
+Builds a synthetic dataframe like the one parsed from a /discover request and runs the pipeline on it
+with all metrics enabled. Reports the memory of the dataframe and the peak the pipeline adds on top of it,
+as traced by tracemalloc.
+
+Usage: python benchmarks/pipeline_memory.py [--events N] [--activities N]
+"""
+import argparse
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from helpers.admission_control import BYTES_PER_EVENT  # noqa: E402
+from helpers.config_loader import CONFIG  # noqa: E402
+from model.input_model import InputParameters  # noqa: E402
+from retrieval.backends import BACKENDS  # noqa: E402
+from retrieval.pipeline import run_pipeline  # noqa: E402
+
+
+def build_log(n_events: int, n_activities: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(5, 35, size=max(n_events // 20, 1))
+    case_ids = np.repeat([f"Case {case}" for case in range(len(lengths))], lengths)
+    activities = np.asarray([f"Activity {activity}" for activity in range(n_activities)])
+    # Cases start within two years and last up to a few weeks.
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    steps = np.cumsum(rng.integers(0, 48, size=len(case_ids)))
+    hours = np.repeat(rng.integers(0, 2 * 365 * 24, size=len(lengths)), lengths) + steps - steps[offsets]
+    return pd.DataFrame({"case:concept:name": case_ids,
+                         "concept:name": activities[rng.integers(0, n_activities, size=len(case_ids))],
+                         "time:timestamp": pd.Timestamp("2020-01-01") + pd.to_timedelta(hours, unit="h")})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--activities", type=int, default=30)
+    args = parser.parse_args()
+    CONFIG["exclude"] = []
+    tracemalloc.start()
+    data = build_log(args.events, args.activities)
+    n_events = len(data)
+    frame = tracemalloc.get_traced_memory()[0]
+    print(f"log: {n_events} events, dataframe {frame / n_events:.0f} bytes/event, BYTES_PER_EVENT {BYTES_PER_EVENT}")
+    for name, backend in BACKENDS.items():
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        run_pipeline(data, InputParameters(n_top_variants=5), backend=backend)
+        pipeline = tracemalloc.get_traced_memory()[1] - before
+        print(f"{name:>9}: pipeline peak {pipeline / n_events:.0f} bytes/event, "
+              f"with dataframe {(frame + pipeline) / n_events:.0f} bytes/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares the speed of the accelerated implementations with the pm4py and pandas implementations they replaced.
+
+The differential tests check that both produce the same results. Since wall clock comparisons depend on the machine
+and its load, the test suite only bounds the ratio of the times in a test selected with pytest -m benchmark.
+
+Usage: python benchmarks/reference_implementations.py [--cases N] [--runs N]
+"""
+import argparse
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_handling.complexity_reduction import reduce_dataframe  # noqa: E402
+from data_handling.data_transformation import add_states  # noqa: E402
+from retrieval.process_model_retrieval import get_process_model, get_process_model_with_pm4py  # noqa: E402
+from tests.integration.test_differential import (  # noqa: E402
+    _add_states_by_grouping,
+    _random_log,
+    _reduce_dataframe_with_pm4py,
+)
+
+
+def measure(function: Callable[[pd.DataFrame], object], data: pd.DataFrame, runs: int) -> list[float]:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(data)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    data = _random_log(100, n_cases=args.cases, max_length=12, interleaved=False)
+    print(f"log: {args.cases} cases, {len(data)} events")
+    comparisons: dict[str, tuple[Callable[[pd.DataFrame], object], Callable[[pd.DataFrame], object]]] = {
+        "process model": (lambda log: get_process_model_with_pm4py(log, "START", "END"),
+                          lambda log: get_process_model(log, "START", "END")),
+        "add states": (lambda log: _add_states_by_grouping(log, ["A", "B"]), lambda log: add_states(log, ["A", "B"])),
+        "reduce": (lambda log: _reduce_dataframe_with_pm4py(log, 0.5), lambda log: reduce_dataframe(log, 0.5)),
+    }
+    for name, (reference, optimized) in comparisons.items():
+        reference_time = statistics.median(measure(reference, data, args.runs))
+        optimized_time = statistics.median(measure(optimized, data, args.runs))
+        print(f"{name:>14}: reference {reference_time:.3f}s, optimized {optimized_time:.3f}s, "
+              f"speedup {reference_time / optimized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures how long parsing and validating the body of a /discover request takes.
+
+Compares pydantic validation of every event followed by validate_data and transform_dict
+with parse_input_body, which validates only the envelope through pydantic and the data column by column.
+
+Usage: python benchmarks/request_parsing.py [--events N] [--runs N]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_handling.data_transformation import transform_dict  # noqa: E402
+from data_handling.data_validation import validate_data  # noqa: E402
+from data_handling.request_parsing import parse_input_body  # noqa: E402
+from model.input_model import InputBody  # noqa: E402
+
+
+def build_body(n_events: int, events_per_case: int = 20, n_activities: int = 30) -> bytes:
+    data: dict[str, dict[str, str]] = {"concept:name": {}, "case:concept:name": {}, "time:timestamp": {}}
+    for event in range(n_events):
+        index = str(event)
+        data["concept:name"][index] = f"Activity {event * 7 % n_activities}"
+        data["case:concept:name"][index] = f"Case {event // events_per_case}"
+        data["time:timestamp"][index] = f"2024-01-01T{event % events_per_case:02d}:00:00"
+    return json.dumps({"data": data, "parameters": {}}).encode()
+
+
+def parse_with_pydantic(body: bytes) -> None:
+    request = InputBody.model_validate_json(body)
+    assert request.data is not None  # noqa: S101
+    validate_data(request.data)
+    transform_dict(request.data)
+
+
+def parse_fast(body: bytes) -> None:
+    parse_input_body(body)
+
+
+def measure(function: Callable[[bytes], None], body: bytes, runs: int) -> list[float]:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(body)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    body = build_body(args.events)
+    print(f"body: {args.events} events, {len(body) / 2 ** 20:.1f} MiB")
+    for name, function in (("pydantic", parse_with_pydantic), ("fast", parse_fast)):
+        durations = measure(function, body, args.runs)
+        print(f"{name:>8}: median {statistics.median(durations):.3f}s, min {min(durations):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
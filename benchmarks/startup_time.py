@@ -0,0 +1,50 @@
+"""
+Measures the startup time of the service in fresh interpreter processes.
+
+Reports how long importing the app takes (what a new replica needs before it accepts requests)
+and how long the warm-up takes until the service reports ready.
+
+Usage: python benchmarks/startup_time.py [--runs N]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).resolve().parents[1]
+
+MEASUREMENT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+plotting_imported = "matplotlib" in sys.modules
+app.warm_up.warm_up()
+ready = time.perf_counter()
+print(json.dumps({"import": imported - start, "warm_up": ready - imported,
+                  "plotting_imported": plotting_imported}))
+"""
+
+
+def measure_once() -> dict[str, float]:
+    output = subprocess.run([sys.executable, "-c", MEASUREMENT], cwd=REPOSITORY_ROOT, check=True,  # noqa: S603
+                            capture_output=True, text=True).stdout
+    result: dict[str, float] = json.loads(output.strip().splitlines()[-1])
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    results = [measure_once() for _ in range(args.runs)]
+    for key in ("import", "warm_up"):
+        values = [result[key] for result in results]
+        print(f"{key:>8}: median {statistics.median(values):.3f}s, min {min(values):.3f}s, max {max(values):.3f}s")
+    print(f"plotting stack imported before warm-up: {any(result['plotting_imported'] for result in results)}")
+
+
+if __name__ == "__main__":
+    main()
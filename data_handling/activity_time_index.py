@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.columnar_storage import iter_case_chunks
+from data_handling.encoded_log import EncodedLog
+
+NS_PER_DAY = 86_400 * 10**9
+INDEX_FILES = {
+    "days": "time_index_days.npy",
+    "activity_offsets": "time_index_offsets.npy",
+    "cumulative_counts": "time_index_counts.npy",
+}
+INDEX_META_FILE = "time_index.json"
+
+
+@dataclass(frozen=True)
+class ActivityTimeIndex:
+    """
+    Number of events per activity and day, stored only for the days on which the activity occurs,
+    so the index holds at most one entry per event however long the time span of the log is.
+    Entries are grouped by activity and sorted by day within each group: the days of the activity with code a
+    are days[activity_offsets[a]:activity_offsets[a + 1]], and cumulative_counts[i] is the number of events
+    of the entries before entry i, so the events of an activity within any range of days are found with two
+    binary searches. Days are counted since 1970-01-01, in UTC for timezone aware timestamps.
+    """
+    activities: list[str]
+    first_day: int
+    days: npt.NDArray[np.int64]
+    activity_offsets: npt.NDArray[np.int64]
+    cumulative_counts: npt.NDArray[np.int64]
+    first_timestamp: int
+    last_timestamp: int
+
+    @property
+    def n_days(self) -> int:
+        return self.last_timestamp // NS_PER_DAY - self.first_day + 1
+
+    def count_events(self, events: list[str], day_edges: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """
+        Counts the events of the given activities between consecutive day edges.
+        :param events: Names of the activities that are counted.
+        :param day_edges: Ascending days; bin i covers the days from day_edges[i] (included) to day_edges[i + 1].
+        :return: Number of events per bin.
+        """
+        counts = np.zeros(len(day_edges) - 1, dtype=np.int64)
+        for code in np.flatnonzero(np.isin(np.asarray(self.activities, dtype=object), events)).tolist():
+            start, end = int(self.activity_offsets[code]), int(self.activity_offsets[code + 1])
+            prefix = self.cumulative_counts[start + np.searchsorted(self.days[start:end], day_edges)]
+            counts += prefix[1:] - prefix[:-1]
+        return counts
+
+
+def build_activity_time_index(log: EncodedLog, max_events: int | None = None) -> ActivityTimeIndex:
+    """
+    Counts the events of each activity per day.
+    :param log: Encoded, possibly memory-mapped, log.
+    :param max_events: If set, the log is read in chunks of cases with at most that many events.
+    :return: Index of the log.
+    """
+    if log.n_events == 0:
+        raise ValueError("The event log does not contain any events.")
+    first_timestamp = int(log.timestamps[log.case_offsets[:-1]].min())
+    last_timestamp = int(log.timestamps[log.case_offsets[1:] - 1].max())
+    first_day = first_timestamp // NS_PER_DAY
+    n_days = last_timestamp // NS_PER_DAY - first_day + 1
+    # Pairs of activity and day, encoded as code * n_days + day, with their number of events.
+    keys = np.zeros(0, dtype=np.int64)
+    counts = np.zeros(0, dtype=np.int64)
+    for chunk in iter_case_chunks(log, max_events or log.n_events):
+        days = np.asarray(chunk.timestamps, dtype=np.int64) // NS_PER_DAY - first_day
+        chunk_keys, chunk_counts = np.unique(np.asarray(chunk.codes, dtype=np.int64) * n_days + days,
+                                             return_counts=True)
+        merged_keys = np.concatenate([keys, chunk_keys])
+        keys = np.unique(merged_keys)
+        counts = np.bincount(np.searchsorted(keys, merged_keys), weights=np.concatenate([counts, chunk_counts]),
+                             minlength=len(keys)).astype(np.int64)
+    cumulative_counts = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(counts, out=cumulative_counts[1:])
+    activity_offsets = np.searchsorted(keys, np.arange(log.n_activities + 1, dtype=np.int64) * n_days)
+    return ActivityTimeIndex(activities=log.activities, first_day=first_day, days=keys % n_days + first_day,
+                             activity_offsets=activity_offsets.astype(np.int64), cumulative_counts=cumulative_counts,
+                             first_timestamp=first_timestamp, last_timestamp=last_timestamp)
+
+
+def save_activity_time_index(index: ActivityTimeIndex, directory: Path) -> None:
+    """
+    Stores an index next to the files of its encoded log.
+    :param index: Index.
+    :param directory: Directory the files are written to.
+    """
+    for field, file_name in INDEX_FILES.items():
+        np.save(directory / file_name, getattr(index, field))
+    with (directory / INDEX_META_FILE).open("w") as file:
+        json.dump({"first_day": index.first_day, "first_timestamp": index.first_timestamp,
+                   "last_timestamp": index.last_timestamp}, file)
+
+
+def load_activity_time_index(directory: Path, activities: list[str]) -> ActivityTimeIndex | None:
+    """
+    Loads an index stored with save_activity_time_index. The arrays are memory-mapped read only.
+    :param directory: Directory containing the files.
+    :param activities: Activity names of the log the index was built from.
+    :return: The index or None if no index is stored in the directory.
+    """
+    if not all((directory / file_name).exists() for file_name in [*INDEX_FILES.values(), INDEX_META_FILE]):
+        return None
+    with (directory / INDEX_META_FILE).open() as file:
+        meta = json.load(file)
+    arrays = {field: np.load(directory / file_name, mmap_mode="r") for field, file_name in INDEX_FILES.items()}
+    return ActivityTimeIndex(activities=activities, first_day=meta["first_day"], **arrays,
+                             first_timestamp=meta["first_timestamp"], last_timestamp=meta["last_timestamp"])
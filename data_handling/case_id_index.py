@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+
+INDEX_FILES = {
+    "sorted_case_ids": "case_id_index_ids.npy",
+    "case_indices": "case_id_index_cases.npy",
+}
+
+
+@dataclass(frozen=True)
+class CaseIdIndex:
+    """
+    Case identifiers of a log in ascending order with the index of each case in the log,
+    so requested cases are found by binary search instead of a scan over all identifiers.
+    The identifiers are stored as a fixed width unicode array, which can be memory-mapped.
+    """
+    sorted_case_ids: npt.NDArray[np.str_]
+    case_indices: npt.NDArray[np.int64]
+
+    def find(self, case_ids: list[str]) -> npt.NDArray[np.int64]:
+        """
+        Finds the cases with the given identifiers.
+        :param case_ids: Identifiers of the cases, in any order and possibly repeated.
+        :return: Ascending indices of the cases in the log.
+        :raises ValueError: If one of the identifiers does not exist.
+        """
+        requested = np.unique(np.asarray(case_ids, dtype=np.str_))
+        positions = np.searchsorted(self.sorted_case_ids, requested)
+        found = positions < len(self.sorted_case_ids)
+        found[found] = self.sorted_case_ids[positions[found]] == requested[found]
+        if not found.all():
+            raise ValueError(f"{int(np.count_nonzero(~found))} of the requested case identifiers do not exist.")
+        return np.sort(self.case_indices[positions])
+
+
+def build_case_id_index(log: EncodedLog) -> CaseIdIndex:
+    """
+    Sorts the case identifiers of a log.
+    :param log: Encoded log.
+    :return: Index of the log.
+    """
+    case_ids = np.asarray(log.case_ids, dtype=np.str_)
+    order = np.argsort(case_ids, kind="stable").astype(np.int64)
+    return CaseIdIndex(sorted_case_ids=case_ids[order], case_indices=order)
+
+
+def save_case_id_index(index: CaseIdIndex, directory: Path) -> None:
+    """
+    Stores an index next to the files of its encoded log.
+    :param index: Index.
+    :param directory: Directory the files are written to.
+    """
+    for field, file_name in INDEX_FILES.items():
+        np.save(directory / file_name, getattr(index, field))
+
+
+def load_case_id_index(directory: Path) -> CaseIdIndex | None:
+    """
+    Loads an index stored with save_case_id_index. The arrays are memory-mapped read only.
+    :param directory: Directory containing the files.
+    :return: The index or None if no index is stored in the directory.
+    """
+    if not all((directory / file_name).exists() for file_name in INDEX_FILES.values()):
+        return None
+    arrays = {field: np.load(directory / file_name, mmap_mode="r") for field, file_name in INDEX_FILES.items()}
+    return CaseIdIndex(**arrays)
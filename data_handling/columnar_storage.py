@@ -0,0 +1,205 @@
+import json
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from data_handling.encoded_log import EncodedLog
+from helpers.cancellation import checkpoint
+
+META_FILE = "meta.json"
+EVENT_COLUMNS = ["case:concept:name", "concept:name", "time:timestamp"]
+# Rough upper bounds of the memory needed per event while parsing text input and while processing encoded events.
+PARSE_BYTES_PER_EVENT = 512
+ENCODED_BYTES_PER_EVENT = 64
+
+
+def save_encoded_log(log: EncodedLog, directory: Path) -> None:
+    """
+    Stores an encoded log as uncompressed numpy files that can be memory-mapped.
+    :param log: Encoded log.
+    :param directory: Directory the files are written to.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / "codes.npy", log.codes)
+    np.save(directory / "timestamps.npy", log.timestamps)
+    np.save(directory / "case_offsets.npy", log.case_offsets)
+    np.save(directory / "case_first_positions.npy", log.case_first_positions)
+    with (directory / META_FILE).open("w") as file:
+        json.dump({"activities": log.activities, "case_ids": log.case_ids}, file)
+
+
+def load_encoded_log(directory: Path, mmap: bool = True) -> EncodedLog:
+    """
+    Loads an encoded log stored with save_encoded_log or spill_csv.
+    :param directory: Directory containing the files.
+    :param mmap: If true, the event columns are memory-mapped read only instead of being read into memory.
+    :return: Encoded log.
+    """
+    mmap_mode: Literal["r"] | None = "r" if mmap else None
+    with (directory / META_FILE).open() as file:
+        meta = json.load(file)
+    return EncodedLog(activities=meta["activities"],
+                      case_ids=meta["case_ids"],
+                      codes=np.load(directory / "codes.npy", mmap_mode=mmap_mode),
+                      timestamps=np.load(directory / "timestamps.npy", mmap_mode=mmap_mode),
+                      case_offsets=np.load(directory / "case_offsets.npy"),
+                      case_first_positions=np.load(directory / "case_first_positions.npy"))
+
+
+def events_per_chunk(memory_budget: int, bytes_per_event: int = ENCODED_BYTES_PER_EVENT) -> int:
+    """
+    Calculates how many events can be processed at once within the memory budget.
+    :param memory_budget: Memory budget in bytes.
+    :param bytes_per_event: Memory needed per event.
+    :return: Number of events.
+    """
+    return max(1, memory_budget // bytes_per_event)
+
+
+def iter_case_chunks(log: EncodedLog, max_events: int) -> Iterator[EncodedLog]:
+    """
+    Iterates over consecutive chunks of whole cases with at most max_events events each.
+    Cases with more events than max_events form a chunk of their own.
+    The event columns of the chunks are views, so memory-mapped logs are only read chunk by chunk.
+    Before each chunk, the calculation is stopped if it was cancelled.
+    :param log: Encoded log.
+    :param max_events: Maximum number of events per chunk.
+    :return: Iterator over the chunks.
+    """
+    offsets = log.case_offsets
+    first_case = 0
+    while first_case < log.n_cases:
+        checkpoint()
+        start = offsets[first_case]
+        end_case = int(np.searchsorted(offsets, start + max_events, side="right")) - 1
+        end_case = min(max(end_case, first_case + 1), log.n_cases)
+        end = offsets[end_case]
+        yield EncodedLog(activities=log.activities,
+                         case_ids=log.case_ids[first_case:end_case],
+                         codes=log.codes[start:end],
+                         timestamps=log.timestamps[start:end],
+                         case_offsets=offsets[first_case:end_case + 1] - start,
+                         case_first_positions=log.case_first_positions[first_case:end_case])
+        first_case = end_case
+
+
+def _encode_values(values: pd.Series, vocabulary: dict[str, int]) -> tuple[npt.NDArray[np.int64], list[int]]:
+    """
+    Encodes values with a vocabulary that is extended by unseen values.
+    :param values: Values to encode.
+    :param vocabulary: Mapping from value to code, updated in place.
+    :return: The codes and the positions within values where unseen values occurred first.
+    """
+    chunk_codes, uniques = pd.factorize(values, sort=False)
+    mapping = np.empty(len(uniques), dtype=np.int64)
+    new_uniques = []
+    for index, value in enumerate(uniques):
+        code = vocabulary.get(value)
+        if code is None:
+            code = vocabulary[value] = len(vocabulary)
+            new_uniques.append(index)
+        mapping[index] = code
+    first_positions = np.unique(chunk_codes, return_index=True)[1]
+    return mapping[chunk_codes], first_positions[new_uniques].tolist()
+
+
+def _spill_raw_events(chunks: Iterable[pd.DataFrame], directory: Path) -> tuple[list[str], list[str], list[int]]:
+    """
+    Appends the encoded events of each chunk, in the order they are read, to raw spill files.
+    :return: Activities and case identifiers indexed by their codes, and the first position of each case.
+    """
+    activity_vocabulary: dict[str, int] = {}
+    case_vocabulary: dict[str, int] = {}
+    case_first_positions: list[int] = []
+    n_events = 0
+    with ((directory / "raw_codes.bin").open("wb") as codes_file,
+          (directory / "raw_cases.bin").open("wb") as cases_file,
+          (directory / "raw_timestamps.bin").open("wb") as timestamps_file):
+        for chunk in chunks:
+            checkpoint()
+            codes, _ = _encode_values(chunk["concept:name"], activity_vocabulary)
+            cases, new_case_positions = _encode_values(chunk["case:concept:name"], case_vocabulary)
+            # Timestamps with an offset are converted to UTC, timestamps without one are kept as they are.
+            timestamps = pd.to_datetime(chunk["time:timestamp"], format="ISO8601", utc=True).to_numpy(
+                dtype="datetime64[ns]")
+            codes.astype(np.int32).tofile(codes_file)
+            cases.tofile(cases_file)
+            timestamps.view(np.int64).tofile(timestamps_file)
+            case_first_positions.extend(n_events + position for position in new_case_positions)
+            n_events += len(chunk)
+    return list(activity_vocabulary), list(case_vocabulary), case_first_positions
+
+
+def spill_csv(source: Path, directory: Path, memory_budget: int) -> EncodedLog:
+    """
+    Converts a csv event log into memory-mapped columnar files sorted by case without loading the log into memory.
+    The csv file needs the columns 'case:concept:name', 'concept:name' and 'time:timestamp'
+    and, as for all input data, the events of each case have to be sorted by time.
+    :param source: Path of the csv file.
+    :param directory: Directory for the spill files.
+    :param memory_budget: Approximate upper bound of the memory used, in bytes.
+    :return: Memory-mapped encoded log.
+    """
+    chunks = pd.read_csv(source, usecols=EVENT_COLUMNS, dtype=str, keep_default_na=False,
+                         chunksize=events_per_chunk(memory_budget, PARSE_BYTES_PER_EVENT))
+    return spill_events(chunks, directory, memory_budget)
+
+
+def spill_events(chunks: Iterable[pd.DataFrame], directory: Path, memory_budget: int) -> EncodedLog:
+    """
+    Writes chunks of events into memory-mapped columnar files sorted by case, holding only one chunk at a time.
+    :param chunks: Events with the columns 'case:concept:name', 'concept:name' and 'time:timestamp' as strings.
+    The events of each case have to be sorted by time.
+    :param directory: Directory for the spill files.
+    :param memory_budget: Approximate upper bound of the memory used for the encoded events, in bytes.
+    :return: Memory-mapped encoded log.
+    :raises ValueError: If there are no events or the events of a case are not sorted.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    activities, case_ids, case_first_positions = _spill_raw_events(chunks, directory)
+    if not case_ids:
+        raise ValueError("The event log does not contain any events.")
+    raw_codes = np.memmap(directory / "raw_codes.bin", dtype=np.int32, mode="r")
+    raw_cases = np.memmap(directory / "raw_cases.bin", dtype=np.int64, mode="r")
+    raw_timestamps = np.memmap(directory / "raw_timestamps.bin", dtype=np.int64, mode="r")
+    n_events = len(raw_codes)
+    chunk_size = events_per_chunk(memory_budget)
+    case_lengths = np.zeros(len(case_ids), dtype=np.int64)
+    for start in range(0, n_events, chunk_size):
+        case_lengths += np.bincount(raw_cases[start:start + chunk_size], minlength=len(case_ids))
+    case_offsets = np.zeros(len(case_ids) + 1, dtype=np.int64)
+    np.cumsum(case_lengths, out=case_offsets[1:])
+    order = np.argsort(activities, kind="stable")
+    recode = np.empty(len(activities), dtype=np.int32)
+    recode[order] = np.arange(len(activities), dtype=np.int32)
+    codes = np.lib.format.open_memmap(directory / "codes.npy", mode="w+", dtype=np.int32, shape=(n_events,))
+    timestamps = np.lib.format.open_memmap(directory / "timestamps.npy", mode="w+", dtype=np.int64,
+                                           shape=(n_events,))
+    filled = np.zeros(len(case_ids), dtype=np.int64)
+    for start in range(0, n_events, chunk_size):
+        cases = np.asarray(raw_cases[start:start + chunk_size])
+        rank_in_chunk = pd.Series(cases).groupby(cases).cumcount().to_numpy()
+        positions = case_offsets[cases] + filled[cases] + rank_in_chunk
+        codes[positions] = recode[raw_codes[start:start + chunk_size]]
+        timestamps[positions] = raw_timestamps[start:start + chunk_size]
+        filled += np.bincount(cases, minlength=len(case_ids))
+    codes.flush()
+    timestamps.flush()
+    del codes, timestamps, raw_codes, raw_cases, raw_timestamps
+    for name in ("raw_codes.bin", "raw_cases.bin", "raw_timestamps.bin"):
+        (directory / name).unlink()
+    np.save(directory / "case_offsets.npy", case_offsets)
+    np.save(directory / "case_first_positions.npy", np.asarray(case_first_positions, dtype=np.int64))
+    with (directory / META_FILE).open("w") as file:
+        json.dump({"activities": [activities[i] for i in order], "case_ids": case_ids}, file)
+    log = load_encoded_log(directory)
+    for chunk in iter_case_chunks(log, chunk_size):
+        same_case = np.ones(max(chunk.n_events - 1, 0), dtype=bool)
+        same_case[chunk.case_offsets[1:-1] - 1] = False
+        if np.any(np.diff(chunk.timestamps)[same_case] < 0):
+            raise ValueError("Events are not sorted.")
+    return log
@@ -1,8 +1,25 @@
+import numpy as np
 import pandas as pd
-from pm4py.statistics.variants.pandas.get import get_variants_count
 
+from data_handling.encoded_log import encode_log
+from retrieval.variant_engine import Variants, count_variants
 
-def reduce_dataframe(data: pd.DataFrame, percentage: float) -> pd.DataFrame:
+
+def select_frequent_variants(variants: Variants, percentage: float) -> Variants:
+    """
+    Keeps the most often occurring variants until they span the given percentage of the traces.
+    The least common variant included is kept in full, so more traces than the percentage may be kept.
+    :param variants: Variants of the traces.
+    :param percentage: Percentage of the traces that should be kept.
+    :return: Variants of the kept traces.
+    """
+    ranked = variants.ranked()
+    traces_before = np.concatenate(([0], np.cumsum(variants.counts[ranked])[:-1]))
+    n_kept = int(np.searchsorted(traces_before, percentage * len(variants.case_ids), side="right"))
+    return variants.select(ranked[:n_kept])
+
+
+def reduce_dataframe(data: pd.DataFrame, percentage: float, variants: Variants | None = None) -> pd.DataFrame:
     """
     Removes traces from dataframe until a dataframe with the length
     of the given percentage of the original dataframe is reached.
@@ -10,23 +27,19 @@ def reduce_dataframe(data: pd.DataFrame, percentage: float) -> pd.DataFrame:
     Often occurring variants are kept.
     :param data: Dataframe that should be reduced.
     :param percentage: Percentage of the dataframe that should be kept.
+    :param variants: Precalculated variants of the traces of the dataframe. If None, they are calculated.
     :return: Reduced dataframe.
     """
-    data = data.copy()
-    n_traces = data.nunique()["case:concept:name"]
-    variants: dict[list[str], int] = get_variants_count(data)
-    top_variants: list[tuple[list[str], int]] = list(sorted(variants.items(), key=lambda item: item[1], reverse=True))
-    needed_variants: list[list[str]] = []
-    counter = 0
-    necessary_traces = percentage * n_traces
-    for variant in top_variants:
-        if counter > necessary_traces:
-            break
-        needed_variants.append(variant[0])
-        counter += variant[1]
-    needed_variants = [list(x) for x in needed_variants]
-    grouped_data = data.groupby("case:concept:name", as_index=False).agg({"concept:name": list, "time:timestamp": list})
-    relevant_traces = grouped_data[grouped_data["concept:name"].isin(needed_variants)]["case:concept:name"]
-    relevant_data = data[data["case:concept:name"].isin(relevant_traces)]
-    return relevant_data
+    if variants is None:
+        variants = count_variants(encode_log(data))
+    return select_traces(data, select_frequent_variants(variants, percentage))
+
 
+def select_traces(data: pd.DataFrame, variants: Variants) -> pd.DataFrame:
+    """
+    Keeps the events of the traces the variants were selected for.
+    :param data: Dataframe.
+    :param variants: Variants of a subset of the traces of the dataframe.
+    :return: Events of the traces of the variants.
+    """
+    return data[data["case:concept:name"].astype(str).isin(variants.case_ids)]
@@ -1,9 +1,14 @@
 import json
+from dataclasses import replace
 from pathlib import Path
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
+from data_handling.encoded_log import EncodedLog
+from data_handling.segmented_kernels import case_segments, segmented_cumsum
+
 
 def transform_dict(data: dict[str, dict[str, str]]) -> pd.DataFrame:
     """
@@ -16,23 +21,53 @@ def transform_dict(data: dict[str, dict[str, str]]) -> pd.DataFrame:
     return loaded_data
 
 
-def add_counts(data: pd.DataFrame) -> pd.DataFrame:
+def count_occurrences(data: pd.DataFrame, max_count: int | None = None) -> npt.NDArray[np.int64]:
+    """
+    Numbers the occurrences of each event type within each trace, starting at 1.
+    :param data: Data whose events are counted.
+    :param max_count: If set, higher counts are replaced by max_count.
+    :return: Counter of each event.
+    """
+    counts: npt.NDArray[np.int64] = data.groupby(["case:concept:name", "concept:name"],
+                                                 sort=False).cumcount().to_numpy(dtype=np.int64) + 1
+    if max_count is not None:
+        np.minimum(counts, max_count, out=counts)
+    return counts
+
+
+def add_counts(data: pd.DataFrame, max_count: int | None = None) -> pd.DataFrame:
     """
     Adds a counter to each event in each trace.
-    Each event type per trace gets its own counter.
+    Each event type per trace gets its own counter, which is appended to the event name.
+    The event names are built once per distinct pair of event type and counter instead of once per event.
     :param data: Data where the counter is to be added.
+    :param max_count: If set, all occurrences from the max_count-th on get the suffix '{max_count}+',
+    which bounds the number of distinct event names on long traces.
     :return: Data with added counter.
     """
     data = data.copy()
-    data["counts"] = data.groupby(["case:concept:name", "concept:name"]).cumcount() + 1
-    data["concept:name"] = data["concept:name"].astype(str) + "_" + data["counts"].astype(str)
+    counts = count_occurrences(data, max_count)
+    activity_codes, activities = pd.factorize(data["concept:name"])
+    data["concept:name"] = _count_labels(activity_codes, activities.tolist(), counts, max_count)
     return data[["case:concept:name", "concept:name", "time:timestamp"]]
 
 
+def _count_labels(activity_codes: npt.NDArray[np.int64], activities: list[str], counts: npt.NDArray[np.int64],
+                  max_count: int | None) -> npt.NDArray[np.object_]:
+    stride = int(counts.max(initial=0)) + 1
+    pair_codes, pairs = pd.factorize(activity_codes * stride + counts)
+    labels = [f"{activities[pair // stride]}_{pair % stride}{'+' if pair % stride == max_count else ''}"
+              for pair in pairs.tolist()]
+    result: npt.NDArray[np.object_] = np.asarray(labels, dtype=object)[pair_codes]
+    return result
+
+
 def add_states(data: pd.DataFrame, state_changing_events: list[str]) -> pd.DataFrame:
     """
     Adds states to each event in each trace.
     State changes are triggered by the state changing events.
+    The state of an event is the number of occurrences of each state changing event up to this event in its trace,
+    in alphabetical order of the state changing events that occur in the data.
     If there is more than one state changing event, the final events of the traces are combined,
     ignoring the state the trace is in.
     This leads to a less scattered graph.
@@ -41,21 +76,67 @@ def add_states(data: pd.DataFrame, state_changing_events: list[str]) -> pd.DataF
     :return: Data with added states.
     """
     data = data.copy()
-    data["counts"] = data[data["concept:name"].isin(state_changing_events)].groupby(
-        ["case:concept:name", "concept:name"]).cumcount() + 1
-    state_frame = pd.get_dummies(data["concept:name"]).mul(data["counts"], axis=0).replace(0, np.nan)
-    state_frame = state_frame.dropna(axis=1, how="all")
-    first_rows = data.groupby('case:concept:name').cumcount().eq(0)
-    state_frame.loc[first_rows] = state_frame.loc[first_rows].fillna(0)
-    state_frame = state_frame.ffill()
-    data["concept:name"] = data["concept:name"].astype(str) + "_" + state_frame.astype(str).to_numpy().sum(axis=1)
-    data["concept:name"] = data["concept:name"].str[:-2]
-    if len(state_changing_events) > 1:
-        last_rows = data.groupby('case:concept:name').cumcount(ascending=False).eq(0)
-        data.loc[last_rows] = remove_counts(data.loc[last_rows])
+    order, offsets = case_segments(pd.factorize(data["case:concept:name"])[0])
+    activity_codes, activities = pd.factorize(data["concept:name"])
+    names = np.empty(len(data), dtype=object)
+    names[order] = _state_labels(activity_codes[order], activities.tolist(), offsets, state_changing_events)
+    data["concept:name"] = names
     return data[["case:concept:name", "concept:name", "time:timestamp"]]
 
 
+def _state_labels(activity_codes: npt.NDArray[np.int64], activities: list[str], offsets: npt.NDArray[np.int64],
+                  state_changing_events: list[str]) -> npt.NDArray[np.object_]:
+    state_activities = sorted(set(activities) & set(state_changing_events))
+    if state_activities:
+        codes = {activity: code for code, activity in enumerate(activities)}
+        states = np.column_stack([activity_codes] + [
+            segmented_cumsum((activity_codes == codes[activity]).astype(np.int64), offsets)
+            for activity in state_activities])
+        # Labels are built once per distinct pair of event type and state instead of once per event.
+        pairs, pair_codes = np.unique(states, axis=0, return_inverse=True)
+        labels: npt.NDArray[np.object_] = np.asarray(
+            [f"{activities[pair[0]]}_{'.0'.join(map(str, pair[1:]))}" for pair in pairs.tolist()],
+            dtype=object)[pair_codes.reshape(-1)]
+    else:
+        labels = np.asarray(activities, dtype=object)[activity_codes]
+    if len(state_changing_events) > 1:
+        last_events = offsets[1:] - 1
+        labels[last_events] = np.asarray(activities, dtype=object)[activity_codes[last_events]]
+    return labels
+
+
+def _relabel(log: EncodedLog, labels: npt.NDArray[np.object_]) -> EncodedLog:
+    activities, codes = np.unique(labels, return_inverse=True)
+    return replace(log, activities=[str(activity) for activity in activities.tolist()],
+                   codes=codes.reshape(-1).astype(np.int32))
+
+
+def add_counts_to_log(log: EncodedLog, max_count: int | None = None) -> EncodedLog:
+    """
+    Adds a counter to each event in each trace of an encoded log, like add_counts.
+    :param log: Encoded log where the counter is to be added.
+    :param max_count: If set, all occurrences from the max_count-th on get the suffix '{max_count}+'.
+    :return: Encoded log with the counted event names as activities.
+    """
+    order, offsets = case_segments(pd.factorize(log.event_case_indices() * log.n_activities + log.codes)[0])
+    counts = np.empty(log.n_events, dtype=np.int64)
+    counts[order] = segmented_cumsum(np.ones(log.n_events, dtype=np.int64), offsets)
+    if max_count is not None:
+        np.minimum(counts, max_count, out=counts)
+    return _relabel(log, _count_labels(np.asarray(log.codes, dtype=np.int64), log.activities, counts, max_count))
+
+
+def add_states_to_log(log: EncodedLog, state_changing_events: list[str]) -> EncodedLog:
+    """
+    Adds states to each event in each trace of an encoded log, like add_states.
+    :param log: Encoded log where states should be added.
+    :param state_changing_events: Events that trigger a state change and are therefore state defining.
+    :return: Encoded log with the event names including the states as activities.
+    """
+    return _relabel(log, _state_labels(np.asarray(log.codes, dtype=np.int64), log.activities, log.case_offsets,
+                                       state_changing_events))
+
+
 def remove_counts(data: pd.DataFrame) -> pd.DataFrame:
     """
     Removes counts from each event in each trace.
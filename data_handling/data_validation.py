@@ -1,6 +1,12 @@
 from datetime import datetime
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
 
 from data_handling.data_transformation import transform_dict
+from data_handling.segmented_kernels import case_segments, segments_sorted
 
 expected_features = ["concept:name", "case:concept:name", "time:timestamp"]
 
@@ -104,11 +110,14 @@ def _validate_sorting(data: dict[str, dict[str, str]]) -> None:
     :param data: Dictionary of data to validate.
     :return:
     """
-    loaded_data = transform_dict(data)[["case:concept:name", "time:timestamp"]]
-    grouped_data = loaded_data.groupby("case:concept:name").agg({"time:timestamp": list})
-    grouped_data["sorted?"] = grouped_data["time:timestamp"].apply(
-        lambda val: all(val[i] <= val[i + 1] for i in range(len(val) - 1)))
-    if not grouped_data["sorted?"].all():
+    loaded_data = transform_dict(data)
+    _check_sorted(pd.factorize(loaded_data["case:concept:name"])[0],
+                  loaded_data["time:timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64))
+
+
+def _check_sorted(case_codes: npt.NDArray[np.int64], timestamps: npt.NDArray[np.int64]) -> None:
+    order, offsets = case_segments(case_codes)
+    if not segments_sorted(timestamps[order], offsets):
         raise ValueError("Events are not sorted.")
 
 
@@ -126,3 +135,50 @@ def validate_data(data: dict[str, dict[str, str]]) -> None:
     _validate_indices(data, concept_name_dict, case_concept_name_dict, time_timestamp_dict)
     _validate_value_types(concept_name_dict, case_concept_name_dict, time_timestamp_dict)
     _validate_sorting(data)
+
+
+def _first_non_string(values: list[Any]) -> Any:
+    return next(value for value in values if not isinstance(value, str))
+
+
+def validate_and_transform(data: Any) -> pd.DataFrame:
+    """
+    Checks if data that was not validated by pydantic matches the expected format and turns it into a DataFrame.
+    Performs the checks of validate_data with vectorized operations instead of loops over the events.
+    :param data: Parsed json of the data.
+    :return: DataFrame as returned by transform_dict.
+    """
+    if not isinstance(data, dict):
+        raise TypeError(f"data has the wrong data type. Expected dict, got {type(data)}.")
+    _validate_column_names(data)
+    _validate_column_types(data)
+    lengths = [len(data[feature]) for feature in expected_features]
+    if len(set(lengths)) != 1:
+        raise ValueError(f"Number of events, trace identifiers and timestamps do not match."
+                         f" Got {lengths[0]} events, {lengths[1]} trace identifiers and {lengths[2]} timestamps.")
+    indices = list(data["concept:name"])
+    columns: dict[str, list[Any]] = {}
+    for feature in data:
+        column: dict[str, Any] = data[feature]
+        if list(column) != indices:
+            if set(column) != set(indices):
+                raise ValueError("Indices are not identical.")
+            column = {index: column[index] for index in indices}
+        values = list(column.values())
+        if pd.api.types.infer_dtype(values, skipna=False) != "string":
+            value = _first_non_string(values)
+            raise TypeError(f"{value} in {feature} has the wrong type. Expected str, got {type(value)}.")
+        columns[feature] = values
+    timestamps = pd.Series(columns["time:timestamp"], dtype=object)
+    if "+" in "".join(columns["time:timestamp"]):
+        raise ValueError(f"{next(value for value in columns['time:timestamp'] if '+' in value)}"
+                         f" should not contain a time zone.")
+    try:
+        parsed = pd.to_datetime(timestamps, format="ISO8601")
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Timestamps are not valid ISO8601: {e}") from e
+    _check_sorted(pd.factorize(pd.Series(columns["case:concept:name"], dtype=object))[0],
+                  parsed.to_numpy(dtype="datetime64[ns]").view(np.int64))
+    loaded_data = pd.DataFrame({feature: columns[feature] for feature in data}, index=indices)
+    loaded_data["time:timestamp"] = parsed.array
+    return loaded_data
@@ -0,0 +1,233 @@
+import shutil
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import TypeVar, cast
+from uuid import uuid4
+
+from data_handling.activity_time_index import (
+    ActivityTimeIndex,
+    build_activity_time_index,
+    load_activity_time_index,
+    save_activity_time_index,
+)
+from data_handling.case_id_index import CaseIdIndex, build_case_id_index, load_case_id_index, save_case_id_index
+from data_handling.columnar_storage import load_encoded_log, save_encoded_log
+from data_handling.edge_index import EdgeIndex, build_edge_index, load_edge_index, save_edge_index
+from data_handling.encoded_log import EncodedLog
+from retrieval.variant_trie import VariantTrie, build_variant_trie, load_variant_trie, save_variant_trie
+
+T = TypeVar("T")
+
+
+class DatasetStore:
+    """
+    Stores encoded logs on local disk so they can be referenced by id in later requests.
+    The event columns are memory-mapped read only, so all worker processes using the same directory
+    share the pages of a dataset through the page cache of the operating system.
+    The most recently used datasets are kept open together with their indexes.
+    """
+
+    def __init__(self, directory: Path, build_indexes: bool = True, max_open: int = 16) -> None:
+        """
+        :param directory: Directory the datasets are stored in.
+        :param build_indexes: Whether the edge index and the variant trie of a dataset are built when it is added.
+        Otherwise, they are built when they are first used.
+        :param max_open: Number of datasets kept open. Opening one more closes the least recently used one.
+        """
+        self.directory = directory
+        self.build_indexes = build_indexes
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._opened: OrderedDict[str, EncodedLog] = OrderedDict()
+        self._time_indexes: dict[str, ActivityTimeIndex] = {}
+        self._case_id_indexes: dict[str, CaseIdIndex] = {}
+        self._edge_indexes: dict[str, EdgeIndex] = {}
+        self._variant_tries: dict[str, VariantTrie] = {}
+
+    def add(self, log: EncodedLog) -> str:
+        """
+        Persists a log, its activity time index, its case id index and, if enabled,
+        its edge index and variant trie under a new id.
+        The files are written to a temporary directory first, so a dataset is never visible half written.
+        :param log: Encoded log.
+        :return: Id of the dataset.
+        """
+        dataset_id = uuid4().hex
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary_directory = self.directory / f".{dataset_id}.tmp"
+        save_encoded_log(log, temporary_directory)
+        save_activity_time_index(build_activity_time_index(log), temporary_directory)
+        save_case_id_index(build_case_id_index(log), temporary_directory)
+        if self.build_indexes:
+            save_edge_index(build_edge_index(log), temporary_directory)
+            save_variant_trie(build_variant_trie(log), temporary_directory)
+        temporary_directory.rename(self.directory / dataset_id)
+        return dataset_id
+
+    def _dataset_directory(self, dataset_id: str) -> Path:
+        if not dataset_id.isalnum():
+            raise KeyError(f"Dataset {dataset_id} does not exist.")
+        return self.directory / dataset_id
+
+    def exists(self, dataset_id: str) -> bool:
+        try:
+            return self._dataset_directory(dataset_id).is_dir()
+        except KeyError:
+            return False
+
+    def load(self, dataset_id: str) -> EncodedLog:
+        """
+        Opens a stored dataset. The max_open most recently used datasets are kept open,
+        so their metadata is only read once per process. Datasets deleted by another process are noticed.
+        :param dataset_id: Id of the dataset.
+        :return: Memory-mapped encoded log.
+        """
+        if not self.exists(dataset_id):
+            self._close(dataset_id)
+            raise KeyError(f"Dataset {dataset_id} does not exist.")
+        with self._lock:
+            log = self._opened.get(dataset_id)
+            if log is not None:
+                self._opened.move_to_end(dataset_id)
+                return log
+        log = load_encoded_log(self._dataset_directory(dataset_id))
+        with self._lock:
+            self._opened[dataset_id] = log
+            while len(self._opened) > self.max_open:
+                self._close_unlocked(next(iter(self._opened)))
+        return log
+
+    def _close(self, dataset_id: str) -> None:
+        with self._lock:
+            self._close_unlocked(dataset_id)
+
+    def _close_unlocked(self, dataset_id: str) -> None:
+        for cache in (self._opened, self._time_indexes, self._case_id_indexes, self._edge_indexes,
+                      self._variant_tries):
+            cache.pop(dataset_id, None)
+
+    def _cached(self, cache: dict[str, T], dataset_id: str, load: Callable[[], T]) -> T:
+        """
+        Returns an index of an open dataset, loading it if it is not cached.
+        Indexes are only cached while their dataset is open, so they are closed together with it.
+        :param cache: Cache of the kind of index.
+        :param dataset_id: Id of the dataset.
+        :param load: Function loading the index.
+        :return: The index.
+        """
+        with self._lock:
+            value = cache.get(dataset_id)
+        if value is not None:
+            return value
+        value = load()
+        with self._lock:
+            if dataset_id in self._opened:
+                cache[dataset_id] = value
+        return value
+
+    def time_index(self, dataset_id: str) -> ActivityTimeIndex:
+        """
+        Returns the daily event counts per activity of a stored dataset.
+        The index is built when the dataset is added, so active events can be calculated without reading the events.
+        :param dataset_id: Id of the dataset.
+        :return: Activity time index.
+        """
+        log = self.load(dataset_id)
+
+        def load() -> ActivityTimeIndex:
+            index = load_activity_time_index(self._dataset_directory(dataset_id), log.activities)
+            return index if index else build_activity_time_index(log)
+
+        return self._cached(self._time_indexes, dataset_id, load)
+
+    def case_id_index(self, dataset_id: str) -> CaseIdIndex:
+        """
+        Returns the sorted case identifiers of a stored dataset, which select_case_ids looks the requested cases up in.
+        An index that was not built when the dataset was added is built and stored now.
+        :param dataset_id: Id of the dataset.
+        :return: Memory-mapped case id index.
+        """
+        log = self.load(dataset_id)
+
+        def load() -> CaseIdIndex:
+            directory = self._dataset_directory(dataset_id)
+            index = load_case_id_index(directory)
+            if index is None:
+                self._add_files(directory, lambda path: save_case_id_index(build_case_id_index(log), path))
+                index = load_case_id_index(directory)
+            return cast(CaseIdIndex, index)
+
+        return self._cached(self._case_id_indexes, dataset_id, load)
+
+    def edge_index(self, dataset_id: str) -> EdgeIndex:
+        """
+        Returns the index of the edge and activity occurrences of a stored dataset.
+        An index that was not built when the dataset was added is built and stored now.
+        :param dataset_id: Id of the dataset.
+        :return: Memory-mapped edge index.
+        """
+        log = self.load(dataset_id)
+
+        def load() -> EdgeIndex:
+            directory = self._dataset_directory(dataset_id)
+            index = load_edge_index(directory, log.n_activities)
+            if index is None:
+                self._add_files(directory, lambda path: save_edge_index(build_edge_index(log), path))
+                index = load_edge_index(directory, log.n_activities)
+            return cast(EdgeIndex, index)
+
+        return self._cached(self._edge_indexes, dataset_id, load)
+
+    def variant_trie(self, dataset_id: str) -> VariantTrie:
+        """
+        Returns the prefix tree of the variants of a stored dataset.
+        A trie that was not built when the dataset was added is built and stored now.
+        :param dataset_id: Id of the dataset.
+        :return: Memory-mapped variant trie.
+        """
+        log = self.load(dataset_id)
+
+        def load() -> VariantTrie:
+            directory = self._dataset_directory(dataset_id)
+            trie = load_variant_trie(directory, log.activities)
+            if trie is None:
+                self._add_files(directory, lambda path: save_variant_trie(build_variant_trie(log), path))
+                trie = load_variant_trie(directory, log.activities)
+            return cast(VariantTrie, trie)
+
+        return self._cached(self._variant_tries, dataset_id, load)
+
+    @staticmethod
+    def _add_files(directory: Path, save: Callable[[Path], None]) -> None:
+        """
+        Adds files to the directory of an existing dataset. They are written to a temporary directory first
+        and then moved, so other processes never load a half written file.
+        :param directory: Directory of the dataset.
+        :param save: Function writing the files to the directory it is given.
+        """
+        temporary_directory = directory / f".{uuid4().hex}.tmp"
+        temporary_directory.mkdir()
+        save(temporary_directory)
+        for file in temporary_directory.iterdir():
+            file.replace(directory / file.name)
+        temporary_directory.rmdir()
+
+    def delete(self, dataset_id: str) -> None:
+        if not self.exists(dataset_id):
+            raise KeyError(f"Dataset {dataset_id} does not exist.")
+        self._close(dataset_id)
+        shutil.rmtree(self._dataset_directory(dataset_id))
+
+
+def select_case_ids(log: EncodedLog, case_ids: list[str], index: CaseIdIndex | None = None) -> EncodedLog:
+    """
+    Creates a log containing only the cases with the given identifiers, keeping the order of the log.
+    :param log: Encoded log.
+    :param case_ids: Identifiers of the cases that should be kept.
+    :param index: Case id index of the log. If None, it is built.
+    :return: Log with the selected cases.
+    :raises ValueError: If one of the identifiers does not exist.
+    """
+    return log.select_cases((index or build_case_id_index(log)).find(case_ids))
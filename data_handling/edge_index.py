@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+
+INDEX_FILES = {
+    "edge_keys": "edge_index_keys.npy",
+    "edge_offsets": "edge_index_offsets.npy",
+    "edge_positions": "edge_index_positions.npy",
+    "activity_offsets": "activity_index_offsets.npy",
+    "activity_positions": "activity_index_positions.npy",
+}
+
+
+@dataclass(frozen=True)
+class EdgeIndex:
+    """
+    Inverted index from the directly follows edges and the activities of a log to the positions of their occurrences.
+    Occurrences are grouped by edge and by activity and are in the order of the log within each group,
+    so the occurrences of the edge edge_keys[i] are edge_positions[edge_offsets[i]:edge_offsets[i + 1]]
+    and the ones of the activity with code a are activity_positions[activity_offsets[a]:activity_offsets[a + 1]].
+    Edges are encoded as source_code * n_activities + target_code and an edge occurrence is found
+    at the position of its source event. Positions are stored as int32 if the log is small enough.
+    """
+    n_activities: int
+    edge_keys: npt.NDArray[np.int64]
+    edge_offsets: npt.NDArray[np.int64]
+    edge_positions: npt.NDArray[np.int32 | np.int64]
+    activity_offsets: npt.NDArray[np.int64]
+    activity_positions: npt.NDArray[np.int32 | np.int64]
+
+    def edge_occurrences(self, source: int, target: int) -> npt.NDArray[np.int64]:
+        """
+        :param source: Code of the source activity.
+        :param target: Code of the target activity.
+        :return: Positions of the source events of all occurrences of the edge, in the order of the log.
+        """
+        key = source * self.n_activities + target
+        edge = int(np.searchsorted(self.edge_keys, key))
+        if edge == len(self.edge_keys) or self.edge_keys[edge] != key:
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(self.edge_positions[self.edge_offsets[edge]:self.edge_offsets[edge + 1]], dtype=np.int64)
+
+    def activity_occurrences(self, code: int) -> npt.NDArray[np.int64]:
+        """
+        :param code: Code of the activity.
+        :return: Positions of all events of the activity, in the order of the log.
+        """
+        return np.asarray(self.activity_positions[self.activity_offsets[code]:self.activity_offsets[code + 1]],
+                          dtype=np.int64)
+
+
+def _group_positions(keys: npt.NDArray[np.int64], positions: npt.NDArray[np.int64],
+                     dtype: type[np.int32] | type[np.int64]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64],
+                                                                      npt.NDArray[np.int32 | np.int64]]:
+    # The stable sort keeps the occurrences of each key in the order of the log.
+    order = np.argsort(keys, kind="stable")
+    unique_keys, counts = np.unique(keys[order], return_counts=True)
+    offsets = np.zeros(len(unique_keys) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return unique_keys.astype(np.int64), offsets, positions[order].astype(dtype)
+
+
+def build_edge_index(log: EncodedLog) -> EdgeIndex:
+    """
+    Builds the index of all edges and activities of a log in one pass over its activity codes.
+    :param log: Encoded, possibly memory-mapped, log.
+    :return: Index of the log.
+    """
+    dtype = np.int32 if log.n_events <= np.iinfo(np.int32).max else np.int64
+    codes = np.asarray(log.codes, dtype=np.int64)
+    positions = log.directly_follows_positions()
+    edge_keys, edge_offsets, edge_positions = _group_positions(
+        codes[positions] * log.n_activities + codes[positions + 1], positions, dtype)
+    activity_offsets = np.zeros(log.n_activities + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=log.n_activities), out=activity_offsets[1:])
+    activity_positions: npt.NDArray[np.int32 | np.int64] = np.argsort(codes, kind="stable").astype(dtype)
+    return EdgeIndex(n_activities=log.n_activities, edge_keys=edge_keys, edge_offsets=edge_offsets,
+                     edge_positions=edge_positions, activity_offsets=activity_offsets,
+                     activity_positions=activity_positions)
+
+
+def save_edge_index(index: EdgeIndex, directory: Path) -> None:
+    """
+    Stores an index next to the files of its encoded log.
+    :param index: Index.
+    :param directory: Directory the files are written to.
+    """
+    for field, file_name in INDEX_FILES.items():
+        np.save(directory / file_name, getattr(index, field))
+
+
+def load_edge_index(directory: Path, n_activities: int) -> EdgeIndex | None:
+    """
+    Loads an index stored with save_edge_index. The arrays are memory-mapped read only.
+    :param directory: Directory containing the files.
+    :param n_activities: Number of activities of the log the index was built from.
+    :return: The index or None if no index is stored in the directory.
+    """
+    if not all((directory / file_name).exists() for file_name in INDEX_FILES.values()):
+        return None
+    arrays = {field: np.load(directory / file_name, mmap_mode="r") for field, file_name in INDEX_FILES.items()}
+    return EdgeIndex(n_activities=n_activities, **arrays)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class EncodedLog:
+    """
+    Columnar, integer encoded representation of an event log.
+    Events are sorted by case (cases in order of their first appearance) and by timestamp within each case,
+    so the events of case i are found at the positions case_offsets[i] to case_offsets[i + 1].
+    """
+    activities: list[str]
+    case_ids: list[str]
+    codes: npt.NDArray[np.int32]
+    timestamps: npt.NDArray[np.int64]
+    case_offsets: npt.NDArray[np.int64]
+    case_first_positions: npt.NDArray[np.int64]
+
+    @property
+    def n_events(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_cases(self) -> int:
+        return len(self.case_offsets) - 1
+
+    @property
+    def n_activities(self) -> int:
+        return len(self.activities)
+
+    def case_lengths(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.case_offsets)
+
+    def event_case_indices(self) -> npt.NDArray[np.int64]:
+        """
+        Calculates the index of the case each event belongs to.
+        :return: Array with one case index per event.
+        """
+        return np.repeat(np.arange(self.n_cases, dtype=np.int64), self.case_lengths())
+
+    def directly_follows_positions(self) -> npt.NDArray[np.int64]:
+        """
+        Finds the events that are directly followed by another event of the same case.
+        :return: Positions of the events, in ascending order.
+        """
+        same_case = np.ones(max(self.n_events - 1, 0), dtype=bool)
+        same_case[self.case_offsets[1:-1] - 1] = False
+        return np.flatnonzero(same_case).astype(np.int64)
+
+    def select_cases(self, case_indices: npt.NDArray[np.int64]) -> EncodedLog:
+        """
+        Creates a log containing only the given cases.
+        Activity codes are kept, so results of different selections can be merged.
+        :param case_indices: Indices of the cases that should be kept.
+        :return: Log with the selected cases in the given order.
+        """
+        starts = self.case_offsets[case_indices]
+        lengths = self.case_offsets[case_indices + 1] - starts
+        offsets = np.zeros(len(case_indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+        return EncodedLog(activities=self.activities,
+                          case_ids=[self.case_ids[i] for i in case_indices.tolist()],
+                          codes=self.codes[positions],
+                          timestamps=self.timestamps[positions],
+                          case_offsets=offsets,
+                          case_first_positions=self.case_first_positions[case_indices])
+
+    def select_events(self, event_mask: npt.NDArray[np.bool_]) -> EncodedLog:
+        """
+        Creates a log containing only the given events. Cases without any remaining event are removed.
+        :param event_mask: Boolean mask with one entry per event.
+        :return: Log with the selected events.
+        """
+        lengths = np.bincount(self.event_case_indices()[event_mask], minlength=self.n_cases)
+        kept_cases = np.flatnonzero(lengths)
+        offsets = np.zeros(len(kept_cases) + 1, dtype=np.int64)
+        np.cumsum(lengths[kept_cases], out=offsets[1:])
+        return EncodedLog(activities=self.activities,
+                          case_ids=[self.case_ids[i] for i in kept_cases.tolist()],
+                          codes=self.codes[event_mask],
+                          timestamps=self.timestamps[event_mask],
+                          case_offsets=offsets,
+                          case_first_positions=self.case_first_positions[kept_cases])
+
+
+def encode_log(data: pd.DataFrame) -> EncodedLog:
+    """
+    Encodes a dataframe into an EncodedLog.
+    Activity codes follow the lexicographic order of the activity names.
+    :param data: Dataframe with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    :return: Encoded log.
+    """
+    case_codes, case_ids = pd.factorize(data["case:concept:name"], sort=False)
+    activity_codes, activities = pd.factorize(data["concept:name"], sort=True)
+    timestamps = data["time:timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    order = np.lexsort((timestamps, case_codes))
+    case_lengths = np.bincount(case_codes, minlength=len(case_ids))
+    case_offsets = np.zeros(len(case_ids) + 1, dtype=np.int64)
+    np.cumsum(case_lengths, out=case_offsets[1:])
+    case_first_positions = np.unique(case_codes, return_index=True)[1].astype(np.int64)
+    return EncodedLog(activities=[str(activity) for activity in activities],
+                      case_ids=[str(case_id) for case_id in case_ids],
+                      codes=activity_codes[order].astype(np.int32),
+                      timestamps=timestamps[order],
+                      case_offsets=case_offsets,
+                      case_first_positions=case_first_positions)
+
+
+def decode_log(log: EncodedLog) -> pd.DataFrame:
+    """
+    Turns an EncodedLog back into a dataframe.
+    :param log: Encoded log.
+    :return: Dataframe with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    """
+    return pd.DataFrame({
+        "case:concept:name": np.asarray(log.case_ids, dtype=object)[log.event_case_indices()],
+        "concept:name": np.asarray(log.activities, dtype=object)[log.codes],
+        "time:timestamp": log.timestamps.view("datetime64[ns]"),
+    })
@@ -0,0 +1,156 @@
+import gzip
+from collections.abc import Callable, Iterator
+from functools import cache
+from io import BufferedReader
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from data_handling.columnar_storage import EVENT_COLUMNS, PARSE_BYTES_PER_EVENT, events_per_chunk, spill_events
+from data_handling.encoded_log import EncodedLog
+from model.input_model import ColumnMapping
+
+FILE_FORMATS = {".csv": "csv", ".xes": "xes"}
+
+
+@cache
+def _iterparse() -> Callable[..., Iterator[tuple[str, Any]]]:
+    """
+    :return: defusedxml's iterparse if it is installed, otherwise the one of the standard library.
+    """
+    try:
+        from defusedxml.ElementTree import iterparse
+    except ImportError:
+        # Files are only read from the configured data directory.
+        from xml.etree.ElementTree import iterparse  # noqa: S405
+    parse: Callable[..., Iterator[tuple[str, Any]]] = iterparse
+    return parse
+
+
+def _open(source: Path) -> gzip.GzipFile | BufferedReader:
+    return gzip.open(source, "rb") if source.suffix == ".gz" else source.open("rb")
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _attribute(element: Any, key: str) -> str | None:
+    for child in element:
+        if child.get("key") == key:
+            value: str | None = child.get("value")
+            return value
+    return None
+
+
+def _events_frame(case_ids: list[str], activities: list[str], timestamps: list[str]) -> pd.DataFrame:
+    return pd.DataFrame(dict(zip(EVENT_COLUMNS, (case_ids, activities, timestamps), strict=True)), dtype=str)
+
+
+def read_csv_chunks(source: Path, column_mapping: ColumnMapping, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Reads the events of a csv event log in chunks.
+    :param source: Path of the csv file, optionally gzip compressed.
+    :param column_mapping: Names of the columns with the case identifier, the activity and the timestamp.
+    :param chunk_size: Number of events per chunk.
+    :return: Iterator over chunks with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    """
+    columns = [column_mapping.case_id, column_mapping.activity, column_mapping.timestamp]
+    if len(set(columns)) != len(columns):
+        raise ValueError("The case identifier, activity and timestamp have to be read from different columns.")
+    renaming = dict(zip(columns, EVENT_COLUMNS, strict=True))
+    with pd.read_csv(source, usecols=columns, dtype=str, keep_default_na=False, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk.rename(columns=renaming)[EVENT_COLUMNS]
+
+
+def read_xes_chunks(source: Path, column_mapping: ColumnMapping, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Reads the events of a xes event log in chunks of whole traces, parsing the file incrementally.
+    Parsed elements are cleared, so memory does not grow with the size of the file.
+    :param source: Path of the xes file, optionally gzip compressed.
+    :param column_mapping: Keys of the trace attribute with the case identifier
+    and of the event attributes with the activity and the timestamp.
+    :param chunk_size: Number of events after which a chunk is returned at the end of the next trace.
+    :return: Iterator over chunks with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    """
+    # Trace attributes are prefixed with "case:" in dataframes but not in xes files.
+    case_key = column_mapping.case_id.removeprefix("case:")
+    case_ids: list[str] = []
+    activities: list[str] = []
+    timestamps: list[str] = []
+    trace_activities: list[str] = []
+    trace_timestamps: list[str] = []
+    root = None
+    with _open(source) as file:
+        for event, element in _iterparse()(file, events=("start", "end")):
+            if root is None:
+                root = element
+            if event != "end":
+                continue
+            tag = _local_name(element.tag)
+            if tag == "event":
+                activity = _attribute(element, column_mapping.activity)
+                timestamp = _attribute(element, column_mapping.timestamp)
+                if activity is None or timestamp is None:
+                    raise ValueError(f"Events need the attributes {column_mapping.activity} "
+                                     f"and {column_mapping.timestamp}.")
+                trace_activities.append(activity)
+                trace_timestamps.append(timestamp)
+                element.clear()
+            elif tag == "trace":
+                case_id = _attribute(element, case_key)
+                if case_id is None:
+                    raise ValueError(f"Traces need the attribute {case_key}.")
+                case_ids.extend([case_id] * len(trace_activities))
+                activities.extend(trace_activities)
+                timestamps.extend(trace_timestamps)
+                trace_activities.clear()
+                trace_timestamps.clear()
+                root.clear()
+                if len(case_ids) >= chunk_size:
+                    yield _events_frame(case_ids, activities, timestamps)
+                    case_ids, activities, timestamps = [], [], []
+    if case_ids:
+        yield _events_frame(case_ids, activities, timestamps)
+
+
+def detect_format(source: Path) -> str:
+    """
+    :param source: Path of an event log.
+    :return: Format of the event log, from the extension of the file name, ignoring a .gz extension.
+    :raises ValueError: If the format is not supported.
+    """
+    suffix = Path(source.stem).suffix if source.suffix == ".gz" else source.suffix
+    if suffix.lower() not in FILE_FORMATS:
+        raise ValueError(f"Unknown format of {source.name}. Expected one of {', '.join(FILE_FORMATS)}.")
+    return FILE_FORMATS[suffix.lower()]
+
+
+def import_event_log(source: Path, directory: Path, memory_budget: int, file_format: str | None = None,
+                     column_mapping: ColumnMapping | None = None) -> EncodedLog:
+    """
+    Streams a csv or xes event log into memory-mapped columnar files sorted by case,
+    the file counterpart of transform_dict followed by encode_log.
+    Only one chunk of parsed events is kept in memory at a time, so parsing needs bounded memory for any file size.
+    :param source: Path of the event log, optionally gzip compressed.
+    :param directory: Directory for the spill files.
+    :param memory_budget: Approximate upper bound of the memory used, in bytes.
+    :param file_format: csv or xes. If None, it is detected from the file name.
+    :param column_mapping: Columns or attributes the events are read from. If None, the xes standard names are used.
+    :return: Memory-mapped encoded log.
+    :raises ValueError: If the file can not be read or the events of a case are not sorted by time.
+    """
+    if column_mapping is None:
+        column_mapping = ColumnMapping()
+    file_format = file_format or detect_format(source)
+    chunk_size = events_per_chunk(memory_budget, PARSE_BYTES_PER_EVENT)
+    readers = {"csv": read_csv_chunks, "xes": read_xes_chunks}
+    if file_format not in readers:
+        raise ValueError(f"Unknown format {file_format}. Expected one of {', '.join(readers)}.")
+    try:
+        return spill_events(readers[file_format](source, column_mapping, chunk_size), directory, memory_budget)
+    except SyntaxError as e:
+        # Raised by the xml parser for malformed files.
+        raise ValueError(f"{source.name} is not a valid xes file: {e}") from e
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from data_handling.encoded_log import EncodedLog
+from model.input_model import FilterParameters
+
+NO_LIMIT = np.iinfo(np.int64).max
+
+
+def _to_nanoseconds(timestamp: datetime | None, default: int) -> int:
+    """
+    Converts a timestamp to nanoseconds since 1970-01-01, in UTC for timezone aware timestamps.
+    """
+    if timestamp is None:
+        return default
+    converted = pd.Timestamp(timestamp)
+    if converted.tzinfo is not None:
+        converted = converted.tz_convert("UTC").tz_localize(None)
+    return int(converted.value)
+
+
+def _activity_mask(log: EncodedLog, filters: FilterParameters) -> npt.NDArray[np.bool_] | None:
+    """
+    Calculates which activities are kept by the include and exclude lists.
+    :return: Boolean mask with one entry per activity or None if all activities are kept.
+    """
+    if filters.include_activities is None and filters.exclude_activities is None:
+        return None
+    activities = np.asarray(log.activities, dtype=object)
+    kept = np.ones(log.n_activities, dtype=bool)
+    if filters.include_activities is not None:
+        kept &= np.isin(activities, filters.include_activities)
+    if filters.exclude_activities is not None:
+        kept &= ~np.isin(activities, filters.exclude_activities)
+    return kept
+
+
+def filter_log(log: EncodedLog, filters: FilterParameters) -> EncodedLog:
+    """
+    Applies the filters to an encoded log with vectorized masks.
+    First, cases are selected by their time range if time_mode is 'contained' or 'intersecting'.
+    Then events are removed by their timestamp if time_mode is 'events', and by their activity.
+    Finally, cases are selected by the number of their remaining events.
+    :param log: Encoded, possibly memory-mapped, log.
+    :param filters: Filter parameters.
+    :return: Filtered log.
+    """
+    start = _to_nanoseconds(filters.start_time, -NO_LIMIT)
+    end = _to_nanoseconds(filters.end_time, NO_LIMIT)
+    if filters.time_mode != "events" and (filters.start_time or filters.end_time):
+        first_timestamps = log.timestamps[log.case_offsets[:-1]]
+        last_timestamps = log.timestamps[log.case_offsets[1:] - 1]
+        if filters.time_mode == "contained":
+            case_mask = (first_timestamps >= start) & (last_timestamps < end)
+        else:
+            case_mask = (last_timestamps >= start) & (first_timestamps < end)
+        log = log.select_cases(np.flatnonzero(case_mask))
+    event_mask = np.ones(log.n_events, dtype=bool)
+    if filters.time_mode == "events" and (filters.start_time or filters.end_time):
+        event_mask &= (log.timestamps >= start) & (log.timestamps < end)
+    activity_mask = _activity_mask(log, filters)
+    if activity_mask is not None:
+        event_mask &= activity_mask[log.codes]
+    if not event_mask.all():
+        log = log.select_events(event_mask)
+    if filters.min_trace_length is not None or filters.max_trace_length is not None:
+        lengths = log.case_lengths()
+        min_length = filters.min_trace_length or 0
+        max_length = NO_LIMIT if filters.max_trace_length is None else filters.max_trace_length
+        log = log.select_cases(np.flatnonzero((lengths >= min_length) & (lengths <= max_length)))
+    return log
@@ -0,0 +1,64 @@
+import json
+from collections.abc import Callable
+from functools import cache
+from typing import Any
+
+import pandas as pd
+
+from data_handling.data_validation import validate_and_transform
+from model.input_model import DatasetBody, InputBody
+
+
+@cache
+def _json_loads() -> Callable[[bytes], Any]:
+    """
+    :return: orjson's parser if it is installed, otherwise the one of the standard library.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+
+def parse_input_body(body: bytes) -> tuple[InputBody, pd.DataFrame | None]:
+    """
+    Parses the body of a discovery request without validating every event with pydantic.
+    Only the envelope and the parameters are validated by pydantic;
+    the data is validated and turned into a DataFrame column by column.
+    :param body: Raw json body with the structure of InputBody.
+    :return: Request without its data and the data as returned by transform_dict, if the request contains data.
+    :raises ValueError: If the body is not valid json or the data does not match the expected format.
+    :raises TypeError: If values of the data have the wrong type.
+    :raises pydantic.ValidationError: If the envelope or the parameters are invalid.
+    """
+    document = _parse_document(body)
+    data = document.pop("data", None)
+    # An empty placeholder lets pydantic check that exactly one of data and dataset_id is given.
+    request = InputBody.model_validate({**document, "data": None if data is None else {}})
+    request.data = None
+    if data is None:
+        return request, None
+    return request, validate_and_transform(data)
+
+
+def parse_dataset_body(body: bytes) -> pd.DataFrame:
+    """
+    Parses the body of a request storing a dataset like parse_input_body, without validating every event with pydantic.
+    :param body: Raw json body with the structure of DatasetBody.
+    :return: The data as returned by transform_dict.
+    :raises ValueError: If the body is not valid json or the data does not match the expected format.
+    :raises TypeError: If values of the data have the wrong type.
+    :raises pydantic.ValidationError: If the body does not contain data.
+    """
+    document = _parse_document(body)
+    data = document.pop("data", None)
+    DatasetBody.model_validate({**document, **({} if data is None else {"data": {}})})
+    return validate_and_transform(data)
+
+
+def _parse_document(body: bytes) -> dict[str, Any]:
+    document = _json_loads()(body)
+    if not isinstance(document, dict):
+        raise ValueError("The request body has to be a json object.")
+    return document
@@ -0,0 +1,144 @@
+from collections.abc import Callable
+from functools import cache
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+# Kernels for scans that run sequentially within each case. The events of a case are stored consecutively,
+# so the events of case i are found at the positions offsets[i] to offsets[i + 1] (as in EncodedLog).
+# Every kernel is written once as a loop, which is compiled with numba if it is installed,
+# and once with vectorized numpy operations, which is used otherwise.
+
+
+def _segments_sorted_loop(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]) -> bool:
+    for case in range(len(offsets) - 1):
+        for position in range(offsets[case] + 1, offsets[case + 1]):
+            if values[position] < values[position - 1]:
+                return False
+    return True
+
+
+def _segment_min_max_loop(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+                          ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    minima = np.empty(len(offsets) - 1, dtype=np.int64)
+    maxima = np.empty(len(offsets) - 1, dtype=np.int64)
+    for case in range(len(offsets) - 1):
+        minimum = values[offsets[case]]
+        maximum = values[offsets[case]]
+        for position in range(offsets[case] + 1, offsets[case + 1]):
+            minimum = min(minimum, values[position])
+            maximum = max(maximum, values[position])
+        minima[case] = minimum
+        maxima[case] = maximum
+    return minima, maxima
+
+
+def _segmented_cumsum_loop(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    sums = np.empty(len(values), dtype=np.int64)
+    for case in range(len(offsets) - 1):
+        total = 0
+        for position in range(offsets[case], offsets[case + 1]):
+            total += values[position]
+            sums[position] = total
+    return sums
+
+
+def _segments_sorted_numpy(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]) -> bool:
+    decreasing = values[1:] < values[:-1]
+    boundaries = offsets[1:-1]
+    decreasing[boundaries[(boundaries > 0) & (boundaries < len(values))] - 1] = False
+    return not bool(decreasing.any())
+
+
+def _segment_min_max_numpy(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+                           ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    if len(offsets) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    minima: npt.NDArray[np.int64] = np.minimum.reduceat(values, offsets[:-1])
+    maxima: npt.NDArray[np.int64] = np.maximum.reduceat(values, offsets[:-1])
+    return minima, maxima
+
+
+def _segmented_cumsum_numpy(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+                            ) -> npt.NDArray[np.int64]:
+    sums = np.cumsum(values, dtype=np.int64)
+    preceding = np.concatenate((np.zeros(1, dtype=np.int64), sums))[offsets[:-1]]
+    result: npt.NDArray[np.int64] = sums - np.repeat(preceding, np.diff(offsets))
+    return result
+
+
+@cache
+def _jit_kernels() -> dict[str, Callable[..., Any]] | None:
+    """
+    :return: The loop kernels compiled by numba if it is installed, otherwise None.
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    jit = numba.njit(cache=True, nogil=True)
+    return {"segments_sorted": jit(_segments_sorted_loop),
+            "segment_min_max": jit(_segment_min_max_loop),
+            "segmented_cumsum": jit(_segmented_cumsum_loop)}
+
+
+def kernel_backend() -> str:
+    """
+    :return: 'numba' if the kernels are compiled with numba, otherwise 'numpy'.
+    """
+    return "numpy" if _jit_kernels() is None else "numba"
+
+
+def case_segments(case_codes: npt.NDArray[np.int64]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Orders events by case, keeping the order of the events within each case.
+    :param case_codes: Code of the case of each event, from 0 to the number of cases - 1.
+    :return: Positions of the events in case order and the offsets of the cases in this order.
+    """
+    order: npt.NDArray[np.int64] = np.argsort(case_codes, kind="stable").astype(np.int64)
+    offsets = np.zeros(int(case_codes.max(initial=-1)) + 2, dtype=np.int64)
+    np.cumsum(np.bincount(case_codes), out=offsets[1:])
+    return order, offsets
+
+
+def segments_sorted(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]) -> bool:
+    """
+    Checks whether the values are non-decreasing within each case.
+    :param values: Values of the events in case order.
+    :param offsets: Offsets of the cases.
+    :return: True if no value is smaller than the preceding value of its case.
+    """
+    kernels = _jit_kernels()
+    if kernels is None:
+        return _segments_sorted_numpy(values, offsets)
+    return bool(kernels["segments_sorted"](values, offsets))
+
+
+def segment_min_max(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+                    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Calculates the smallest and the largest value of each case.
+    :param values: Values of the events in case order.
+    :param offsets: Offsets of the cases, which must not be empty.
+    :return: Minimum and maximum per case.
+    """
+    kernels = _jit_kernels()
+    if kernels is None:
+        return _segment_min_max_numpy(values, offsets)
+    minima, maxima = kernels["segment_min_max"](values, offsets)
+    return minima, maxima
+
+
+def segmented_cumsum(values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """
+    Calculates the running sum of the values, restarting at each case.
+    :param values: Values of the events in case order.
+    :param offsets: Offsets of the cases.
+    :return: Sum of the values of each event and the preceding events of its case.
+    """
+    kernels = _jit_kernels()
+    if kernels is None:
+        return _segmented_cumsum_numpy(values, offsets)
+    sums: npt.NDArray[np.int64] = kernels["segmented_cumsum"](values, offsets)
+    return sums
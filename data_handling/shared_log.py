@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+
+# Arrays stored in the shared memory block, in this order: name and dtype.
+_FIELDS = (("codes", np.int32), ("timestamps", np.int64), ("case_offsets", np.int64),
+           ("case_first_positions", np.int64), ("case_id_offsets", np.int64), ("case_id_bytes", np.uint8))
+
+
+@dataclass(frozen=True)
+class SharedLogHandle:
+    """
+    Reference to an encoded log in a shared memory block that can be sent to another process.
+    Only the activity names and the array lengths are pickled, the events are read from the block.
+    """
+    name: str
+    activities: list[str]
+    lengths: tuple[int, ...]
+
+
+def _layout(lengths: tuple[int, ...]) -> list[tuple[str, np.dtype, int, int]]:
+    layout = []
+    offset = 0
+    for (field, dtype), length in zip(_FIELDS, lengths, strict=True):
+        item_size = np.dtype(dtype).itemsize
+        offset = -(-offset // item_size) * item_size
+        layout.append((field, np.dtype(dtype), offset, length))
+        offset += item_size * length
+    return layout
+
+
+def share_log(log: EncodedLog) -> tuple[SharedMemory, SharedLogHandle]:
+    """
+    Copies an encoded log into a new shared memory block.
+    The caller has to close and unlink the block once it is no longer used.
+    :param log: Encoded log.
+    :return: Shared memory block and the handle to attach to it from another process.
+    """
+    encoded_ids = [case_id.encode() for case_id in log.case_ids]
+    case_id_offsets = np.zeros(log.n_cases + 1, dtype=np.int64)
+    np.cumsum([len(case_id) for case_id in encoded_ids], out=case_id_offsets[1:])
+    arrays: dict[str, npt.NDArray[np.generic]] = {
+        "codes": log.codes, "timestamps": log.timestamps, "case_offsets": log.case_offsets,
+        "case_first_positions": log.case_first_positions, "case_id_offsets": case_id_offsets,
+        "case_id_bytes": np.frombuffer(b"".join(encoded_ids), dtype=np.uint8)}
+    lengths = tuple(len(arrays[field]) for field, _ in _FIELDS)
+    layout = _layout(lengths)
+    size = max(layout[-1][2] + layout[-1][3], 1)
+    block = SharedMemory(create=True, size=size)
+    for field, dtype, offset, length in layout:
+        np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset)[:] = arrays[field]
+    return block, SharedLogHandle(name=block.name, activities=log.activities, lengths=lengths)
+
+
+def attach_log(handle: SharedLogHandle) -> EncodedLog:
+    """
+    Reads an encoded log from a shared memory block created by share_log.
+    The arrays are copied out of the block, so the block can be closed and unlinked by its creator at any time.
+    :param handle: Handle returned by share_log.
+    :return: Encoded log.
+    """
+    block = SharedMemory(name=handle.name)
+    try:
+        arrays: dict[str, npt.NDArray[np.generic]] = {
+            field: np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset).copy()
+            for field, dtype, offset, length in _layout(handle.lengths)}
+    finally:
+        block.close()
+    case_id_offsets = arrays["case_id_offsets"].tolist()
+    case_id_bytes = arrays["case_id_bytes"].tobytes()
+    return EncodedLog(activities=handle.activities,
+                      case_ids=[case_id_bytes[start:end].decode()
+                                for start, end in zip(case_id_offsets[:-1], case_id_offsets[1:], strict=True)],
+                      codes=arrays["codes"].astype(np.int32, copy=False),
+                      timestamps=arrays["timestamps"].astype(np.int64, copy=False),
+                      case_offsets=arrays["case_offsets"].astype(np.int64, copy=False),
+                      case_first_positions=arrays["case_first_positions"].astype(np.int64, copy=False))
@@ -0,0 +1,18 @@
+"""
+Gunicorn configuration for running the service with several worker processes.
+The app is imported and warmed up once in the master process before the workers are forked,
+so the workers share the imported modules copy-on-write and are ready immediately.
+Admission control budgets apply per worker.
+"""
+import os
+
+from helpers import warm_up
+
+bind = os.getenv("BIND", "0.0.0.0:8000")  # noqa: S104
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server: object) -> None:
+    warm_up.warm_up()
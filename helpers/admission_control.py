@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+
+from helpers.cancellation import CancellationToken
+
+# Peak memory per event of the parsed dataframe (about 140 bytes) and the encoded log, durations and metrics
+# of the pipeline (about 60 to 75 bytes), as measured with benchmarks/pipeline_memory.py.
+BYTES_PER_EVENT = 220
+# Memory per edge of the graph and the edge statistics; a graph has at most one edge per pair of activities.
+BYTES_PER_EDGE = 1500
+# Additional memory per event for the string labels created by add_counts.
+BYTES_PER_COUNTED_EVENT = 200
+# add_states builds an int64 matrix with the activity and one cumulative count per state activity,
+# which exists about three times at its peak: the segmented cumsums, the stacked matrix and its sorted copy.
+BYTES_PER_STATE_CELL = 8 * 3
+# Additional memory per event for the labels and codes created by add_states.
+BYTES_PER_STATED_EVENT = 32
+# Interval in which queued requests check whether they were cancelled.
+WAIT_SLICE_SECONDS = 0.1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class RequestCost:
+    memory: int
+    cpu: int = 1
+
+
+class AdmissionMetrics(BaseModel):
+    queue_depth: int
+    running: int
+    memory_in_use: int
+    memory_budget: int
+    admitted: int
+    rejected_queue_full: int
+    rejected_timeout: int
+    rejected_too_large: int
+
+
+def estimate_cost(n_events: int, n_activities: int, add_counts: bool = False,
+                  n_state_activities: int = 0) -> RequestCost:
+    """
+    Estimates the peak memory of a discovery request.
+    :param n_events: Number of events of the request.
+    :param n_activities: Number of distinct activities of the request.
+    :param add_counts: If counts are added to the events.
+    :param n_state_activities: Number of state changing events if states are added to the events, otherwise 0.
+    :return: Estimated cost.
+    """
+    memory = n_events * BYTES_PER_EVENT + min(n_activities ** 2, n_events) * BYTES_PER_EDGE
+    if add_counts:
+        memory += n_events * BYTES_PER_COUNTED_EVENT
+    if n_state_activities:
+        memory += n_events * (BYTES_PER_STATED_EVENT + (n_state_activities + 1) * BYTES_PER_STATE_CELL)
+    return RequestCost(memory=memory)
+
+
+class AdmissionController:
+    """
+    Limits the memory and cpu used by concurrently running requests.
+    Requests that do not fit into the budgets wait in a first in, first out queue.
+    Requests are rejected if the queue is full (429), if they waited too long (503)
+    or if they could never fit into the memory budget (503).
+    Queued requests leave the queue as soon as their cancellation token is cancelled or their deadline has passed.
+    """
+
+    def __init__(self, memory_budget: int, cpu_slots: int, max_queue_length: int,
+                 queue_timeout_seconds: float) -> None:
+        self.memory_budget = memory_budget
+        self.cpu_slots = cpu_slots
+        self.max_queue_length = max_queue_length
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._condition = threading.Condition()
+        self._queue: deque[object] = deque()
+        self._memory_in_use = 0
+        self._cpu_in_use = 0
+        self._running = 0
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_timeout = 0
+        self._rejected_too_large = 0
+
+    def _fits(self, cost: RequestCost) -> bool:
+        return (self._memory_in_use + cost.memory <= self.memory_budget
+                and self._cpu_in_use + cost.cpu <= self.cpu_slots)
+
+    def _acquire(self, cost: RequestCost, token: CancellationToken | None) -> None:
+        with self._condition:
+            if cost.memory > self.memory_budget or cost.cpu > self.cpu_slots:
+                self._rejected_too_large += 1
+                raise AdmissionRejected(503, "The request needs more resources than the service has available.")
+            if len(self._queue) >= self.max_queue_length:
+                self._rejected_queue_full += 1
+                raise AdmissionRejected(429, "Too many requests are waiting. Try again later.")
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = time.monotonic() + self.queue_timeout_seconds
+            while self._queue[0] is not ticket or not self._fits(cost):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._leave_queue(ticket)
+                    self._rejected_timeout += 1
+                    raise AdmissionRejected(503, "The service is busy. Try again later.")
+                if token is None:
+                    self._condition.wait(remaining)
+                    continue
+                self._condition.wait(min(remaining, WAIT_SLICE_SECONDS))
+                if token.reason() is not None:
+                    self._leave_queue(ticket)
+                    token.check()
+            self._queue.popleft()
+            self._memory_in_use += cost.memory
+            self._cpu_in_use += cost.cpu
+            self._running += 1
+            self._admitted += 1
+            self._condition.notify_all()
+
+    def _leave_queue(self, ticket: object) -> None:
+        self._queue.remove(ticket)
+        # The next request in the queue may fit now.
+        self._condition.notify_all()
+
+    def _release(self, cost: RequestCost) -> None:
+        with self._condition:
+            self._memory_in_use -= cost.memory
+            self._cpu_in_use -= cost.cpu
+            self._running -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, cost: RequestCost, token: CancellationToken | None = None) -> Iterator[None]:
+        """
+        Waits until the request fits into the budgets and releases its resources afterwards.
+        :param cost: Estimated cost of the request.
+        :param token: Cancellation token of the request, checked while it waits in the queue.
+        :raises AdmissionRejected: If the request is not admitted.
+        :raises Cancelled: If the token is cancelled while the request waits in the queue.
+        """
+        self._acquire(cost, token)
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+    def metrics(self) -> AdmissionMetrics:
+        with self._condition:
+            return AdmissionMetrics(queue_depth=len(self._queue), running=self._running,
+                                    memory_in_use=self._memory_in_use, memory_budget=self.memory_budget,
+                                    admitted=self._admitted, rejected_queue_full=self._rejected_queue_full,
+                                    rejected_timeout=self._rejected_timeout,
+                                    rejected_too_large=self._rejected_too_large)
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+from pydantic import BaseModel
+
+# Reasons a calculation is cancelled for, with the status code and detail of the response.
+REASONS = {
+    "deadline": (504, "The deadline of the request was exceeded."),
+    "disconnected": (499, "The client disconnected."),
+}
+
+
+class Cancelled(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+    @property
+    def status_code(self) -> int:
+        return REASONS[self.reason][0]
+
+    @property
+    def detail(self) -> str:
+        return REASONS[self.reason][1]
+
+
+@dataclass(frozen=True)
+class SharedCancellationHandle:
+    """
+    Reference to a cancellation token that can be sent to a worker process.
+    The token is cancelled through a one byte shared memory block holding the code of the reason.
+    """
+    name: str
+    deadline: float | None
+
+
+class CancellationToken:
+    """
+    Cancellation state of one calculation, checked cooperatively at checkpoints between and within its steps.
+    A calculation is cancelled once its deadline has passed or once cancel is called, for example by
+    the thread watching the connection of the client. Deadlines are wall clock times, so they hold across processes.
+    """
+
+    def __init__(self, deadline: float | None = None) -> None:
+        self.created = time.time()
+        self.deadline = deadline
+        self._reason: str | None = None
+        self._block: SharedMemory | None = None
+        # Guards the shared memory block, which is closed when the context of shared ends.
+        self._lock = threading.Lock()
+
+    def set_timeout(self, seconds: float | None) -> None:
+        """
+        :param seconds: Seconds after the creation of the token after which the calculation is cancelled.
+        If None, it has no deadline.
+        """
+        self.deadline = None if seconds is None else self.created + seconds
+
+    def cancel(self, reason: str = "disconnected") -> None:
+        with self._lock:
+            self._reason = reason
+            if self._block is not None:
+                self._block.buf[0] = list(REASONS).index(reason) + 1
+
+    def reason(self) -> str | None:
+        """
+        :return: Why the calculation is cancelled, or None if it is not.
+        """
+        if self._reason is None:
+            with self._lock:
+                if self._block is not None and self._block.buf[0]:
+                    self._reason = list(REASONS)[self._block.buf[0] - 1]
+        if self._reason is None and self.deadline is not None and time.time() >= self.deadline:
+            return "deadline"
+        return self._reason
+
+    def check(self) -> None:
+        """
+        :raises Cancelled: If the calculation is cancelled.
+        """
+        reason = self.reason()
+        if reason is not None:
+            raise Cancelled(reason)
+
+    @contextmanager
+    def shared(self) -> Iterator[SharedCancellationHandle]:
+        """
+        Makes the token available to other processes while the context is open.
+        :return: Handle to attach to the token with attached_token.
+        """
+        block = SharedMemory(create=True, size=1)
+        with self._lock:
+            block.buf[0] = 0 if self._reason is None else list(REASONS).index(self._reason) + 1
+            self._block = block
+        try:
+            yield SharedCancellationHandle(name=block.name, deadline=self.deadline)
+        finally:
+            with self._lock:
+                self._block = None
+            block.close()
+            block.unlink()
+
+
+@contextmanager
+def attached_token(handle: SharedCancellationHandle) -> Iterator[CancellationToken]:
+    """
+    Attaches to a token shared by another process.
+    :param handle: Handle returned by CancellationToken.shared.
+    :return: Token that is cancelled when the shared token is cancelled.
+    """
+    token = CancellationToken(handle.deadline)
+    block = SharedMemory(name=handle.name)
+    token._block = block
+    try:
+        yield token
+    finally:
+        with token._lock:
+            token._block = None
+        block.close()
+
+
+_current_token: ContextVar[CancellationToken | None] = ContextVar("cancellation_token", default=None)
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken | None) -> Iterator[None]:
+    """
+    Makes the token the one checked by checkpoint in the current thread or task.
+    """
+    reset = _current_token.set(token)
+    try:
+        yield
+    finally:
+        _current_token.reset(reset)
+
+
+def checkpoint() -> None:
+    """
+    Stops the calculation running in the current scope if its token is cancelled.
+    :raises Cancelled: If the token of the current scope is cancelled.
+    """
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+class CancellationMetrics(BaseModel):
+    completed: int
+    cancelled_deadline: int
+    cancelled_disconnected: int
+    seconds_until_cancelled: float
+    estimated_seconds_saved: float
+
+
+class CancellationStatistics:
+    """
+    Counts cancelled calculations and estimates the compute time they saved.
+    The time a cancelled calculation would have needed is estimated from the mean time per event
+    of the calculations that completed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._completed_events = 0
+        self._completed_seconds = 0.0
+        self._cancelled = dict.fromkeys(REASONS, 0)
+        self._seconds_until_cancelled = 0.0
+        self._seconds_saved = 0.0
+
+    def record_completed(self, n_events: int, seconds: float) -> None:
+        with self._lock:
+            self._completed += 1
+            self._completed_events += n_events
+            self._completed_seconds += seconds
+
+    def record_cancelled(self, reason: str, n_events: int, seconds: float) -> None:
+        with self._lock:
+            self._cancelled[reason] += 1
+            self._seconds_until_cancelled += seconds
+            if self._completed_events:
+                expected_seconds = n_events * self._completed_seconds / self._completed_events
+                self._seconds_saved += max(expected_seconds - seconds, 0.0)
+
+    def metrics(self) -> CancellationMetrics:
+        with self._lock:
+            return CancellationMetrics(completed=self._completed, cancelled_deadline=self._cancelled["deadline"],
+                                       cancelled_disconnected=self._cancelled["disconnected"],
+                                       seconds_until_cancelled=self._seconds_until_cancelled,
+                                       estimated_seconds_saved=self._seconds_saved)
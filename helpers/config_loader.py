@@ -1,9 +1,11 @@
+from typing import Any
+
 import yaml
 
 
-def read_yaml() -> dict[str, list[str]]:
+def read_yaml() -> dict[str, Any]:
     with open("config.yml") as file:
-        config: dict[str, list[str]] = yaml.safe_load(file)
+        config: dict[str, Any] = yaml.safe_load(file)
         if "exclude" in config.keys():
             config["exclude"] = [] if config["exclude"] is None else config["exclude"]
         return config
@@ -0,0 +1,75 @@
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Any
+
+from pydantic import BaseModel
+
+from helpers.cancellation import CancellationToken
+
+# Interval in which waiting callers check whether they were cancelled.
+WAIT_SLICE_SECONDS = 0.1
+
+
+class SingleFlightMetrics(BaseModel):
+    in_flight: int
+    started: int
+    coalesced: int
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key.
+    The first caller of a key runs the function; callers of the same key that arrive while it runs
+    wait for it and get its result, or its exception, instead of running the function themselves.
+    Results are not kept once the call has finished.
+    Waiting callers check their own cancellation token between short waits, so a cancelled caller stops waiting
+    while the call keeps running for the others.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future[Any]] = {}
+        self._started = 0
+        self._coalesced = 0
+
+    def run(self, key: str, function: Callable[[], Any],
+            token: CancellationToken | None = None) -> tuple[Any, bool]:
+        """
+        Runs the function unless a call with the same key is already running.
+        :param key: Key identifying calls with the same result.
+        :param function: Function calculating the result.
+        :param token: Cancellation token of the caller, checked while it waits for a call that is already running.
+        :return: Result and whether it was shared from a call that was already running.
+        :raises Cancelled: If the token is cancelled while waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Future()
+                self._started += 1
+                leader = True
+            else:
+                self._coalesced += 1
+                leader = False
+        if not leader:
+            while True:
+                try:
+                    return call.result(timeout=WAIT_SLICE_SECONDS), True
+                except TimeoutError:
+                    if token is not None:
+                        token.check()
+        try:
+            result = function()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+        call.set_result(result)
+        return result, False
+
+    def metrics(self) -> SingleFlightMetrics:
+        with self._lock:
+            return SingleFlightMetrics(in_flight=len(self._calls), started=self._started, coalesced=self._coalesced)
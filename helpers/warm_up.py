@@ -0,0 +1,27 @@
+import threading
+
+import pandas as pd
+
+_ready = threading.Event()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def warm_up() -> None:
+    """
+    Imports the modules of the discovery pipeline, which are imported lazily because of their startup time,
+    and runs the pipeline once on a tiny log, so the first request does not pay for it.
+    """
+    from retrieval.metrics_retrieval import get_metrics
+    from retrieval.process_model_retrieval import get_process_model
+
+    data = pd.DataFrame({
+        "case:concept:name": ["T1", "T1", "T2"],
+        "concept:name": ["A", "B", "A"],
+        "time:timestamp": pd.to_datetime(["2024-01-01T00:00:00", "2024-01-02T00:00:00", "2024-01-01T00:00:00"]),
+    })
+    get_process_model(data, "start_node", "end_node")
+    get_metrics(data, None, 1)
+    _ready.set()
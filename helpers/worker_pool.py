@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from threading import Barrier
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class WorkerStatistics(BaseModel):
+    pid: int
+    jobs: int
+    busy_seconds: float
+    utilization: float
+
+
+class WorkerPoolMetrics(BaseModel):
+    n_workers: int
+    max_jobs_per_worker: int
+    running: int
+    completed: int
+    workers: list[WorkerStatistics]
+
+
+def _timed_call(function: Callable[..., Any], *args: Any) -> tuple[int, float, float, Any]:
+    started = time.time()
+    result = function(*args)
+    return os.getpid(), started, time.time(), result
+
+
+# Seconds the start jobs wait for each other before the start of the pool fails.
+START_TIMEOUT_SECONDS = 120
+
+
+def _start_worker(barrier: Barrier) -> None:
+    # Blocks the worker until every worker runs a start job, so no worker runs two of them.
+    barrier.wait(START_TIMEOUT_SECONDS)
+
+
+class WorkerPool:
+    """
+    Pool of long-lived worker processes that run jobs outside of the process serving the requests.
+    Workers are started with the spawn method, run the initializer once, for example to import pm4py,
+    and are replaced after max_jobs_per_worker jobs, so memory that is not returned to the system is freed.
+    The time each worker spends on jobs is recorded to report its utilization.
+    """
+
+    def __init__(self, n_workers: int, max_jobs_per_worker: int,
+                 initializer: Callable[[], object] | None = None) -> None:
+        self.n_workers = n_workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=initializer, max_tasks_per_child=max_jobs_per_worker)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._completed = 0
+        self._first_seen: dict[int, float] = {}
+        self._jobs: dict[int, int] = {}
+        self._busy_seconds: dict[int, float] = {}
+
+    def start(self) -> None:
+        """
+        Starts the workers, so the first jobs do not wait for the initializer.
+        One start job is submitted per worker and each of them waits on a barrier until all of them run,
+        so the executor has to start every worker instead of reusing one that finished its start job.
+        The start jobs count towards max_jobs_per_worker, but not towards the busy time of the workers.
+        """
+        with multiprocessing.get_context("spawn").Manager() as manager:
+            barrier = manager.Barrier(self.n_workers)
+            futures = [self._executor.submit(_timed_call, _start_worker, barrier) for _ in range(self.n_workers)]
+            for future in futures:
+                pid, _, finished, _ = future.result()
+                self._record(pid, finished, finished)
+
+    def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Runs a function in one of the workers and waits for its result.
+        Function, arguments and result are pickled, so large inputs should be passed through shared memory.
+        :param function: Function defined at module level.
+        :param args: Arguments of the function.
+        :return: Result of the function.
+        """
+        with self._lock:
+            self._running += 1
+        try:
+            pid, started, finished, result = self._executor.submit(_timed_call, function, *args).result()
+        finally:
+            with self._lock:
+                self._running -= 1
+        self._record(pid, started, finished)
+        return result
+
+    def _record(self, pid: int, started: float, finished: float) -> None:
+        with self._lock:
+            self._completed += 1
+            self._first_seen.setdefault(pid, started)
+            self._jobs[pid] = self._jobs.get(pid, 0) + 1
+            self._busy_seconds[pid] = self._busy_seconds.get(pid, 0.0) + finished - started
+            if self._jobs[pid] >= self.max_jobs_per_worker:
+                # The worker exits after this job and is replaced by a new process.
+                for statistics in (self._first_seen, self._jobs, self._busy_seconds):
+                    statistics.pop(pid)
+
+    def metrics(self) -> WorkerPoolMetrics:
+        """
+        :return: Number of running and completed jobs and, per worker that ran a job,
+        its number of jobs, busy time and the share of time it was busy since its first job.
+        """
+        now = time.time()
+        with self._lock:
+            workers = [WorkerStatistics(pid=pid, jobs=self._jobs[pid], busy_seconds=self._busy_seconds[pid],
+                                        utilization=min(self._busy_seconds[pid] / max(now - first_seen, 1e-9), 1.0))
+                       for pid, first_seen in self._first_seen.items()]
+            return WorkerPoolMetrics(n_workers=self.n_workers, max_jobs_per_worker=self.max_jobs_per_worker,
+                                     running=self._running, completed=self._completed, workers=workers)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Literal, Self
+
+from pydantic import BaseModel, model_validator
 from pydantic_core import Url
 
 
@@ -8,18 +11,90 @@ class ActiveEventParameters(BaseModel):
     singular_events: list[str]
 
 
+class FilterParameters(BaseModel):
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+    time_mode: Literal["events", "contained", "intersecting"] = "intersecting"
+    include_activities: list[str] | None = None
+    exclude_activities: list[str] | None = None
+    min_trace_length: int | None = None
+    max_trace_length: int | None = None
+
+
+class SamplingParameters(BaseModel):
+    fraction: float
+    method: Literal["uniform", "stratified"] = "uniform"
+    seed: int = 0
+    confidence: float = 0.95
+
+
+class SimplificationParameters(BaseModel):
+    min_edge_frequency: int | None = None
+    top_k_edges_per_node: int | None = None
+    max_edges: int | None = None
+    max_nodes: int | None = None
+
+
+class LayoutParameters(BaseModel):
+    layer_spacing: float = 200
+    node_spacing: float = 80
+    ordering_sweeps: int = 4
+
+
 class InputParameters(BaseModel):
     active_events: ActiveEventParameters | None = None
     n_top_variants: int = 10
     reduce_complexity_by: float = 0
     add_counts: bool = False
+    max_count: int | None = None
     state_changing_events: list[str] | None = None
     start_node_name: str = "start_node"
     end_node_name: str = "end_node"
+    filters: FilterParameters | None = None
+    sampling: SamplingParameters | None = None
+    simplification: SimplificationParameters | None = None
+    layout: LayoutParameters | None = None
+    timeout_seconds: float | None = None
 
 
 class InputBody(BaseModel):
+    data: dict[str, dict[str, str]] | None = None
+    dataset_id: str | None = None
+    case_ids: list[str] | None = None
+    parameters: InputParameters
+    callback_url: Url | None = None
+    id: str | None = None
+
+    @model_validator(mode="after")
+    def check_data_source(self) -> Self:
+        if (self.data is None) == (self.dataset_id is None):
+            raise ValueError("Exactly one of data and dataset_id has to be provided.")
+        if self.case_ids is not None and self.dataset_id is None:
+            raise ValueError("case_ids can only be used together with dataset_id.")
+        return self
+
+
+class DatasetBody(BaseModel):
     data: dict[str, dict[str, str]]
+
+
+class ColumnMapping(BaseModel):
+    case_id: str = "case:concept:name"
+    activity: str = "concept:name"
+    timestamp: str = "time:timestamp"
+
+
+class FileInputBody(BaseModel):
+    path: str
+    format: Literal["csv", "xes"] | None = None
+    column_mapping: ColumnMapping | None = None
+    parameters: InputParameters
+    callback_url: Url | None = None
+    id: str | None = None
+
+
+class OutOfCoreInputBody(BaseModel):
+    path: str
     parameters: InputParameters
     callback_url: Url | None = None
     id: str | None = None
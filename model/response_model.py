@@ -25,6 +25,7 @@ class TimeBetweenEvents(BaseModel):
 
 class ActiveEvents(BaseModel):
     yearly: dict[str, int]
+    quarterly: dict[str, int]
     monthly: dict[str, int]
     weekly: dict[str, int]
 
@@ -35,23 +36,141 @@ class TopVariant(BaseModel):
     mean_duration: float
 
 
+class DurationHistogram(BaseModel):
+    bin_edges: list[float]
+    counts: list[int]
+
+
+class StepPerformance(BaseModel):
+    e1: str
+    e2: str
+    median: float
+    min: float
+    max: float
+    stdev: float
+    mean: float
+    cumulative_median: float
+    cumulative_mean: float
+
+
+class VariantProfile(BaseModel):
+    event_sequence: list[str]
+    frequency: int
+    steps: list[StepPerformance]
+
+
 class Metrics(BaseModel):
     n_traces: int | None = None
     n_events: int | None = None
     n_variants: int | None = None
     top_variants: dict[str, TopVariant] | None = None
     tbe: list[Connection] | None = None
+    variant_profiles: dict[str, VariantProfile] | None = None
     max_trace_length: int | None = None
     min_trace_length: int | None = None
     max_trace_duration: float | None = None
     min_trace_duration: float | None = None
+    trace_duration_quantiles: dict[str, float] | None = None
+    trace_duration_histogram: DurationHistogram | None = None
     active_events: ActiveEvents | None = None
     event_frequency_distr: dict[str, int] | None = None
     trace_length_distr: dict[str, int] | None = None
 
 
+class ConfidenceInterval(BaseModel):
+    estimate: float
+    lower: float
+    upper: float
+
+
+class EdgeFrequencyInterval(ConfidenceInterval):
+    e1: str
+    e2: str
+
+
+class SamplingSummary(BaseModel):
+    method: str
+    confidence: float
+    n_sampled_traces: int
+    n_traces: int
+    n_events: ConfidenceInterval
+    event_frequencies: dict[str, ConfidenceInterval]
+    edge_frequencies: list[EdgeFrequencyInterval]
+
+
+class NodePosition(BaseModel):
+    node: str
+    layer: int
+    x: float
+    y: float
+
+
+class GraphLayout(BaseModel):
+    nodes: list[NodePosition]
+    width: float
+    height: float
+
+
 class DiscoveryResponse(BaseModel):
     graph: Graph
     metrics: Metrics
     created: str
     id: str | None
+    sampling: SamplingSummary | None = None
+    layout: GraphLayout | None = None
+
+
+class CaseOccurrences(BaseModel):
+    case_id: str
+    positions: list[int]
+
+
+class EdgeCases(BaseModel):
+    source: str
+    target: str
+    n_occurrences: int
+    n_cases: int
+    cases: list[CaseOccurrences]
+
+
+class NodeCases(BaseModel):
+    activity: str
+    n_occurrences: int
+    n_cases: int
+    cases: list[CaseOccurrences]
+
+
+class EdgeDurations(BaseModel):
+    source: str
+    target: str
+    n_occurrences: int
+    histogram: DurationHistogram
+    yearly: dict[str, DurationHistogram]
+
+
+class ElapsedTime(BaseModel):
+    mean: float
+    stdev: float
+    min: float
+    max: float
+
+
+class NextStep(BaseModel):
+    activity: str
+    n_cases: int
+    probability: float
+    mean_elapsed: float
+
+
+class VariantPrefix(BaseModel):
+    prefix: list[str]
+    n_cases: int
+    n_ended: int
+    elapsed: ElapsedTime | None
+    next_steps: list[NextStep]
+
+
+class VariantCompletions(BaseModel):
+    prefix: list[str]
+    n_cases: int
+    completions: list[TopVariant]
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Protocol
+
+import numpy as np
+import pandas as pd
+
+from data_handling.activity_time_index import ActivityTimeIndex
+from data_handling.complexity_reduction import select_traces
+from data_handling.data_transformation import add_counts, add_counts_to_log, add_states, add_states_to_log
+from data_handling.encoded_log import EncodedLog, decode_log, encode_log
+from helpers import config_loader
+from model.input_model import ActiveEventParameters
+from model.response_model import Graph, Metrics
+from retrieval.metrics_retrieval import get_metrics
+from retrieval.out_of_core_retrieval import get_metrics_out_of_core
+from retrieval.process_model_retrieval import (
+    get_process_model,
+    get_process_model_from_log,
+    get_process_model_partitioned,
+)
+from retrieval.variant_engine import Variants, count_variants
+
+
+class PipelineBackend(Protocol):
+    """
+    Engine the steps of the discovery pipeline run on after the request was parsed and validated.
+    Each backend works on its own representation of the events, which is created by load.
+    All backends return the same graph and metrics for the same events and parameters.
+    """
+
+    def load(self, events: pd.DataFrame | EncodedLog) -> Any: ...
+
+    def encoded(self, events: Any) -> EncodedLog: ...
+
+    def variants(self, events: Any) -> Variants: ...
+
+    def select_traces(self, events: Any, variants: Variants) -> Any: ...
+
+    def add_counts(self, events: Any, max_count: int | None) -> Any: ...
+
+    def add_states(self, events: Any, state_changing_events: list[str]) -> Any: ...
+
+    def process_model(self, events: Any, start_node_name: str, end_node_name: str) -> Graph: ...
+
+    def metrics(self, events: Any, active_event_parameters: ActiveEventParameters | None, n_top_variants: int,
+                time_index: ActivityTimeIndex | None, variants: Variants) -> Metrics: ...
+
+
+def _n_partitions() -> int:
+    return int(config_loader.CONFIG.get("dfg_partitions", 1))
+
+
+class PandasBackend:
+    """
+    Runs the pipeline on dataframes, calculating the process model on the encoded events,
+    in parallel worker processes if it is split into partitions.
+    """
+
+    def load(self, events: pd.DataFrame | EncodedLog) -> pd.DataFrame:
+        return decode_log(events) if isinstance(events, EncodedLog) else events
+
+    def encoded(self, events: pd.DataFrame) -> EncodedLog:
+        return encode_log(events)
+
+    def variants(self, events: pd.DataFrame) -> Variants:
+        return count_variants(encode_log(events))
+
+    def select_traces(self, events: pd.DataFrame, variants: Variants) -> pd.DataFrame:
+        return select_traces(events, variants)
+
+    def add_counts(self, events: pd.DataFrame, max_count: int | None) -> pd.DataFrame:
+        return add_counts(events, max_count)
+
+    def add_states(self, events: pd.DataFrame, state_changing_events: list[str]) -> pd.DataFrame:
+        return add_states(events, state_changing_events)
+
+    def process_model(self, events: pd.DataFrame, start_node_name: str, end_node_name: str) -> Graph:
+        n_partitions = _n_partitions()
+        if n_partitions > 1:
+            return get_process_model_partitioned(events, start_node_name, end_node_name, n_partitions)
+        return get_process_model(events, start_node_name, end_node_name)
+
+    def metrics(self, events: pd.DataFrame, active_event_parameters: ActiveEventParameters | None,
+                n_top_variants: int, time_index: ActivityTimeIndex | None, variants: Variants) -> Metrics:
+        return get_metrics(events, active_event_parameters, n_top_variants, time_index, variants)
+
+
+class ColumnarBackend:
+    """
+    Runs the pipeline on integer encoded logs without pm4py and without decoding the events into a dataframe.
+    Event names are only materialized once per distinct activity, and the metrics are calculated
+    in chunks of cases within the memory budget of the out-of-core mode.
+    """
+
+    def load(self, events: pd.DataFrame | EncodedLog) -> EncodedLog:
+        return events if isinstance(events, EncodedLog) else encode_log(events)
+
+    def encoded(self, events: EncodedLog) -> EncodedLog:
+        return events
+
+    def variants(self, events: EncodedLog) -> Variants:
+        return count_variants(events)
+
+    def select_traces(self, events: EncodedLog, variants: Variants) -> EncodedLog:
+        kept = np.isin(np.asarray(events.case_ids, dtype=str), np.asarray(variants.case_ids, dtype=str))
+        return events.select_cases(np.flatnonzero(kept))
+
+    def add_counts(self, events: EncodedLog, max_count: int | None) -> EncodedLog:
+        return add_counts_to_log(events, max_count)
+
+    def add_states(self, events: EncodedLog, state_changing_events: list[str]) -> EncodedLog:
+        return add_states_to_log(events, state_changing_events)
+
+    def process_model(self, events: EncodedLog, start_node_name: str, end_node_name: str) -> Graph:
+        return get_process_model_from_log(events, start_node_name, end_node_name, _n_partitions())
+
+    def metrics(self, events: EncodedLog, active_event_parameters: ActiveEventParameters | None,
+                n_top_variants: int, time_index: ActivityTimeIndex | None, variants: Variants) -> Metrics:
+        settings = config_loader.CONFIG["out_of_core"]
+        Path(settings["spill_directory"]).mkdir(parents=True, exist_ok=True)
+        with TemporaryDirectory(dir=settings["spill_directory"]) as spill_directory:
+            return get_metrics_out_of_core(events, active_event_parameters, n_top_variants,
+                                           int(settings["memory_budget_mb"]) * 2 ** 20, Path(spill_directory),
+                                           variants, time_index)
+
+
+BACKENDS: dict[str, PipelineBackend] = {"pandas": PandasBackend(), "columnar": ColumnarBackend()}
+
+
+def get_backend(name: str | None = None) -> PipelineBackend:
+    """
+    :param name: Name of the backend. If None, the one configured as pipeline_backend is used.
+    :return: Backend the pipeline runs on.
+    :raises ValueError: If there is no backend with this name.
+    """
+    if name is None:
+        name = str(config_loader.CONFIG.get("pipeline_backend", "pandas"))
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown pipeline backend {name}. Expected one of {', '.join(BACKENDS)}.")
+    return BACKENDS[name]
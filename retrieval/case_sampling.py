@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from data_handling.encoded_log import EncodedLog, encode_log
+from model.input_model import SamplingParameters
+from model.response_model import ConfidenceInterval, EdgeFrequencyInterval, Graph, Metrics, SamplingSummary
+from retrieval.variant_engine import count_variants
+
+# Number of trace length classes the cases are split into for stratified sampling.
+N_STRATA = 10
+
+
+@dataclass(frozen=True)
+class CaseSample:
+    """
+    Sample of the cases of a log.
+    Each sampled case represents population_sizes[h] / sample_sizes[h] cases of the log, h being its stratum.
+    """
+    log: EncodedLog
+    strata: npt.NDArray[np.int64]
+    population_sizes: npt.NDArray[np.int64]
+    sample_sizes: npt.NDArray[np.int64]
+    parameters: SamplingParameters
+
+    @property
+    def n_population(self) -> int:
+        return int(self.population_sizes.sum())
+
+
+def _length_strata(log: EncodedLog) -> npt.NDArray[np.int64]:
+    """
+    Assigns each case to one of at most N_STRATA classes of similar trace length.
+    """
+    lengths = log.case_lengths()
+    bounds = np.unique(np.quantile(lengths, np.linspace(0, 1, N_STRATA + 1)[1:-1]))
+    classes = np.searchsorted(bounds, lengths, side="right")
+    return np.unique(classes, return_inverse=True)[1].reshape(-1).astype(np.int64)
+
+
+def sample_cases(log: EncodedLog, parameters: SamplingParameters) -> CaseSample:
+    """
+    Draws a seeded sample of cases without replacement.
+    With the stratified method, the same fraction is drawn from each class of similar trace length,
+    so short and long traces are represented by their share of the log.
+    :param log: Encoded log.
+    :param parameters: Sampling parameters.
+    :return: Sample keeping the order of the cases in the log.
+    """
+    if parameters.method == "stratified":
+        strata = _length_strata(log)
+    else:
+        strata = np.zeros(log.n_cases, dtype=np.int64)
+    population_sizes = np.bincount(strata)
+    sample_sizes = np.minimum(np.maximum(np.rint(population_sizes * parameters.fraction), 1),
+                              population_sizes).astype(np.int64)
+    rng = np.random.default_rng(parameters.seed)
+    selected = np.concatenate([rng.choice(np.flatnonzero(strata == stratum), size=size, replace=False)
+                               for stratum, size in enumerate(sample_sizes.tolist()) if size > 0])
+    selected.sort()
+    return CaseSample(log=log.select_cases(selected), strata=strata[selected],
+                      population_sizes=population_sizes.astype(np.int64), sample_sizes=sample_sizes,
+                      parameters=parameters)
+
+
+def estimate_totals(sample: CaseSample, case_strata: npt.NDArray[np.int64], cases: npt.NDArray[np.int64],
+                    keys: npt.NDArray[np.int64]) -> tuple[pd.Series, pd.Series]:
+    """
+    Estimates how often each key occurs in the whole log from its occurrences in the sampled cases,
+    using the stratified estimator of a total and its variance for sampling without replacement.
+    :param sample: Case sample.
+    :param case_strata: Stratum of each case the occurrences refer to.
+    :param cases: Case index of each occurrence.
+    :param keys: Key of each occurrence.
+    :return: Estimated totals and their variances, indexed by key.
+    """
+    occurrences = pd.DataFrame({"case": cases, "key": keys}).groupby(["case", "key"]).size().rename("y").reset_index()
+    occurrences["stratum"] = case_strata[occurrences["case"].to_numpy()]
+    occurrences["y2"] = occurrences["y"] ** 2
+    per_stratum = occurrences.groupby(["stratum", "key"])[["y", "y2"]].sum().reset_index()
+    population = sample.population_sizes[per_stratum["stratum"].to_numpy()].astype(np.float64)
+    size = sample.sample_sizes[per_stratum["stratum"].to_numpy()].astype(np.float64)
+    sums = per_stratum["y"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sample_variances = np.where(size > 1, (per_stratum["y2"].to_numpy() - sums ** 2 / size) / (size - 1), 0)
+    per_stratum["estimate"] = population / size * sums
+    per_stratum["variance"] = population ** 2 * (1 - size / population) * sample_variances / size
+    totals = per_stratum.groupby("key")[["estimate", "variance"]].sum()
+    return totals["estimate"], totals["variance"]
+
+
+def _interval(estimate: float, variance: float, z: float) -> ConfidenceInterval:
+    margin = z * float(np.sqrt(max(variance, 0.0)))
+    return ConfidenceInterval(estimate=estimate, lower=max(estimate - margin, 0.0), upper=estimate + margin)
+
+
+def _edge_keys(log: EncodedLog) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Encodes the directly follows pairs and the start and end activity of each case.
+    Pairs are encoded as source * n + target, start activities as n * n + activity
+    and end activities as n * n + n + activity.
+    :return: Case index and key of each occurrence.
+    """
+    n = log.n_activities
+    codes = np.asarray(log.codes, dtype=np.int64)
+    event_cases = log.event_case_indices()
+    same_case = event_cases[1:] == event_cases[:-1]
+    cases = np.concatenate((event_cases[:-1][same_case], np.arange(log.n_cases), np.arange(log.n_cases)))
+    keys = np.concatenate((codes[:-1][same_case] * n + codes[1:][same_case],
+                           n * n + codes[log.case_offsets[:-1]], n * n + n + codes[log.case_offsets[1:] - 1]))
+    return cases, keys
+
+
+def scale_to_population(graph: Graph, metrics: Metrics, data: pd.DataFrame | EncodedLog, sample: CaseSample,
+                        start_node_name: str, end_node_name: str) -> SamplingSummary:
+    """
+    Replaces the counts calculated on a sample of cases by estimates for the whole log
+    and calculates confidence intervals for the edge frequencies and the event counts.
+    Duration statistics and n_variants are left as calculated on the sample.
+    The data may contain only part of the sampled cases, for example after the complexity reduction,
+    so the number of traces is estimated from the cases of the data as well.
+    :param graph: Graph calculated on the sample, updated in place.
+    :param metrics: Metrics calculated on the sample, updated in place.
+    :param data: Data the graph and metrics were calculated on, as dataframe or encoded log.
+    :param sample: Case sample the data originates from.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :return: Summary of the sampling with confidence intervals.
+    """
+    z = NormalDist().inv_cdf(0.5 + sample.parameters.confidence / 2)
+    log = data if isinstance(data, EncodedLog) else encode_log(data)
+    sampled_strata = pd.Series(sample.strata, index=sample.log.case_ids)
+    case_strata = sampled_strata.reindex(log.case_ids).to_numpy(dtype=np.int64)
+    codes = {activity: code for code, activity in enumerate(log.activities)}
+    n = log.n_activities
+
+    edge_estimates, edge_variances = estimate_totals(sample, case_strata, *_edge_keys(log))
+    edge_frequencies = []
+    for connection in graph.connections:
+        if connection.e1 == start_node_name:
+            key = n * n + codes[connection.e2]
+        elif connection.e2 == end_node_name:
+            key = n * n + n + codes[connection.e1]
+        else:
+            key = codes[connection.e1] * n + codes[connection.e2]
+        interval = _interval(float(edge_estimates[key]), float(edge_variances[key]), z)
+        connection.frequency = round(interval.estimate)
+        edge_frequencies.append(EdgeFrequencyInterval(e1=connection.e1, e2=connection.e2, **interval.model_dump()))
+
+    event_cases = log.event_case_indices()
+    event_estimates, event_variances = estimate_totals(sample, case_strata, event_cases,
+                                                       np.asarray(log.codes, dtype=np.int64))
+    event_frequencies = {log.activities[code]: _interval(float(event_estimates[code]), float(event_variances[code]),
+                                                          z) for code in event_estimates.index.tolist()}
+    total_estimates, total_variances = estimate_totals(sample, case_strata, event_cases,
+                                                       np.zeros(log.n_events, dtype=np.int64))
+    n_events = _interval(float(total_estimates[0]), float(total_variances[0]), z)
+    trace_estimates, _ = estimate_totals(sample, case_strata, np.arange(log.n_cases, dtype=np.int64),
+                                         np.zeros(log.n_cases, dtype=np.int64))
+    n_traces = round(float(trace_estimates.get(0, 0.0)))
+    _scale_metrics(metrics, log, sample, case_strata, event_frequencies, n_events, n_traces)
+    return SamplingSummary(method=sample.parameters.method, confidence=sample.parameters.confidence,
+                           n_sampled_traces=sample.log.n_cases, n_traces=n_traces,
+                           n_events=n_events, event_frequencies=event_frequencies, edge_frequencies=edge_frequencies)
+
+
+def _scale_metrics(metrics: Metrics, log: EncodedLog, sample: CaseSample, case_strata: npt.NDArray[np.int64],
+                   event_frequencies: dict[str, ConfidenceInterval], n_events: ConfidenceInterval,
+                   n_traces: int) -> None:
+    cases = np.arange(log.n_cases, dtype=np.int64)
+    if metrics.n_traces is not None:
+        metrics.n_traces = n_traces
+    if metrics.n_events is not None:
+        metrics.n_events = round(n_events.estimate)
+    if metrics.event_frequency_distr is not None:
+        scaled = {activity: round(interval.estimate) for activity, interval in event_frequencies.items()}
+        metrics.event_frequency_distr = dict(sorted(scaled.items(), key=lambda item: item[1], reverse=True))
+    if metrics.trace_length_distr is not None:
+        length_estimates, _ = estimate_totals(sample, case_strata, cases, log.case_lengths())
+        scaled = {str(length): round(estimate) for length, estimate in length_estimates.items()}
+        metrics.trace_length_distr = dict(sorted(scaled.items(), key=lambda item: item[1], reverse=True))
+    if metrics.top_variants is not None:
+        variants = count_variants(log)
+        variant_estimates, _ = estimate_totals(sample, case_strata, cases, variants.case_variants)
+        sequences = {tuple(log.activities[code] for code in
+                           log.codes[log.case_offsets[case]:log.case_offsets[case + 1]].tolist()): variant
+                     for variant, case in enumerate(variants.representatives.tolist())}
+        for top_variant in metrics.top_variants.values():
+            top_variant.frequency = round(variant_estimates[sequences[tuple(top_variant.event_sequence)]])
@@ -0,0 +1,117 @@
+from bisect import bisect_left
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.edge_index import EdgeIndex
+from data_handling.encoded_log import EncodedLog
+from helpers.config_loader import CONFIG
+from model.response_model import CaseOccurrences, DurationHistogram, EdgeCases, EdgeDurations, NodeCases
+
+# Drill-down queries on the graph of a stored dataset. They only read the index and the events of the occurrences,
+# so their cost depends on the number of occurrences and not on the size of the log.
+
+
+def _activity_code(log: EncodedLog, activity: str) -> int:
+    code = bisect_left(log.activities, activity)
+    if code == log.n_activities or log.activities[code] != activity:
+        raise ValueError(f"Activity {activity} does not exist.")
+    return code
+
+
+def _case_indices(log: EncodedLog, positions: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    indices: npt.NDArray[np.int64] = np.searchsorted(log.case_offsets, positions, side="right") - 1
+    return indices
+
+
+def _group_by_case(log: EncodedLog, positions: npt.NDArray[np.int64],
+                   limit: int | None) -> tuple[int, list[CaseOccurrences]]:
+    """
+    Groups occurrences by their case.
+    :param log: Encoded log.
+    :param positions: Positions of the occurrences in the log, in ascending order.
+    :param limit: Maximum number of cases that are returned. If None, all cases are returned.
+    :return: Number of cases with an occurrence and the positions of the occurrences within the first cases.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("The limit has to be at least 1.")
+    case_indices = _case_indices(log, positions)
+    cases, starts = np.unique(case_indices, return_index=True)
+    ends = np.append(starts[1:], len(positions))
+    returned = len(cases) if limit is None else min(limit, len(cases))
+    within_case = (positions - log.case_offsets[case_indices]).tolist()
+    occurrences = [CaseOccurrences(case_id=log.case_ids[case], positions=within_case[start:end])
+                   for case, start, end in zip(cases[:returned].tolist(), starts[:returned].tolist(),
+                                               ends[:returned].tolist(), strict=True)]
+    return len(cases), occurrences
+
+
+def _boundary_occurrences(log: EncodedLog, index: EdgeIndex, activity: str, first: bool) -> npt.NDArray[np.int64]:
+    positions = index.activity_occurrences(_activity_code(log, activity))
+    case_indices = _case_indices(log, positions)
+    boundaries = log.case_offsets[case_indices] if first else log.case_offsets[case_indices + 1] - 1
+    kept: npt.NDArray[np.int64] = positions[positions == boundaries]
+    return kept
+
+
+def edge_cases(log: EncodedLog, index: EdgeIndex, source: str, target: str, start_node_name: str = "start_node",
+               end_node_name: str = "end_node", limit: int | None = None) -> EdgeCases:
+    """
+    Finds the cases that traverse an edge of the directly follows graph.
+    :param log: Encoded log.
+    :param index: Edge index of the log.
+    :param source: Activity the edge starts at, or the name of the start node.
+    :param target: Activity the edge ends at, or the name of the end node.
+    :param start_node_name: Name of the start node in the graph.
+    :param end_node_name: Name of the end node in the graph.
+    :param limit: Maximum number of cases that are returned. If None, all cases are returned.
+    :return: Cases in the order of the log with the positions of the source event of each occurrence within the case.
+    For edges from the start node, the position of the target event is returned.
+    """
+    if source == start_node_name:
+        positions = _boundary_occurrences(log, index, target, first=True)
+    elif target == end_node_name:
+        positions = _boundary_occurrences(log, index, source, first=False)
+    else:
+        positions = index.edge_occurrences(_activity_code(log, source), _activity_code(log, target))
+    n_cases, cases = _group_by_case(log, positions, limit)
+    return EdgeCases(source=source, target=target, n_occurrences=len(positions), n_cases=n_cases, cases=cases)
+
+
+def node_cases(log: EncodedLog, index: EdgeIndex, activity: str, limit: int | None = None) -> NodeCases:
+    """
+    Finds the cases that contain an activity.
+    :param log: Encoded log.
+    :param index: Edge index of the log.
+    :param activity: Name of the activity.
+    :param limit: Maximum number of cases that are returned. If None, all cases are returned.
+    :return: Cases in the order of the log with the positions of the events of the activity within the case.
+    """
+    positions = index.activity_occurrences(_activity_code(log, activity))
+    n_cases, cases = _group_by_case(log, positions, limit)
+    return NodeCases(activity=activity, n_occurrences=len(positions), n_cases=n_cases, cases=cases)
+
+
+def edge_durations(log: EncodedLog, index: EdgeIndex, source: str, target: str) -> EdgeDurations:
+    """
+    Counts the durations of the occurrences of an edge in the configured number of equally wide bins,
+    in total and per year of the source event (in UTC for timezone aware timestamps).
+    All histograms use the same bins, so years can be compared.
+    :param log: Encoded log.
+    :param index: Edge index of the log.
+    :param source: Activity the edge starts at.
+    :param target: Activity the edge ends at.
+    :return: Histograms of the durations in seconds.
+    """
+    positions = index.edge_occurrences(_activity_code(log, source), _activity_code(log, target))
+    starts = np.asarray(log.timestamps[positions], dtype=np.int64)
+    durations = (np.asarray(log.timestamps[positions + 1], dtype=np.int64) - starts) / 1e9
+    counts, bin_edges = np.histogram(durations, bins=CONFIG["trace_duration_histogram_bins"])
+    years = starts.astype("datetime64[ns]").astype("datetime64[Y]").astype(np.int64) + 1970
+    yearly = {}
+    for year in np.unique(years).tolist():
+        year_counts, _ = np.histogram(durations[years == year], bins=bin_edges)
+        yearly[str(year)] = DurationHistogram(bin_edges=bin_edges.tolist(), counts=year_counts.tolist())
+    return EdgeDurations(source=source, target=target, n_occurrences=len(positions),
+                         histogram=DurationHistogram(bin_edges=bin_edges.tolist(), counts=counts.tolist()),
+                         yearly=yearly)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import threading
+from collections import OrderedDict, defaultdict, deque
+
+from helpers.config_loader import CONFIG
+from model.input_model import LayoutParameters
+from model.response_model import Connection, Graph, GraphLayout, NodePosition
+
+_cache: OrderedDict[str, GraphLayout] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _assign_layers(connections: list[Connection], start_node_name: str, end_node_name: str) -> dict[str, int]:
+    """
+    Places each node in the layer of its shortest distance from the start node, found by a breadth-first search.
+    Nodes that can not be reached from the start node are placed after the reached ones
+    and the end node gets a layer of its own after all other nodes.
+    :return: Layer of each node, in the order the nodes were reached.
+    """
+    successors: dict[str, list[str]] = defaultdict(list)
+    nodes: dict[str, None] = {}
+    for connection in connections:
+        successors[connection.e1].append(connection.e2)
+        nodes[connection.e1] = None
+        nodes[connection.e2] = None
+    layers: dict[str, int] = {}
+    if start_node_name in nodes:
+        layers[start_node_name] = 0
+        queue = deque([start_node_name])
+        while queue:
+            node = queue.popleft()
+            for successor in successors[node]:
+                if successor not in layers and successor != end_node_name:
+                    layers[successor] = layers[node] + 1
+                    queue.append(successor)
+    last_layer = max(layers.values(), default=-1)
+    unreached = [node for node in nodes if node not in layers and node != end_node_name]
+    if unreached:
+        last_layer += 1
+        layers.update(dict.fromkeys(unreached, last_layer))
+    if end_node_name in nodes:
+        layers[end_node_name] = last_layer + 1
+    return layers
+
+
+def _count_crossings(ordered: list[list[str]], layers: dict[str, int],
+                     edges: list[tuple[str, str]]) -> int:
+    """
+    Counts the crossings of edges between neighbouring layers as the inversions of their end positions.
+    :param ordered: Nodes of each layer from top to bottom.
+    :param layers: Layer of each node.
+    :param edges: Edges between neighbouring layers, from the node in the lower layer to the one in the higher layer.
+    :return: Number of pairs of crossing edges.
+    """
+    index = {node: position for layer in ordered for position, node in enumerate(layer)}
+    ends_by_layer: dict[int, list[tuple[int, int]]] = defaultdict(list)
+    for first, second in edges:
+        ends_by_layer[layers[first]].append((index[first], index[second]))
+    crossings = 0
+    for ends in ends_by_layer.values():
+        seen: list[int] = []
+        for _, end in sorted(ends):
+            crossings += len(seen) - bisect.bisect_right(seen, end)
+            bisect.insort(seen, end)
+    return crossings
+
+
+def _order_layers(connections: list[Connection], layers: dict[str, int], sweeps: int) -> list[list[str]]:
+    """
+    Orders the nodes within each layer to reduce edge crossings with the barycenter heuristic.
+    Sweeps alternate between moving each node to the frequency weighted mean position of its neighbours
+    in the layer before it and in the layer after it.
+    The ordering with the fewest crossings between neighbouring layers is kept.
+    :return: Nodes of each layer from top to bottom.
+    """
+    ordered: list[list[str]] = [[] for _ in range(max(layers.values(), default=-1) + 1)]
+    for node, node_layer in layers.items():
+        ordered[node_layer].append(node)
+    before: dict[str, list[tuple[str, int]]] = defaultdict(list)
+    after: dict[str, list[tuple[str, int]]] = defaultdict(list)
+    edges = []
+    for connection in connections:
+        first, second = sorted((connection.e1, connection.e2), key=layers.__getitem__)
+        if layers[first] + 1 == layers[second]:
+            weight = max(connection.frequency, 1)
+            before[second].append((first, weight))
+            after[first].append((second, weight))
+            edges.append((first, second))
+    position = {node: index - (len(layer) - 1) / 2 for layer in ordered for index, node in enumerate(layer)}
+    best, fewest_crossings = [list(layer) for layer in ordered], _count_crossings(ordered, layers, edges)
+    for sweep in range(sweeps):
+        neighbours = before if sweep % 2 == 0 else after
+        for layer in ordered[1:] if sweep % 2 == 0 else ordered[-2::-1]:
+            barycenters = {}
+            for node in layer:
+                total = sum(weight for _, weight in neighbours[node])
+                barycenters[node] = (sum(position[neighbour] * weight for neighbour, weight in neighbours[node])
+                                     / total if total else position[node])
+            layer.sort(key=barycenters.__getitem__)
+            position.update({node: index - (len(layer) - 1) / 2 for index, node in enumerate(layer)})
+        crossings = _count_crossings(ordered, layers, edges)
+        if crossings < fewest_crossings:
+            best, fewest_crossings = [list(layer) for layer in ordered], crossings
+    return best
+
+
+def compute_layout(graph: Graph, parameters: LayoutParameters, start_node_name: str,
+                   end_node_name: str) -> GraphLayout:
+    """
+    Calculates a layered left to right layout of the graph, from the start node in the first layer
+    to the end node in the last layer. Layering takes linear time, each ordering sweep O(E log E) for E edges.
+    :param graph: Graph to lay out.
+    :param parameters: Spacing of the layers and nodes and number of ordering sweeps.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :return: Position of each node.
+    """
+    layers = _assign_layers(graph.connections, start_node_name, end_node_name)
+    ordered = _order_layers(graph.connections, layers, parameters.ordering_sweeps)
+    nodes = [NodePosition(node=node, layer=layer, x=layer * parameters.layer_spacing,
+                          y=(index - (len(ordered[layer]) - 1) / 2) * parameters.node_spacing)
+             for layer in range(len(ordered)) for index, node in enumerate(ordered[layer])]
+    return GraphLayout(nodes=nodes, width=max(len(ordered) - 1, 0) * parameters.layer_spacing,
+                       height=(max((len(layer) for layer in ordered), default=1) - 1) * parameters.node_spacing)
+
+
+def _layout_key(graph: Graph, parameters: LayoutParameters, start_node_name: str, end_node_name: str) -> str:
+    digest = hashlib.sha256(parameters.model_dump_json().encode())
+    digest.update(json.dumps([start_node_name, end_node_name,
+                              [(connection.e1, connection.e2, connection.frequency)
+                               for connection in graph.connections]]).encode())
+    return digest.hexdigest()
+
+
+def layout_graph(graph: Graph, parameters: LayoutParameters, start_node_name: str,
+                 end_node_name: str) -> GraphLayout:
+    """
+    Returns the layout of compute_layout, reusing the layout of an identical graph if it was calculated before.
+    The configured number of layouts (layout_cache_size) is kept, evicting the least recently used one.
+    :param graph: Graph to lay out.
+    :param parameters: Spacing of the layers and nodes and number of ordering sweeps.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :return: Position of each node.
+    """
+    key = _layout_key(graph, parameters, start_node_name, end_node_name)
+    with _cache_lock:
+        layout = _cache.get(key)
+        if layout is not None:
+            _cache.move_to_end(key)
+            return layout
+    layout = compute_layout(graph, parameters, start_node_name, end_node_name)
+    with _cache_lock:
+        _cache[key] = layout
+        while len(_cache) > int(CONFIG.get("layout_cache_size", 256)):
+            _cache.popitem(last=False)
+    return layout
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import heapq
+from collections import defaultdict
+
+from model.input_model import SimplificationParameters
+from model.response_model import Connection, Graph
+
+
+def _widest_path_tree(connections: list[Connection], root: str, forward: bool) -> dict[str, int]:
+    """
+    Finds for each node the path from the root (or to the root if not forward)
+    whose least frequent edge is as frequent as possible, with a variant of Dijkstra's algorithm.
+    :param connections: Edges of the graph.
+    :param root: Node the paths start at (or end at if not forward).
+    :param forward: If the edges are followed in their direction.
+    :return: Index of the last edge of the path of each reached node, so the edges form a tree.
+    """
+    adjacency: dict[str, list[int]] = defaultdict(list)
+    for index, connection in enumerate(connections):
+        adjacency[connection.e1 if forward else connection.e2].append(index)
+    width = {root: float("inf")}
+    tree_edge: dict[str, int] = {}
+    done: set[str] = set()
+    heap: list[tuple[float, str]] = [(-width[root], root)]
+    while heap:
+        _, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        done.add(node)
+        for index in adjacency[node]:
+            connection = connections[index]
+            neighbour = connection.e2 if forward else connection.e1
+            path_width = min(width[node], connection.frequency)
+            if neighbour not in done and path_width > width.get(neighbour, -1):
+                width[neighbour] = path_width
+                tree_edge[neighbour] = index
+                heapq.heappush(heap, (-path_width, neighbour))
+    return tree_edge
+
+
+def _path_nodes(connections: list[Connection], tree: dict[str, int], node: str, forward: bool) -> set[str]:
+    """
+    :return: Nodes on the path of the given node in a tree found by _widest_path_tree.
+    """
+    nodes = {node}
+    while node in tree:
+        connection = connections[tree[node]]
+        node = connection.e1 if forward else connection.e2
+        nodes.add(node)
+    return nodes
+
+
+def _activity_frequencies(connections: list[Connection], end_node_name: str) -> dict[str, int]:
+    frequencies: dict[str, int] = defaultdict(int)
+    for connection in connections:
+        if connection.e2 != end_node_name:
+            frequencies[connection.e2] += connection.frequency
+    return frequencies
+
+
+def _top_k_edges(connections: list[Connection], k: int) -> set[int]:
+    """
+    :return: Indices of the edges that are among the k most frequent outgoing edges of their source
+    or among the k most frequent incoming edges of their target.
+    """
+    outgoing: dict[str, list[int]] = defaultdict(list)
+    incoming: dict[str, list[int]] = defaultdict(list)
+    for index, connection in enumerate(connections):
+        outgoing[connection.e1].append(index)
+        incoming[connection.e2].append(index)
+    selected: set[int] = set()
+    for edges in (*outgoing.values(), *incoming.values()):
+        selected.update(heapq.nlargest(k, edges, key=lambda index: connections[index].frequency))
+    return selected
+
+
+def _connected(connections: list[Connection], start_node_name: str, end_node_name: str) -> list[Connection]:
+    """
+    Removes the edges of nodes that are not on any path from the start node to the end node.
+    """
+    reachable = {start_node_name, *_widest_path_tree(connections, start_node_name, True)}
+    reaching = {end_node_name, *_widest_path_tree(connections, end_node_name, False)}
+    kept = reachable & reaching
+    return [connection for connection in connections if connection.e1 in kept and connection.e2 in kept]
+
+
+def simplify_graph(graph: Graph, parameters: SimplificationParameters, start_node_name: str,
+                   end_node_name: str) -> Graph:
+    """
+    Reduces the number of nodes and edges of a graph while every remaining node stays on a path
+    from the start node to the end node.
+    With max_nodes, only the most frequent nodes are kept,
+    together with the nodes on their paths from the start node and to the end node described below.
+    A backbone of edges is always kept: for each node the path from the start node and the path to the end node
+    whose least frequent edge is as frequent as possible.
+    Of the other edges, only those with at least min_edge_frequency that are among the top_k_edges_per_node
+    most frequent edges of their source or target are kept, from the most frequent one on until max_edges is reached.
+    :param graph: Graph as returned by get_process_model.
+    :param parameters: Simplification parameters.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :return: Simplified graph, keeping the order of the edges of the given graph.
+    """
+    connections = _connected(graph.connections, start_node_name, end_node_name)
+    if parameters.max_nodes is not None:
+        frequencies = _activity_frequencies(connections, end_node_name)
+        from_start = _widest_path_tree(connections, start_node_name, True)
+        to_end = _widest_path_tree(connections, end_node_name, False)
+        kept_nodes = {start_node_name, end_node_name}
+        for node in heapq.nlargest(parameters.max_nodes, sorted(frequencies), key=frequencies.__getitem__):
+            kept_nodes |= (_path_nodes(connections, from_start, node, True)
+                           | _path_nodes(connections, to_end, node, False))
+        connections = [connection for connection in connections
+                       if connection.e1 in kept_nodes and connection.e2 in kept_nodes]
+    backbone = {*_widest_path_tree(connections, start_node_name, True).values(),
+                *_widest_path_tree(connections, end_node_name, False).values()}
+    candidates = [index for index, connection in enumerate(connections) if index not in backbone
+                  and connection.frequency >= (parameters.min_edge_frequency or 0)]
+    if parameters.top_k_edges_per_node is not None:
+        top_k = _top_k_edges(connections, parameters.top_k_edges_per_node)
+        candidates = [index for index in candidates if index in top_k]
+    if parameters.max_edges is not None:
+        n_additional = max(parameters.max_edges - len(backbone), 0)
+        candidates = heapq.nlargest(n_additional, candidates, key=lambda index: connections[index].frequency)
+    kept = backbone | set(candidates)
+    return Graph(connections=[connection for index, connection in enumerate(connections) if index in kept])
@@ -1,28 +1,61 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal, cast
+from typing import Any
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
-import pm4py
-from dateutil.relativedelta import relativedelta
-from pandas._typing import Scalar
-from pandas.core.groupby import DataFrameGroupBy
-from pm4py.statistics.variants.pandas.get import get_variants_count
 
+from data_handling.activity_time_index import NS_PER_DAY, ActivityTimeIndex, build_activity_time_index
+from data_handling.encoded_log import encode_log
+from data_handling.segmented_kernels import case_segments, segment_min_max
+from helpers.cancellation import checkpoint
 from helpers.config_loader import CONFIG
 from model.input_model import ActiveEventParameters
-from model.response_model import ActiveEvents, Connection, Metrics, TopVariant
+from model.response_model import ActiveEvents, Connection, DurationHistogram, Metrics, TopVariant, VariantProfile
+from retrieval.partial_dfg import calculate_edge_statistics, compute_partial_dfg, edge_connections
+from retrieval.variant_engine import Variants, count_variants
+from retrieval.variant_profiles import calculate_variant_profiles
 
 
 @dataclass
 class Context:
     data: pd.DataFrame
-    grouped_data: DataFrameGroupBy[Scalar, Literal[False]]
-    variants: dict[list[str], int]
-    top_variants: list[tuple[list[str], int]]
+    cases: pd.DataFrame
+    variants: Variants
+    top_variant_ids: npt.NDArray[np.int64]
     active_event_parameters: ActiveEventParameters | None
+    time_index: ActivityTimeIndex | None = None
+
+
+def _to_datetimes(nanoseconds: npt.NDArray[np.int64], dtype: Any) -> pd.DatetimeIndex:
+    datetimes = pd.DatetimeIndex(nanoseconds.view("datetime64[ns]"))
+    time_zone = getattr(dtype, "tz", None)
+    return datetimes if time_zone is None else datetimes.tz_localize("UTC").tz_convert(time_zone)
+
+
+def summarize_cases(data: pd.DataFrame, variants: Variants) -> pd.DataFrame:
+    """
+    Calculates a table with one row per case in a single grouping of the data.
+    The columns are the first and last timestamp, the duration in seconds, the number of events
+    and the variant id of the case.
+    :param data: Data with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    :param variants: Variants of the cases of the data.
+    :return: Table indexed by the case identifiers.
+    """
+    case_codes, case_ids = pd.factorize(data["case:concept:name"])
+    order, offsets = case_segments(case_codes)
+    timestamps = data["time:timestamp"]
+    starts, ends = segment_min_max(timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)[order], offsets)
+    cases = pd.DataFrame({"start": _to_datetimes(starts, timestamps.dtype),
+                          "end": _to_datetimes(ends, timestamps.dtype),
+                          "length": np.diff(offsets),
+                          "duration": (ends - starts) / 1e9},
+                         index=pd.Index(case_ids, name="case:concept:name")).sort_index()
+    case_variants = pd.Series(variants.case_variants, index=variants.case_ids)
+    cases["variant"] = case_variants.reindex(cases.index.astype(str)).to_numpy(dtype=np.int64)
+    return cases
 
 
 def get_time_between_events(context: Context) -> list[Connection]:
@@ -31,48 +64,79 @@ def get_time_between_events(context: Context) -> list[Connection]:
     :param context: contains precalculated data.
     :return: list of edges with statistics between events of the top variants.
     """
-    top_variants = context.top_variants
-    agg_data = context.grouped_data.agg({"concept:name": list, "time:timestamp": list})
+    cases = context.cases
+    relevant_traces = cases.index[cases["variant"].isin(context.top_variant_ids)]
+    data: pd.DataFrame = context.data
+    log = encode_log(data[data["case:concept:name"].isin(relevant_traces)])
+    dfg = compute_partial_dfg(log)
+    return edge_connections(dfg.edge_keys, None, calculate_edge_statistics(dfg.edge_counts, dfg.durations),
+                            log.activities)
+
+
+def get_variant_profiles(context: Context) -> dict[str, VariantProfile]:
+    """
+    Calculates the duration statistics of each step of the top variants and the time from the start of the trace
+    to each step, on the traces that match the top variants.
+    :param context: contains precalculated data.
+    :return: dict with the ranking as key and the profile of the variant as value.
+    """
+    variants = context.variants
+    if len(context.top_variant_ids) == 0:
+        return {}
+    cases = context.cases
+    relevant_traces = cases.index[cases["variant"].isin(context.top_variant_ids)]
     data: pd.DataFrame = context.data
-    top_variants_list = [list(x[0]) for x in top_variants]
-    relevant_traces = agg_data[agg_data["concept:name"].isin(top_variants_list)]["case:concept:name"]
-    relevant_data = data[data["case:concept:name"].isin(relevant_traces)]
-    performance_dfg = pm4py.discovery.discover_performance_dfg(relevant_data)
-    result_list = []
-    for el in performance_dfg[0]:
-        performance_values = performance_dfg[0][el]
-        if np.isnan(performance_values["stdev"]):
-            performance_values["stdev"] = -1
-        connection: Connection = Connection(e1=el[0], e2=el[1], frequency=-1,
-                                            median=performance_values["median"], min=performance_values["min"],
-                                            max=performance_values["max"], stdev=performance_values["stdev"],
-                                            sum=performance_values["sum"], mean=performance_values["mean"])
-        result_list.append(connection)
-    return result_list
+    log = encode_log(data[data["case:concept:name"].isin(relevant_traces)])
+    ranks = np.full(variants.n_variants, -1, dtype=np.int64)
+    ranks[context.top_variant_ids] = np.arange(len(context.top_variant_ids))
+    case_variants = pd.Series(variants.case_variants, index=variants.case_ids).reindex(log.case_ids)
+    return calculate_variant_profiles(log, ranks[case_variants.to_numpy(dtype=np.int64)],
+                                      variants.counts[context.top_variant_ids].tolist())
 
 
 def get_max_trace_length(context: Context) -> int:
-    return int(context.data["case:concept:name"].value_counts().max())
+    return int(context.cases["length"].max())
 
 
 def get_min_trace_length(context: Context) -> int:
-    return int(context.data["case:concept:name"].value_counts().min())
+    return int(context.cases["length"].min())
 
 
 def get_min_trace_duration(context: Context) -> float:
-    min_values = context.grouped_data.min()["time:timestamp"]
-    max_values = context.grouped_data.max()["time:timestamp"]
-    difference = max_values - min_values
-    min_diff: pd.Timedelta = difference.min()
-    return float(min_diff.total_seconds())
+    return float(context.cases["duration"].min())
 
 
 def get_max_trace_duration(context: Context) -> float:
-    min_values = context.grouped_data.min()["time:timestamp"]
-    max_values = context.grouped_data.max()["time:timestamp"]
-    difference = max_values - min_values
-    max_diff: pd.Timedelta = difference.max()
-    return float(max_diff.total_seconds())
+    return float(context.cases["duration"].max())
+
+
+def calculate_duration_quantiles(durations: npt.NDArray[np.float64]) -> dict[str, float]:
+    """
+    Calculates the configured quantiles of the trace durations.
+    :param durations: Duration of each trace in seconds.
+    :return: Dictionary with the quantile as key and the duration in seconds as value.
+    """
+    quantiles: list[float] = CONFIG["trace_duration_quantiles"]
+    values = np.quantile(durations, quantiles)
+    return {str(quantile): float(value) for quantile, value in zip(quantiles, values, strict=True)}
+
+
+def calculate_duration_histogram(durations: npt.NDArray[np.float64]) -> DurationHistogram:
+    """
+    Counts the trace durations in the configured number of equally wide bins between the shortest and longest duration.
+    :param durations: Duration of each trace in seconds.
+    :return: Bin edges in seconds and number of traces per bin.
+    """
+    counts, bin_edges = np.histogram(durations, bins=CONFIG["trace_duration_histogram_bins"])
+    return DurationHistogram(bin_edges=bin_edges.tolist(), counts=counts.tolist())
+
+
+def get_trace_duration_quantiles(context: Context) -> dict[str, float]:
+    return calculate_duration_quantiles(context.cases["duration"].to_numpy(dtype=np.float64))
+
+
+def get_trace_duration_histogram(context: Context) -> DurationHistogram:
+    return calculate_duration_histogram(context.cases["duration"].to_numpy(dtype=np.float64))
 
 
 def get_event_frequency_distribution(context: Context) -> dict[str, int]:
@@ -91,10 +155,22 @@ def get_trace_length_distribution(context: Context) -> dict[str, int]:
     :param context: contains precalculated data.
     :return: Dictionary with length as key and frequency as value.
     """
-    distr: dict[str, int] = context.data["case:concept:name"].value_counts().astype(str).value_counts().to_dict()
+    distr: dict[str, int] = context.cases["length"].astype(str).value_counts().to_dict()
     return distr
 
 
+def _to_datetime64(timestamp: pd.Timestamp, unit: str) -> np.datetime64:
+    """
+    Truncates a timestamp to the given unit, in UTC for timezone aware timestamps.
+    """
+    truncated: np.datetime64 = timestamp.to_datetime64().astype(f"datetime64[{unit}]")
+    return truncated
+
+
+def _to_timestamps(starts: npt.NDArray[np.datetime64]) -> list[pd.Timestamp]:
+    return [pd.Timestamp(start) for start in starts.astype("datetime64[ns]")]
+
+
 def calculate_weekly_bins(initial_timestamp: pd.Timestamp, final_timestamp: pd.Timestamp) -> list[pd.Timestamp]:
     """
     Calculates the start timestamp (Monday 00:00) for each week occurring in the time frame between the two timestamps.
@@ -103,100 +179,114 @@ def calculate_weekly_bins(initial_timestamp: pd.Timestamp, final_timestamp: pd.T
     :param final_timestamp: last timestamp.
     :return: List of timestamps.
     """
-    start_of_week: pd.Timestamp = initial_timestamp - pd.Timedelta(days=initial_timestamp.weekday())
-    start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_starts = [start_of_week]
-    while start_of_week <= final_timestamp:
-        week_starts.append(start_of_week)
-        start_of_week = start_of_week + pd.Timedelta(days=7)
-    return week_starts
+    initial_day = _to_datetime64(initial_timestamp, "D")
+    # 1970-01-01, day 0, was a Thursday.
+    start_of_week = initial_day - (initial_day.astype(np.int64) + 3) % 7
+    return _to_timestamps(np.arange(start_of_week, _to_datetime64(final_timestamp, "D") + 1, 7))
 
 
-def calculate_monthly_bins(initial_timestamp: pd.Timestamp, final_timestamp: pd.Timestamp) -> list[pd.Timestamp]:
+def calculate_monthly_bins(initial_timestamp: pd.Timestamp, final_timestamp: pd.Timestamp,
+                           months_per_bin: int = 1) -> list[pd.Timestamp]:
     """
     Calculates the start timestamp (1st of month, 00:00)
     for each month occurring in the time frame between the two timestamps.
     The initial timestamp is included in the first month and final timestamp is included in the last month.
     :param initial_timestamp: first timestamp.
     :param final_timestamp: last timestamp.
+    :param months_per_bin: Number of months per bin. Bins start at the months that are a multiple of it
+    after January, so 3 gives quarters.
     :return: List of timestamps.
     """
-    start_of_month = initial_timestamp - pd.Timedelta(days=initial_timestamp.day - 1)
-    start_of_month.replace(hour=0, minute=0, second=0, microsecond=0)
-    month_starts = [start_of_month]
-    while start_of_month <= final_timestamp:
-        month_starts.append(start_of_month)
-        start_of_month = start_of_month + relativedelta(months=1)
-    return month_starts
+    initial_month = _to_datetime64(initial_timestamp, "M")
+    # 1970-01, month 0, was a January.
+    start_of_month = initial_month - initial_month.astype(np.int64) % months_per_bin
+    return _to_timestamps(np.arange(start_of_month, _to_datetime64(final_timestamp, "M") + 1, months_per_bin))
+
+
+def calculate_quarterly_bins(initial_timestamp: pd.Timestamp, final_timestamp: pd.Timestamp) -> list[pd.Timestamp]:
+    """
+    Calculates the start timestamp (1st of January, April, July or October, 00:00)
+    for each quarter occurring in the time frame between the two timestamps.
+    :param initial_timestamp: first timestamp.
+    :param final_timestamp: last timestamp.
+    :return: List of timestamps.
+    """
+    return calculate_monthly_bins(initial_timestamp, final_timestamp, months_per_bin=3)
 
 
 def calculate_yearly_bins(initial_timestamp: pd.Timestamp, final_timestamp: pd.Timestamp) -> list[pd.Timestamp]:
     """
     Calculates the start timestamp (January 1st, 00:00)
-    for each week occurring in the time frame between the two timestamps.
+    for each year occurring in the time frame between the two timestamps.
     The initial timestamp is included in the first year and final timestamp is included in the last year.
     :param initial_timestamp: first timestamp.
     :param final_timestamp: last timestamp.
     :return: List of timestamps.
     """
-    start_of_year = pd.Timestamp(year=initial_timestamp.year, month=1, day=1)
-    year_starts = []
-    while start_of_year <= final_timestamp:
-        year_starts.append(start_of_year)
-        start_of_year = start_of_year + relativedelta(years=1)
-    return year_starts
+    return _to_timestamps(np.arange(_to_datetime64(initial_timestamp, "Y"),
+                                    _to_datetime64(final_timestamp, "Y") + 1))
 
 
-def calculate_bin_values(data: pd.DataFrame, bin_starts: list[pd.Timestamp],
-                         active_event_parameters: ActiveEventParameters) -> dict[str, int]:
+def accumulate_active_events(bin_starts: list[pd.Timestamp], positive_counts: list[int],
+                             negative_counts: list[int], singular_counts: list[int]) -> dict[str, int]:
     """
-    Calculates the amount of active events for each timeframe between two consecutive timestamps.
-    :param active_event_parameters: Parameters to calculate the active events per timeframe.
-    Consists of positive events, which mark the start of a specific timeframe bordered by two events,
-    of negative events, which mark the end of such a timeframe, and singular events.
-    :param data: Data from which the active events are calculated.
+    Calculates the amount of active events for each timeframe between two consecutive timestamps
+    from the number of events of each kind per bin.
+    Positive events mark the start of a timeframe bordered by two events and stay active
+    until a negative event marking its end occurs; negative events are subtracted from the following bin on.
+    Singular events are only active in their own bin.
     :param bin_starts: timestamps used as bin starts.
+    :param positive_counts: Number of positive events per bin.
+    :param negative_counts: Number of negative events per bin.
+    :param singular_counts: Number of singular events per bin.
     :return: Dictionary with timestamp as key and number of active events as value.
     """
-    positive_events: list[str] = active_event_parameters.positive_events
-    negative_events: list[str] = active_event_parameters.negative_events
-    singular_events: list[str] = active_event_parameters.singular_events
     bin_dict = {}
-    n_bins = len(bin_starts)
     active_events = 0
     for i, bin_start in enumerate(bin_starts):
-        bin_end = bin_starts[i + 1] if i < n_bins - 1 else pd.Timestamp.now()
-        pre_bin_start = bin_starts[i - 1] if i > 0 else bin_start - pd.Timedelta(days=1)
-        bin_data = data[data["time:timestamp"].between(bin_start, bin_end, inclusive="left")]
-        pre_bin_data = data[data["time:timestamp"].between(pre_bin_start, bin_start, inclusive="left")]
-        active_events += len(bin_data[bin_data["concept:name"].isin(positive_events)]) - len(
-            pre_bin_data[pre_bin_data["concept:name"].isin(negative_events)])
-        amount = active_events + len(bin_data[bin_data["concept:name"].isin(singular_events)])
-        bin_dict[str(bin_start)] = amount
+        active_events += positive_counts[i] - (negative_counts[i - 1] if i > 0 else 0)
+        bin_dict[str(bin_start)] = active_events + singular_counts[i]
     return bin_dict
 
 
+def calculate_active_events(index: ActivityTimeIndex,
+                            active_event_parameters: ActiveEventParameters | None) -> ActiveEvents:
+    """
+    Calculates the active events for yearly, quarterly, monthly and weekly bins from the daily counts of an index.
+    The last bin of each granularity ends with the current day; later events are not counted.
+    :param index: Daily event counts per activity.
+    :param active_event_parameters: Parameters to calculate the active events per timeframe.
+    If None, all events are handled as singular events.
+    :return: The calculated active events.
+    """
+    parameters = active_event_parameters if active_event_parameters else (
+        ActiveEventParameters(positive_events=[], negative_events=[], singular_events=index.activities))
+    initial_timestamp = pd.Timestamp(index.first_timestamp)
+    final_timestamp = pd.Timestamp(index.last_timestamp)
+    bin_starts = {"yearly": calculate_yearly_bins(initial_timestamp, final_timestamp),
+                  "quarterly": calculate_quarterly_bins(initial_timestamp, final_timestamp),
+                  "monthly": calculate_monthly_bins(initial_timestamp, final_timestamp),
+                  "weekly": calculate_weekly_bins(initial_timestamp, final_timestamp)}
+    end_day = pd.Timestamp.now().value // NS_PER_DAY + 1
+    active_events = {}
+    for name, starts in bin_starts.items():
+        checkpoint()
+        day_edges = np.asarray([start.value // NS_PER_DAY for start in starts] + [end_day], dtype=np.int64)
+        counts = [index.count_events(events, day_edges).tolist()
+                  for events in (parameters.positive_events, parameters.negative_events,
+                                 parameters.singular_events)]
+        active_events[name] = accumulate_active_events(starts, *counts)
+    return ActiveEvents(**active_events)
+
+
 def get_binned_occurrences(context: Context) -> ActiveEvents:
     """
-    Calculates the active events for weekly, monthly and yearly bins.
+    Calculates the active events for yearly, quarterly, monthly and weekly bins.
     :param context: contains precalculated data.
     :return: The calculated active events.
     """
-    data = context.data
-    active_event_parameters = context.active_event_parameters if context.active_event_parameters else (
-        ActiveEventParameters(positive_events=[],
-                              negative_events=[],
-                              singular_events=list(data["concept:name"].unique())))
-    initial_timestamp = data["time:timestamp"].min()
-    final_timestamp = data["time:timestamp"].max()
-    active_events = ActiveEvents(
-        yearly=calculate_bin_values(data, calculate_yearly_bins(initial_timestamp, final_timestamp),
-                                    active_event_parameters),
-        monthly=calculate_bin_values(data, calculate_monthly_bins(initial_timestamp, final_timestamp),
-                                     active_event_parameters),
-        weekly=calculate_bin_values(data, calculate_weekly_bins(initial_timestamp, final_timestamp),
-                                    active_event_parameters))
-    return active_events
+    index = context.time_index if context.time_index else build_activity_time_index(encode_log(context.data))
+    return calculate_active_events(index, context.active_event_parameters)
 
 
 def get_n_traces(context: Context) -> int:
@@ -205,7 +295,7 @@ def get_n_traces(context: Context) -> int:
     :param context:
     :return: number of traces.
     """
-    return int(context.data["case:concept:name"].nunique())
+    return len(context.cases)
 
 
 def get_n_events(context: Context) -> int:
@@ -223,7 +313,7 @@ def get_n_variants(context: Context) -> int:
     :param context:
     :return: number of variants.
     """
-    return len(context.variants)
+    return context.variants.n_variants
 
 
 def get_top_variants(context: Context) -> dict[str, TopVariant]:
@@ -232,19 +322,18 @@ def get_top_variants(context: Context) -> dict[str, TopVariant]:
     :param context:
     :return: dict.
     """
-    top_variants = context.top_variants
+    variants = context.variants
+    data = context.data
+    mean_durations = context.cases.groupby("variant")["duration"].mean()
+    representatives = [variants.case_ids[case] for case in variants.representatives[context.top_variant_ids].tolist()]
+    event_sequences = data[data["case:concept:name"].isin(representatives)].groupby(
+        "case:concept:name", sort=False)["concept:name"].agg(list)
     top_variants_dict = {}
-    grouped_data = context.grouped_data
-    agg_data = grouped_data.agg({"concept:name": list, "time:timestamp": list})
-    timestamp_sequences = cast(list[list[pd.Timestamp]], agg_data["time:timestamp"].tolist())
-    agg_data["diff"] = [
-        float((timestamps[-1] - timestamps[0]).total_seconds())
-        for timestamps in timestamp_sequences
-    ]
-    for index, variant in enumerate(top_variants):
-        current: TopVariant = TopVariant(event_sequence=list(variant[0]), frequency=variant[1],
-                                         mean_duration=agg_data[agg_data["concept:name"].isin([list(variant[0])])][
-                                             "diff"].mean())
+    for index, (variant, representative) in enumerate(zip(context.top_variant_ids.tolist(), representatives,
+                                                          strict=True)):
+        current: TopVariant = TopVariant(event_sequence=list(event_sequences[representative]),
+                                         frequency=int(variants.counts[variant]),
+                                         mean_duration=float(mean_durations[variant]))
         top_variants_dict[str(index)] = current
     return top_variants_dict
 
@@ -255,40 +344,44 @@ metrics = {
     "n_variants": get_n_variants,
     "top_variants": get_top_variants,
     "tbe": get_time_between_events,
+    "variant_profiles": get_variant_profiles,
     "max_trace_length": get_max_trace_length,
     "min_trace_length": get_min_trace_length,
     "event_frequency_distr": get_event_frequency_distribution,
     "trace_length_distr": get_trace_length_distribution,
     "max_trace_duration": get_max_trace_duration,
     "min_trace_duration": get_min_trace_duration,
+    "trace_duration_quantiles": get_trace_duration_quantiles,
+    "trace_duration_histogram": get_trace_duration_histogram,
     "active_events": get_binned_occurrences
 
 }
 
 
 def get_metrics(data: pd.DataFrame, active_event_parameters: ActiveEventParameters | None,
-                n_top_variants: int) -> Metrics:
+                n_top_variants: int, time_index: ActivityTimeIndex | None = None,
+                variants: Variants | None = None) -> Metrics:
     """
     Calculates the metrics for a given dataset.
     :param active_event_parameters: Parameters to calculate the active events per timeframe.
     :param data: Data from which the metrics are calculated.
     Should have three columns, 'case:concept:name', 'concept:name' and 'time:timestamp'.
     :param n_top_variants: Amount of top variants that should be included in the variant dependent metrics.
+    :param time_index: Precalculated daily event counts of the data. If None, they are calculated when needed.
+    :param variants: Precalculated variants of the cases of the data. If None, they are calculated.
     :return: calculated metrics.
     """
-    grouped_data = data.groupby("case:concept:name", as_index=False)
-    variants: dict[list[str], int] = get_variants_count(data)
-    top_variants: list[tuple[list[str], int]] = list(sorted(variants.items(), key=lambda item: item[1], reverse=True))[
-        0:n_top_variants]
+    if variants is None:
+        variants = count_variants(encode_log(data))
     context = Context(data=data,
-                      grouped_data=grouped_data,
+                      cases=summarize_cases(data, variants),
                       active_event_parameters=active_event_parameters,
                       variants=variants,
-                      top_variants=top_variants
+                      top_variant_ids=variants.top(n_top_variants),
+                      time_index=time_index
                       )
-    values = {
-        field: None if field in CONFIG["exclude"]
-        else metrics[field](context)
-        for field in Metrics.model_fields.keys()
-    }
+    values = {}
+    for field in Metrics.model_fields.keys():
+        checkpoint()
+        values[field] = None if field in CONFIG["exclude"] else metrics[field](context)
     return Metrics.model_validate(values)
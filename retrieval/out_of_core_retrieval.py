@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from data_handling.activity_time_index import ActivityTimeIndex, build_activity_time_index
+from data_handling.columnar_storage import events_per_chunk, iter_case_chunks
+from data_handling.encoded_log import EncodedLog
+from helpers.cancellation import checkpoint
+from helpers.config_loader import CONFIG
+from model.input_model import ActiveEventParameters
+from model.response_model import Connection, Graph, Metrics, TopVariant, VariantProfile
+from retrieval.metrics_retrieval import (
+    calculate_active_events,
+    calculate_duration_histogram,
+    calculate_duration_quantiles,
+)
+from retrieval.partial_dfg import (
+    EdgeStatistics,
+    PartialDfg,
+    boundary_activities,
+    calculate_edge_statistics,
+    edge_connections,
+    edge_occurrences,
+    group_edges,
+    partial_dfg_to_graph,
+)
+from retrieval.variant_engine import Variants, count_variants, hash_variants
+from retrieval.variant_profiles import case_sequence, profile_occurrences, variant_profiles
+
+# Memory needed per edge occurrence while sorting the durations of a bucket of edges.
+DURATION_BYTES_PER_OCCURRENCE = 48
+
+# Finds keyed occurrences with durations in a chunk of cases, given the indices of the cases in the whole log.
+Occurrences = Callable[[EncodedLog, npt.NDArray[np.int64]], tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]]
+
+
+@dataclass
+class StreamingContext:
+    log: EncodedLog
+    chunk_size: int
+    memory_budget: int
+    spill_directory: Path
+    case_durations: npt.NDArray[np.float64]
+    variants: Variants
+    top_variant_ids: npt.NDArray[np.int64]
+    active_event_parameters: ActiveEventParameters | None
+    time_index: ActivityTimeIndex | None = None
+
+
+def _selected_chunks(log: EncodedLog, chunk_size: int,
+                     case_mask: npt.NDArray[np.bool_] | None) -> Iterator[tuple[EncodedLog, npt.NDArray[np.int64]]]:
+    first_case = 0
+    for chunk in iter_case_chunks(log, chunk_size):
+        cases = np.arange(first_case, first_case + chunk.n_cases, dtype=np.int64)
+        if case_mask is None:
+            yield chunk, cases
+        else:
+            selected = np.flatnonzero(case_mask[cases])
+            if len(selected):
+                yield chunk.select_cases(selected), cases[selected]
+        first_case += chunk.n_cases
+
+
+def _edge_occurrences(chunk: EncodedLog, _: npt.NDArray[np.int64]
+                      ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    return edge_occurrences(chunk)
+
+
+def _count_edges(chunks: Iterator[tuple[EncodedLog, npt.NDArray[np.int64]]],
+                 occurrences: Occurrences) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    edge_keys = np.zeros(0, dtype=np.int64)
+    edge_counts = np.zeros(0, dtype=np.int64)
+    for chunk, cases in chunks:
+        chunk_keys, chunk_counts = np.unique(occurrences(chunk, cases)[0], return_counts=True)
+        merged = np.unique(np.concatenate([edge_keys, chunk_keys]), return_inverse=True)
+        edge_keys = merged[0]
+        edge_counts = np.bincount(merged[1].reshape(-1), weights=np.concatenate([edge_counts, chunk_counts]),
+                                  minlength=len(edge_keys)).astype(np.int64)
+    return edge_keys, edge_counts
+
+
+def _bucket_starts(sizes: npt.NDArray[np.int64], capacity: int) -> npt.NDArray[np.int64]:
+    """
+    Splits consecutive items into buckets whose total size does not exceed the capacity.
+    Items bigger than the capacity get a bucket of their own.
+    :return: Index of the first item of each bucket.
+    """
+    cumulative = np.concatenate([[0], np.cumsum(sizes)])
+    starts = []
+    item = 0
+    while item < len(sizes):
+        starts.append(item)
+        end = int(np.searchsorted(cumulative, cumulative[item] + capacity, side="right")) - 1
+        item = max(end, item + 1)
+    return np.asarray(starts, dtype=np.int64)
+
+
+def edge_statistics_out_of_core(log: EncodedLog, case_mask: npt.NDArray[np.bool_] | None, chunk_size: int,
+                                memory_budget: int, spill_directory: Path,
+                                occurrences: Occurrences = _edge_occurrences) -> tuple[
+                                    npt.NDArray[np.int64], npt.NDArray[np.int64], EdgeStatistics]:
+    """
+    Calculates the exact duration statistics of all edges with bounded memory.
+    The edges are split into buckets that fit into the memory budget,
+    the durations are spilled to one file per bucket and each bucket is sorted and aggregated on its own.
+    :param log: Encoded, usually memory-mapped, log.
+    :param case_mask: Cases that should be considered. If None, all cases are considered.
+    :param chunk_size: Maximum number of events processed at once.
+    :param memory_budget: Memory budget in bytes.
+    :param spill_directory: Directory for the spill files.
+    :param occurrences: Function finding the occurrences within a chunk. By default, the directly follows edges.
+    Other keys, like the steps of variant profiles, are aggregated the same way.
+    :return: Edge keys, edge counts and the statistics in the order of the edge keys.
+    """
+    edge_keys, edge_counts = _count_edges(_selected_chunks(log, chunk_size, case_mask), occurrences)
+    bucket_starts = _bucket_starts(edge_counts, events_per_chunk(memory_budget, DURATION_BYTES_PER_OCCURRENCE))
+    bucket_first_keys = edge_keys[bucket_starts]
+    spill_directory.mkdir(parents=True, exist_ok=True)
+    with ExitStack() as stack:
+        files = [(stack.enter_context((spill_directory / f"edges_{i}.bin").open("wb")),
+                  stack.enter_context((spill_directory / f"durations_{i}.bin").open("wb")))
+                 for i in range(len(bucket_starts))]
+        for chunk, cases in _selected_chunks(log, chunk_size, case_mask):
+            keys, durations = occurrences(chunk, cases)
+            buckets = np.searchsorted(bucket_first_keys, keys, side="right") - 1
+            order = np.argsort(buckets, kind="stable")
+            bounds = np.searchsorted(buckets[order], np.arange(len(bucket_starts) + 1))
+            for bucket, (keys_file, durations_file) in enumerate(files):
+                selected = order[bounds[bucket]:bounds[bucket + 1]]
+                keys[selected].tofile(keys_file)
+                durations[selected].tofile(durations_file)
+    statistics = []
+    for bucket in range(len(bucket_starts)):
+        keys_path = spill_directory / f"edges_{bucket}.bin"
+        durations_path = spill_directory / f"durations_{bucket}.bin"
+        _, counts, sorted_durations = group_edges(np.fromfile(keys_path, dtype=np.int64),
+                                                  np.fromfile(durations_path, dtype=np.float64))
+        statistics.append(calculate_edge_statistics(counts, sorted_durations))
+        keys_path.unlink()
+        durations_path.unlink()
+    if not statistics:
+        return edge_keys, edge_counts, calculate_edge_statistics(edge_counts, np.zeros(0, dtype=np.float64))
+    return edge_keys, edge_counts, EdgeStatistics(
+        **{name: np.concatenate([getattr(part, name) for part in statistics])
+           for name in ("median", "min", "max", "stdev", "sum", "mean")})
+
+
+def get_process_model_out_of_core(log: EncodedLog, start_node_name: str, end_node_name: str,
+                                  memory_budget: int, spill_directory: Path) -> Graph:
+    """
+    Calculates the directly follows graph of a memory-mapped log by streaming over chunks of cases.
+    The result equals the one of get_process_model_partitioned on the same events.
+    :param log: Encoded, usually memory-mapped, log.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :param memory_budget: Memory budget in bytes.
+    :param spill_directory: Directory for the spill files.
+    :return: DFG with frequency and performance data.
+    """
+    edge_keys, edge_counts, statistics = edge_statistics_out_of_core(
+        log, None, events_per_chunk(memory_budget), memory_budget, spill_directory)
+    dfg = PartialDfg(n_activities=log.n_activities, edge_keys=edge_keys, edge_counts=edge_counts,
+                     durations=np.zeros(0, dtype=np.float64), **boundary_activities(log))
+    return partial_dfg_to_graph(dfg, log.activities, start_node_name, end_node_name, statistics)
+
+
+def _get_time_between_events(context: StreamingContext) -> list[Connection]:
+    case_mask = np.isin(context.variants.case_variants, context.top_variant_ids)
+    edge_keys, _, statistics = edge_statistics_out_of_core(context.log, case_mask, context.chunk_size,
+                                                           context.memory_budget, context.spill_directory)
+    return edge_connections(edge_keys, None, statistics, context.log.activities)
+
+
+def _get_variant_profiles(context: StreamingContext) -> dict[str, VariantProfile]:
+    variants = context.variants
+    top_variant_ids = context.top_variant_ids
+    if len(top_variant_ids) == 0:
+        return {}
+    ranks = np.full(variants.n_variants, -1, dtype=np.int64)
+    ranks[top_variant_ids] = np.arange(len(top_variant_ids))
+    case_ranks = ranks[variants.case_variants]
+    representatives = variants.representatives[top_variant_ids]
+    lengths = context.log.case_offsets[representatives + 1] - context.log.case_offsets[representatives]
+    n_steps = max(int(lengths.max()) - 1, 1)
+    keys, _, statistics = edge_statistics_out_of_core(
+        context.log, case_ranks >= 0, context.chunk_size, context.memory_budget, context.spill_directory,
+        lambda chunk, cases: profile_occurrences(chunk, case_ranks[cases], n_steps))
+    return variant_profiles(keys, statistics, [case_sequence(context.log, case) for case in representatives.tolist()],
+                            variants.counts[top_variant_ids].tolist(), n_steps)
+
+
+def _get_top_variants(context: StreamingContext) -> dict[str, TopVariant]:
+    log = context.log
+    variants = context.variants
+    duration_sums = np.bincount(variants.case_variants, weights=context.case_durations,
+                                minlength=variants.n_variants)
+    top_variants = {}
+    for rank, variant in enumerate(context.top_variant_ids.tolist()):
+        case = variants.representatives[variant]
+        codes = log.codes[log.case_offsets[case]:log.case_offsets[case + 1]]
+        top_variants[str(rank)] = TopVariant(event_sequence=[log.activities[code] for code in codes.tolist()],
+                                             frequency=int(variants.counts[variant]),
+                                             mean_duration=float(duration_sums[variant] /
+                                                                 variants.counts[variant]))
+    return top_variants
+
+
+def _get_event_frequency_distribution(context: StreamingContext) -> dict[str, int]:
+    counts = np.zeros(context.log.n_activities, dtype=np.int64)
+    for chunk in iter_case_chunks(context.log, context.chunk_size):
+        counts += np.bincount(chunk.codes, minlength=context.log.n_activities)
+    order = np.argsort(-counts, kind="stable")
+    return {context.log.activities[code]: int(counts[code]) for code in order.tolist() if counts[code] > 0}
+
+
+out_of_core_metrics: dict[str, Callable[[StreamingContext], Any]] = {
+    "n_traces": lambda context: context.log.n_cases,
+    "n_events": lambda context: context.log.n_events,
+    "n_variants": lambda context: context.variants.n_variants,
+    "top_variants": _get_top_variants,
+    "tbe": _get_time_between_events,
+    "variant_profiles": _get_variant_profiles,
+    "max_trace_length": lambda context: int(context.log.case_lengths().max()),
+    "min_trace_length": lambda context: int(context.log.case_lengths().min()),
+    "event_frequency_distr": _get_event_frequency_distribution,
+    "trace_length_distr": lambda context: pd.Series(context.log.case_lengths()).astype(str).value_counts().to_dict(),
+    "max_trace_duration": lambda context: float(context.case_durations.max()),
+    "min_trace_duration": lambda context: float(context.case_durations.min()),
+    "trace_duration_quantiles": lambda context: calculate_duration_quantiles(context.case_durations),
+    "trace_duration_histogram": lambda context: calculate_duration_histogram(context.case_durations),
+    "active_events": lambda context: calculate_active_events(
+        context.time_index or build_activity_time_index(context.log, context.chunk_size),
+        context.active_event_parameters),
+}
+
+
+def get_metrics_out_of_core(log: EncodedLog, active_event_parameters: ActiveEventParameters | None,
+                            n_top_variants: int, memory_budget: int, spill_directory: Path,
+                            variants: Variants | None = None, time_index: ActivityTimeIndex | None = None) -> Metrics:
+    """
+    Calculates the metrics of a memory-mapped log by streaming over chunks of cases.
+    Only arrays with one entry per case or per variant are held in memory.
+    :param log: Encoded, usually memory-mapped, log.
+    :param active_event_parameters: Parameters to calculate the active events per timeframe.
+    :param n_top_variants: Amount of top variants that should be included in the variant dependent metrics.
+    :param memory_budget: Memory budget in bytes.
+    :param spill_directory: Directory for the spill files.
+    :param variants: Precalculated variants of the cases of the log. If None, they are calculated.
+    :param time_index: Precalculated activity time index of the log. If None, it is calculated when needed.
+    :return: calculated metrics.
+    """
+    chunk_size = events_per_chunk(memory_budget)
+    first_timestamps = log.timestamps[log.case_offsets[:-1]]
+    last_timestamps = log.timestamps[log.case_offsets[1:] - 1]
+    if variants is None:
+        hashes = np.concatenate([hash_variants(chunk) for chunk in iter_case_chunks(log, chunk_size)])
+        variants = count_variants(log, hashes, chunk_size)
+    context = StreamingContext(log=log, chunk_size=chunk_size, memory_budget=memory_budget,
+                               spill_directory=spill_directory,
+                               case_durations=(last_timestamps - first_timestamps) / 1e9,
+                               variants=variants, top_variant_ids=variants.top(n_top_variants),
+                               active_event_parameters=active_event_parameters, time_index=time_index)
+    values = {}
+    for field in Metrics.model_fields.keys():
+        checkpoint()
+        values[field] = None if field in CONFIG["exclude"] else out_of_core_metrics[field](context)
+    return Metrics.model_validate(values)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+from model.response_model import Connection, Graph
+
+NOT_SEEN = np.iinfo(np.int64).max
+
+
+@dataclass(frozen=True)
+class PartialDfg:
+    """
+    Directly follows graph of a subset of the cases of a log.
+    Partial graphs of disjoint sets of cases can be merged into the graph of their union.
+    Edges are encoded as source_code * n_activities + target_code.
+    The durations of all edge occurrences are kept, grouped by edge and sorted within each edge,
+    so that exact medians can be calculated after merging and results do not depend on the partitioning.
+    """
+    n_activities: int
+    edge_keys: npt.NDArray[np.int64]
+    edge_counts: npt.NDArray[np.int64]
+    durations: npt.NDArray[np.float64]
+    start_counts: npt.NDArray[np.int64]
+    end_counts: npt.NDArray[np.int64]
+    start_first_positions: npt.NDArray[np.int64]
+    end_first_positions: npt.NDArray[np.int64]
+
+
+@dataclass(frozen=True)
+class EdgeStatistics:
+    median: npt.NDArray[np.float64]
+    min: npt.NDArray[np.float64]
+    max: npt.NDArray[np.float64]
+    stdev: npt.NDArray[np.float64]
+    sum: npt.NDArray[np.float64]
+    mean: npt.NDArray[np.float64]
+
+
+def group_edges(keys: npt.NDArray[np.int64],
+                 durations: npt.NDArray[np.float64]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64],
+                                                              npt.NDArray[np.float64]]:
+    """
+    Sorts edge occurrences by edge and duration and counts the occurrences of each edge.
+    :param keys: Edge key of each occurrence.
+    :param durations: Duration of each occurrence.
+    :return: Unique edge keys, their counts and the sorted durations.
+    """
+    order = np.lexsort((durations, keys))
+    edge_keys, edge_counts = np.unique(keys[order], return_counts=True)
+    return edge_keys.astype(np.int64), edge_counts.astype(np.int64), durations[order]
+
+
+def _first_positions(codes: npt.NDArray[np.int32], positions: npt.NDArray[np.int64],
+                     n_activities: int) -> npt.NDArray[np.int64]:
+    first_positions = np.full(n_activities, NOT_SEEN, dtype=np.int64)
+    np.minimum.at(first_positions, codes, positions)
+    return first_positions
+
+
+def boundary_activities(log: EncodedLog) -> dict[str, npt.NDArray[np.int64]]:
+    """
+    Counts how often each activity starts and ends a case
+    and finds the first position of a case starting and ending with it.
+    :param log: Encoded log.
+    :return: Start and end counts and first positions, keyed like the fields of PartialDfg.
+    """
+    n_activities = log.n_activities
+    start_codes = np.asarray(log.codes[log.case_offsets[:-1]])
+    end_codes = np.asarray(log.codes[log.case_offsets[1:] - 1])
+    return {"start_counts": np.bincount(start_codes, minlength=n_activities).astype(np.int64),
+            "end_counts": np.bincount(end_codes, minlength=n_activities).astype(np.int64),
+            "start_first_positions": _first_positions(start_codes, log.case_first_positions, n_activities),
+            "end_first_positions": _first_positions(end_codes, log.case_first_positions, n_activities)}
+
+
+def edge_occurrences(log: EncodedLog) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Finds all pairs of directly following events within the cases of the log.
+    :param log: Encoded log.
+    :return: Edge key and duration in seconds of each pair.
+    """
+    positions = log.directly_follows_positions()
+    codes = np.asarray(log.codes, dtype=np.int64)
+    keys: npt.NDArray[np.int64] = codes[positions] * log.n_activities + codes[positions + 1]
+    timestamps = np.asarray(log.timestamps, dtype=np.int64)
+    durations: npt.NDArray[np.float64] = (timestamps[positions + 1] - timestamps[positions]) / 1e9
+    return keys, durations
+
+
+def compute_partial_dfg(log: EncodedLog) -> PartialDfg:
+    """
+    Calculates the directly follows graph of all cases of the given log.
+    :param log: Encoded log, possibly containing only a subset of the cases of a bigger log.
+    :return: Partial directly follows graph.
+    """
+    edge_keys, edge_counts, sorted_durations = group_edges(*edge_occurrences(log))
+    return PartialDfg(n_activities=log.n_activities, edge_keys=edge_keys, edge_counts=edge_counts,
+                      durations=sorted_durations, **boundary_activities(log))
+
+
+def merge_partial_dfgs(partial_dfgs: list[PartialDfg]) -> PartialDfg:
+    """
+    Merges partial directly follows graphs calculated on disjoint sets of cases of the same log.
+    The occurrences of each partial graph are already sorted by edge and duration, so they are merged
+    as sorted runs instead of being sorted again: with the edge as real and the duration as imaginary part,
+    complex numbers compare like (edge, duration) pairs, and the stable sort (timsort) merges the k runs
+    in O(n log k).
+    :param partial_dfgs: Partial graphs sharing the same activity encoding.
+    :return: Directly follows graph of all cases.
+    """
+    n_activities = partial_dfgs[0].n_activities
+    runs = np.concatenate([np.repeat(dfg.edge_keys.astype(np.float64), dfg.edge_counts) + 1j * dfg.durations
+                           for dfg in partial_dfgs])
+    runs.sort(kind="stable")
+    edge_keys, inverse = np.unique(np.concatenate([dfg.edge_keys for dfg in partial_dfgs]), return_inverse=True)
+    edge_counts = np.bincount(inverse.reshape(-1), weights=np.concatenate([dfg.edge_counts for dfg in partial_dfgs]),
+                              minlength=len(edge_keys)).astype(np.int64)
+    return PartialDfg(n_activities=n_activities,
+                      edge_keys=edge_keys.astype(np.int64),
+                      edge_counts=edge_counts,
+                      durations=np.ascontiguousarray(runs.imag),
+                      start_counts=np.sum([dfg.start_counts for dfg in partial_dfgs], axis=0),
+                      end_counts=np.sum([dfg.end_counts for dfg in partial_dfgs], axis=0),
+                      start_first_positions=np.min([dfg.start_first_positions for dfg in partial_dfgs], axis=0),
+                      end_first_positions=np.min([dfg.end_first_positions for dfg in partial_dfgs], axis=0))
+
+
+def calculate_edge_statistics(edge_counts: npt.NDArray[np.int64],
+                              durations: npt.NDArray[np.float64]) -> EdgeStatistics:
+    """
+    Calculates the duration statistics of each edge from its sorted durations.
+    The standard deviation is the sample standard deviation and nan for edges occurring only once.
+    :param edge_counts: Number of occurrences of each edge.
+    :param durations: Durations grouped by edge, in the order of edge_counts, and sorted within each edge.
+    :return: Statistics in the order of edge_counts.
+    """
+    if len(edge_counts) == 0:
+        empty = np.zeros(0, dtype=np.float64)
+        return EdgeStatistics(median=empty, min=empty, max=empty, stdev=empty, sum=empty, mean=empty)
+    starts = np.zeros(len(edge_counts), dtype=np.int64)
+    np.cumsum(edge_counts[:-1], out=starts[1:])
+    sums = np.add.reduceat(durations, starts)
+    means = sums / edge_counts
+    medians = (durations[starts + (edge_counts - 1) // 2] + durations[starts + edge_counts // 2]) / 2
+    deviations = durations - np.repeat(means, edge_counts)
+    squared_deviations = np.add.reduceat(deviations * deviations, starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stdevs = np.where(edge_counts > 1, np.sqrt(squared_deviations / (edge_counts - 1)), np.nan)
+    return EdgeStatistics(median=medians, min=durations[starts], max=durations[starts + edge_counts - 1],
+                          stdev=stdevs, sum=sums, mean=means)
+
+
+def edge_connections(edge_keys: npt.NDArray[np.int64], edge_counts: npt.NDArray[np.int64] | None,
+                     statistics: EdgeStatistics, activities: list[str]) -> list[Connection]:
+    """
+    Creates a connection for each edge.
+    :param edge_keys: Edge keys.
+    :param edge_counts: Frequencies of the edges. If None, the frequency is set to -1.
+    :param statistics: Duration statistics in the order of the edge keys.
+    :param activities: Activity names indexed by their codes.
+    :return: List of connections.
+    """
+    stdevs = np.where(np.isnan(statistics.stdev), -1, statistics.stdev)
+    connections = []
+    for index, key in enumerate(edge_keys.tolist()):
+        source, target = divmod(key, len(activities))
+        connections.append(Connection(e1=activities[source], e2=activities[target],
+                                      frequency=-1 if edge_counts is None else int(edge_counts[index]),
+                                      median=float(statistics.median[index]), min=float(statistics.min[index]),
+                                      max=float(statistics.max[index]), stdev=float(stdevs[index]),
+                                      sum=float(statistics.sum[index]), mean=float(statistics.mean[index])))
+    return connections
+
+
+def _boundary_connections(counts: npt.NDArray[np.int64], first_positions: npt.NDArray[np.int64],
+                          activities: list[str], node_name: str, outgoing: bool) -> list[Connection]:
+    connections = []
+    seen_codes = np.flatnonzero(counts)
+    for code in seen_codes[np.argsort(first_positions[seen_codes], kind="stable")].tolist():
+        e1, e2 = (node_name, activities[code]) if outgoing else (activities[code], node_name)
+        connections.append(Connection(e1=e1, e2=e2, frequency=int(counts[code]), median=-1, min=-1,
+                                      max=-1, stdev=-1, sum=-1, mean=-1))
+    return connections
+
+
+def partial_dfg_to_graph(dfg: PartialDfg, activities: list[str], start_node_name: str,
+                         end_node_name: str, statistics: EdgeStatistics | None = None) -> Graph:
+    """
+    Turns a directly follows graph into the response graph, adding the artificial start and end nodes.
+    Connections are ordered like the ones of the pm4py based calculation.
+    :param dfg: Directly follows graph.
+    :param activities: Activity names indexed by their codes.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :param statistics: Precalculated duration statistics of the edges.
+    If None, they are calculated from the durations of the graph.
+    :return: Graph.
+    """
+    if statistics is None:
+        statistics = calculate_edge_statistics(dfg.edge_counts, dfg.durations)
+    connections = _boundary_connections(dfg.start_counts, dfg.start_first_positions, activities,
+                                        start_node_name, outgoing=True)
+    connections.extend(edge_connections(dfg.edge_keys, dfg.edge_counts, statistics, activities))
+    connections.extend(_boundary_connections(dfg.end_counts, dfg.end_first_positions, activities,
+                                             end_node_name, outgoing=False))
+    return Graph(connections=connections)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from data_handling.activity_time_index import ActivityTimeIndex
+from data_handling.complexity_reduction import select_frequent_variants
+from data_handling.encoded_log import EncodedLog
+from data_handling.shared_log import SharedLogHandle, attach_log
+from helpers.cancellation import SharedCancellationHandle, attached_token, cancellation_scope, checkpoint
+from model.input_model import InputParameters
+from model.response_model import Graph, Metrics, SamplingSummary
+from retrieval.backends import PipelineBackend, get_backend
+from retrieval.case_sampling import CaseSample, scale_to_population
+from retrieval.graph_simplification import simplify_graph
+
+# Strata, population sizes and sample sizes of a CaseSample, which is rebuilt around the shared log in a worker.
+SampleDesign = tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]
+
+
+def run_pipeline(events: pd.DataFrame | EncodedLog, params: InputParameters,
+                 time_index: ActivityTimeIndex | None = None, sample: CaseSample | None = None,
+                 backend: PipelineBackend | None = None) -> tuple[Graph, Metrics, SamplingSummary | None]:
+    """
+    Calculates the process model and the metrics of a request.
+    Between the steps, the calculation is stopped if it was cancelled.
+    :param events: Events of the request.
+    :param params: Parameters of the request.
+    :param time_index: Activity time index of the events to calculate the active events with.
+    :param sample: Case sample the events were drawn with, if sampling is used.
+    :param backend: Backend the steps run on. If None, the configured backend is used.
+    :return: Process model, metrics and, if sampling is used, the confidence intervals.
+    """
+    if backend is None:
+        backend = get_backend()
+    if params.reduce_complexity_by or params.add_counts or params.state_changing_events:
+        time_index = None
+    checkpoint()
+    events = backend.load(events)
+    # Counts and states rename events depending only on the preceding events of the trace,
+    # so the variant of each trace does not change and the variants are calculated once for all steps.
+    variants = backend.variants(events)
+    checkpoint()
+    if params.reduce_complexity_by:
+        variants = select_frequent_variants(variants, 1 - params.reduce_complexity_by)
+        events = backend.select_traces(events, variants)
+    if params.add_counts:
+        events = backend.add_counts(events, params.max_count)
+    elif params.state_changing_events:
+        events = backend.add_states(events, params.state_changing_events)
+    checkpoint()
+    graph = backend.process_model(events, params.start_node_name, params.end_node_name)
+    checkpoint()
+    metrics = backend.metrics(events, params.active_events, params.n_top_variants, time_index, variants)
+    checkpoint()
+    summary = None
+    if sample is not None:
+        summary = scale_to_population(graph, metrics, backend.encoded(events), sample, params.start_node_name,
+                                      params.end_node_name)
+    if params.simplification is not None:
+        graph = simplify_graph(graph, params.simplification, params.start_node_name, params.end_node_name)
+        if summary is not None:
+            kept_edges = {(connection.e1, connection.e2) for connection in graph.connections}
+            summary.edge_frequencies = [interval for interval in summary.edge_frequencies
+                                        if (interval.e1, interval.e2) in kept_edges]
+    return graph, metrics, summary
+
+
+def run_pipeline_on_shared_log(shared_log: SharedLogHandle, params: InputParameters,
+                               time_index: ActivityTimeIndex | None = None,
+                               sample_design: SampleDesign | None = None,
+                               cancellation: SharedCancellationHandle | None = None
+                               ) -> tuple[Graph, Metrics, SamplingSummary | None]:
+    """
+    Runs run_pipeline in a worker process on an encoded log handed over through shared memory.
+    :param shared_log: Handle of the events of the request.
+    :param params: Parameters of the request.
+    :param time_index: Activity time index of the events to calculate the active events with.
+    :param sample_design: Strata, population and sample sizes if the events are a case sample.
+    :param cancellation: Handle of the cancellation token of the request, if it can be cancelled.
+    :return: Process model, metrics and, if sampling is used, the confidence intervals.
+    """
+    log = attach_log(shared_log)
+    sample = None
+    if sample_design is not None and params.sampling is not None:
+        sample = CaseSample(log, *sample_design, parameters=params.sampling)
+    if cancellation is None:
+        return run_pipeline(log, params, time_index, sample)
+    with attached_token(cancellation) as token, cancellation_scope(token):
+        return run_pipeline(log, params, time_index, sample)
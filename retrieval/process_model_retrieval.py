@@ -1,24 +1,50 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING
+
 import numpy as np
 import pandas as pd
-import pm4py
-from pm4py.objects.log.obj import EventLog
 
+from data_handling.encoded_log import EncodedLog, encode_log
 from model.response_model import Connection, Graph
+from retrieval.partial_dfg import compute_partial_dfg, merge_partial_dfgs, partial_dfg_to_graph
 
+if TYPE_CHECKING:
+    from pm4py.objects.log.obj import EventLog
 
-def get_process_model(data: EventLog | pd.DataFrame, start_node_name: str, end_node_name: str) -> Graph:
+
+def get_process_model(data: pd.DataFrame, start_node_name: str, end_node_name: str) -> Graph:
     """
     Calculate directly follows graph with frequency of each graph edge
     as well as time statistics based on the given data.
     :param end_node_name: name of the node that represents the final node.
     :param start_node_name: name of the node that represents the first node.
+    :param data: Dataframe with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    :return: DFG with frequency and performance data.
+    """
+    return get_process_model_from_log(encode_log(data), start_node_name, end_node_name)
+
+
+def get_process_model_with_pm4py(data: EventLog | pd.DataFrame, start_node_name: str, end_node_name: str) -> Graph:
+    """
+    Calculate the graph of get_process_model with pm4py.
+    The service does not call it, since importing any module of pm4py imports all of pm4py, including matplotlib.
+    It is the reference the differential tests and benchmarks compare get_process_model with.
+    :param end_node_name: name of the node that represents the final node.
+    :param start_node_name: name of the node that represents the first node.
     :param data: Data containing the traces.
     If dataframe, it should have the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
     :return: DFG with frequency and performance data.
     """
+    from pm4py.discovery import discover_dfg, discover_performance_dfg
+
     data = data.copy()
-    performance_pm = pm4py.discovery.discover_performance_dfg(data)
-    frequency_pm = pm4py.discovery.discover_dfg(data)
+    performance_pm = discover_performance_dfg(data)
+    frequency_pm = discover_dfg(data)
     if performance_pm[1] != frequency_pm[1] or performance_pm[2] != frequency_pm[2]:
         raise Exception("Generated Graphs are not the same.")
     result_pm: Graph = Graph(connections=[])
@@ -41,3 +67,54 @@ def get_process_model(data: EventLog | pd.DataFrame, start_node_name: str, end_n
                                             max= -1, stdev= -1, sum= -1, mean= -1)
         result_pm.connections.append(connection)
     return result_pm
+
+
+@cache
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def partition_cases(log: EncodedLog, n_partitions: int) -> list[EncodedLog]:
+    """
+    Splits the log into disjoint sets of cases, assigning each case by the hash of its identifier.
+    :param log: Encoded log.
+    :param n_partitions: Number of partitions.
+    :return: One log per partition.
+    """
+    case_hashes = pd.util.hash_array(np.asarray(log.case_ids, dtype=object))
+    partition_of_case = (case_hashes % np.uint64(n_partitions)).astype(np.int64)
+    order = np.argsort(partition_of_case, kind="stable")
+    bounds = np.searchsorted(partition_of_case[order], np.arange(n_partitions + 1))
+    return [log.select_cases(order[bounds[i]:bounds[i + 1]]) for i in range(n_partitions)]
+
+
+def get_process_model_partitioned(data: pd.DataFrame, start_node_name: str, end_node_name: str,
+                                  n_partitions: int) -> Graph:
+    """
+    Calculate directly follows graph with frequency of each graph edge as well as time statistics,
+    computing partial graphs for disjoint partitions of the cases in parallel worker processes.
+    The partial graphs are merged, so the result does not depend on the number of partitions.
+    :param data: Dataframe with the columns 'case:concept:name', 'concept:name' and 'time:timestamp'.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :param n_partitions: Number of partitions the cases are split into.
+    :return: DFG with frequency and performance data.
+    """
+    return get_process_model_from_log(encode_log(data), start_node_name, end_node_name, n_partitions)
+
+
+def get_process_model_from_log(log: EncodedLog, start_node_name: str, end_node_name: str,
+                               n_partitions: int = 1) -> Graph:
+    """
+    Calculate directly follows graph of an encoded log as get_process_model_partitioned does.
+    :param log: Encoded log.
+    :param start_node_name: name of the node that represents the first node.
+    :param end_node_name: name of the node that represents the final node.
+    :param n_partitions: Number of partitions the cases are split into.
+    :return: DFG with frequency and performance data.
+    """
+    if n_partitions <= 1:
+        return partial_dfg_to_graph(compute_partial_dfg(log), log.activities, start_node_name, end_node_name)
+    executor = _get_executor(min(n_partitions, os.cpu_count() or 1))
+    partial_dfgs = list(executor.map(compute_partial_dfg, partition_cases(log, n_partitions)))
+    return partial_dfg_to_graph(merge_partial_dfgs(partial_dfgs), log.activities, start_node_name, end_node_name)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+
+HASH_BASES = (np.uint64(0x100000001B3), np.uint64(0x9E3779B97F4A7C15))
+
+
+def hash_variants(log: EncodedLog) -> npt.NDArray[np.uint64]:
+    """
+    Hashes the activity sequence of each case with two independent polynomial hashes (modulo 2^64).
+    Cases of the same variant get the same hash, so cases can be grouped into variants by comparing the hashes;
+    count_variants verifies the groups, since different sequences may collide.
+    :param log: Encoded log.
+    :return: Array of shape (n_cases, 2) with the hashes of each case.
+    """
+    lengths = log.case_lengths()
+    hashes = np.zeros((log.n_cases, 2), dtype=np.uint64)
+    if log.n_events == 0:
+        return hashes
+    positions = np.arange(log.n_events, dtype=np.int64) - np.repeat(log.case_offsets[:-1], lengths)
+    values = np.asarray(log.codes, dtype=np.uint64) + np.uint64(1)
+    with np.errstate(over="ignore"):
+        for column, base in enumerate(HASH_BASES):
+            powers = np.cumprod(np.full(int(lengths.max()), base, dtype=np.uint64))
+            hashes[:, column] = np.add.reduceat(values * powers[positions], log.case_offsets[:-1])
+    return hashes
+
+
+@dataclass(frozen=True)
+class Variants:
+    """
+    Variants of the cases of a log.
+    Variant ids are arbitrary; variants are ranked by their number of cases and, for equal numbers,
+    by their lexicographically smallest case identifier, which is the order pm4py uses.
+    case_variants holds the variant id of each case, counts the number of cases of each variant,
+    representatives the index of the case with the smallest identifier of each variant
+    and tie_keys the rank of that identifier among all case identifiers of the log.
+    """
+    case_ids: list[str]
+    case_variants: npt.NDArray[np.int64]
+    counts: npt.NDArray[np.int64]
+    representatives: npt.NDArray[np.int64]
+    tie_keys: npt.NDArray[np.int64]
+
+    @property
+    def n_variants(self) -> int:
+        return len(self.counts)
+
+    def _rank_keys(self) -> npt.NDArray[np.int64]:
+        return -self.counts * (int(self.tie_keys.max(initial=0)) + 1) + self.tie_keys
+
+    def ranked(self) -> npt.NDArray[np.int64]:
+        """
+        :return: All variant ids from the most to the least frequent variant.
+        """
+        return np.argsort(self._rank_keys(), kind="stable")
+
+    def top(self, k: int) -> npt.NDArray[np.int64]:
+        """
+        Selects the k most frequent variants with a partial sort.
+        :param k: Number of variants.
+        :return: Variant ids from the most frequent variant on.
+        """
+        if k >= self.n_variants:
+            return self.ranked()
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        keys = self._rank_keys()
+        selected = np.argpartition(keys, k - 1)[:k]
+        return selected[np.argsort(keys[selected], kind="stable")]
+
+    def variant_cases(self) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        Groups the cases by variant.
+        :return: Case indices ordered by variant id and the offsets of each variant within them,
+        so the cases of variant v are case_order[offsets[v]:offsets[v + 1]].
+        """
+        case_order = np.argsort(self.case_variants, kind="stable")
+        offsets = np.zeros(self.n_variants + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=offsets[1:])
+        return case_order, offsets
+
+    def select(self, variant_ids: npt.NDArray[np.int64]) -> Variants:
+        """
+        Keeps only the cases of the given variants. Their ranking is not changed.
+        :param variant_ids: Ids of the variants that are kept.
+        :return: Variants of the kept cases, with new variant ids following the order of the old ones.
+        """
+        kept = np.zeros(self.n_variants, dtype=bool)
+        kept[variant_ids] = True
+        new_ids = np.cumsum(kept) - 1
+        case_mask = kept[self.case_variants]
+        new_case_indices = np.cumsum(case_mask) - 1
+        return Variants(case_ids=[case_id for case_id, keep in zip(self.case_ids, case_mask.tolist(), strict=True)
+                                  if keep],
+                        case_variants=new_ids[self.case_variants[case_mask]],
+                        counts=self.counts[kept],
+                        representatives=new_case_indices[self.representatives[kept]],
+                        tie_keys=self.tie_keys[kept])
+
+
+def split_hash_collisions(log: EncodedLog, case_variants: npt.NDArray[np.int64], n_variants: int,
+                          max_events: int | None = None) -> npt.NDArray[np.int64]:
+    """
+    Verifies that the cases grouped into a variant by their hashes have the same activity sequence,
+    comparing each case with the first case of its variant, by length first and then activity by activity.
+    Cases differing from the first case of their variant, whose hashes collided, get new variants
+    by their exact activity sequence.
+    :param log: Encoded, possibly memory-mapped, log.
+    :param case_variants: Variant id of each case as grouped by the hashes.
+    :param n_variants: Number of variant ids.
+    :param max_events: If set, the activities are compared in ranges of cases with at most that many events.
+    :return: Variant id of each case, with the new variants numbered from n_variants on.
+    """
+    first_cases = np.full(n_variants, log.n_cases, dtype=np.int64)
+    np.minimum.at(first_cases, case_variants, np.arange(log.n_cases, dtype=np.int64))
+    references = first_cases[case_variants]
+    lengths = log.case_lengths()
+    differs = lengths != lengths[references]
+    compared = np.flatnonzero(~differs & (references != np.arange(log.n_cases)))
+    event_ends = np.cumsum(lengths[compared])
+    start = 0
+    while start < len(compared):
+        end = max(int(np.searchsorted(event_ends, event_ends[start] - lengths[compared[start]]
+                                      + (max_events or log.n_events), side="right")), start + 1)
+        cases = compared[start:end]
+        event_cases = np.repeat(cases, lengths[cases])
+        positions = np.arange(len(event_cases), dtype=np.int64) - np.repeat(
+            np.cumsum(lengths[cases]) - lengths[cases], lengths[cases])
+        mismatched = (log.codes[log.case_offsets[event_cases] + positions]
+                      != log.codes[log.case_offsets[references[event_cases]] + positions])
+        differs[event_cases[mismatched]] = True
+        start = end
+    if not differs.any():
+        return case_variants
+    case_variants = case_variants.copy()
+    new_variants: dict[tuple[int, ...], int] = {}
+    for case in np.flatnonzero(differs).tolist():
+        sequence = tuple(log.codes[log.case_offsets[case]:log.case_offsets[case + 1]].tolist())
+        case_variants[case] = new_variants.setdefault(sequence, n_variants + len(new_variants))
+    return case_variants
+
+
+def count_variants(log: EncodedLog, hashes: npt.NDArray[np.uint64] | None = None,
+                   max_events: int | None = None) -> Variants:
+    """
+    Identifies the variant of each case by hashing the activity sequences of the cases
+    and verifying that the cases with equal hashes have equal sequences.
+    :param log: Encoded log.
+    :param hashes: Precalculated hashes of the cases as returned by hash_variants.
+    :param max_events: If set, the sequences are verified in ranges of cases with at most that many events.
+    :return: Variants of the log.
+    """
+    if hashes is None:
+        hashes = hash_variants(log)
+    inverse = np.unique(hashes, axis=0, return_inverse=True)[1].reshape(-1).astype(np.int64)
+    case_variants = split_hash_collisions(log, inverse, int(inverse.max(initial=-1)) + 1, max_events)
+    counts = np.bincount(case_variants, minlength=int(case_variants.max(initial=-1)) + 1).astype(np.int64)
+    n_variants = len(counts)
+    sorted_cases = np.argsort(np.asarray(log.case_ids, dtype=str), kind="stable")
+    case_ranks = np.empty(log.n_cases, dtype=np.int64)
+    case_ranks[sorted_cases] = np.arange(log.n_cases)
+    tie_keys = np.full(n_variants, log.n_cases, dtype=np.int64)
+    np.minimum.at(tie_keys, case_variants, case_ranks)
+    representatives = sorted_cases[tie_keys]
+    return Variants(case_ids=log.case_ids, case_variants=case_variants, counts=counts,
+                    representatives=representatives, tie_keys=tie_keys)
@@ -0,0 +1,84 @@
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+from model.response_model import StepPerformance, VariantProfile
+from retrieval.partial_dfg import EdgeStatistics, calculate_edge_statistics, group_edges
+
+# Each step of a case of a top variant is counted twice, once with the time between its events
+# and once with the time from the start of the case to its second event.
+STEP_DURATION, CUMULATIVE_DURATION = 0, 1
+
+
+def profile_occurrences(log: EncodedLog, case_ranks: npt.NDArray[np.int64],
+                        n_steps: int) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Finds the steps of the cases of the top variants with their durations.
+    Steps are keyed by the rank of their variant, their position within the case and the kind of duration,
+    as (rank * n_steps + position) * 2 + kind, so all cases of a variant share the keys of its steps.
+    :param log: Encoded log.
+    :param case_ranks: Rank of the variant of each case of the log among the top variants, -1 for other cases.
+    :param n_steps: Number of steps of the longest top variant.
+    :return: Key and duration in seconds of each occurrence.
+    """
+    positions = log.directly_follows_positions()
+    case_indices = np.searchsorted(log.case_offsets, positions, side="right") - 1
+    ranks = case_ranks[case_indices]
+    kept = ranks >= 0
+    positions, case_indices, ranks = positions[kept], case_indices[kept], ranks[kept]
+    case_starts = log.case_offsets[case_indices]
+    timestamps = np.asarray(log.timestamps, dtype=np.int64)
+    ends = timestamps[positions + 1]
+    keys = (ranks * n_steps + positions - case_starts) * 2
+    return (np.concatenate([keys + STEP_DURATION, keys + CUMULATIVE_DURATION]),
+            np.concatenate([ends - timestamps[positions], ends - timestamps[case_starts]]) / 1e9)
+
+
+def case_sequence(log: EncodedLog, case: int) -> list[str]:
+    return [log.activities[code] for code in log.codes[log.case_offsets[case]:log.case_offsets[case + 1]].tolist()]
+
+
+def variant_profiles(keys: npt.NDArray[np.int64], statistics: EdgeStatistics, sequences: list[list[str]],
+                     frequencies: list[int], n_steps: int) -> dict[str, VariantProfile]:
+    """
+    Creates the profiles of the top variants from the statistics of their steps.
+    :param keys: Ascending keys of the steps as returned by profile_occurrences.
+    :param statistics: Duration statistics in the order of the keys.
+    :param sequences: Activities of each top variant, from the most frequent variant on.
+    :param frequencies: Number of cases of each top variant.
+    :param n_steps: Number of steps of the longest top variant, as used for the keys.
+    :return: Dictionary with the rank as key and the profile of the variant as value.
+    """
+    stdevs = np.where(np.isnan(statistics.stdev), -1, statistics.stdev)
+    steps: list[list[StepPerformance]] = [[] for _ in sequences]
+    # Keys are sorted, so the step duration of a step directly precedes its cumulative duration.
+    for index in range(0, len(keys), 2):
+        rank, position = divmod(int(keys[index]) // 2, n_steps)
+        steps[rank].append(StepPerformance(
+            e1=sequences[rank][position], e2=sequences[rank][position + 1],
+            median=float(statistics.median[index]), min=float(statistics.min[index]),
+            max=float(statistics.max[index]), stdev=float(stdevs[index]), mean=float(statistics.mean[index]),
+            cumulative_median=float(statistics.median[index + 1]),
+            cumulative_mean=float(statistics.mean[index + 1])))
+    return {str(rank): VariantProfile(event_sequence=sequence, frequency=frequency, steps=steps[rank])
+            for rank, (sequence, frequency) in enumerate(zip(sequences, frequencies, strict=True))}
+
+
+def calculate_variant_profiles(log: EncodedLog, case_ranks: npt.NDArray[np.int64],
+                               frequencies: list[int]) -> dict[str, VariantProfile]:
+    """
+    Calculates the duration statistics of every step of each top variant and the time from the start
+    of the case to each step, in one pass over the steps of all cases of the top variants.
+    :param log: Encoded log containing at least one case of each top variant.
+    :param case_ranks: Rank of the variant of each case of the log among the top variants, -1 for other cases.
+    :param frequencies: Number of cases of each top variant.
+    :return: Dictionary with the rank as key and the profile of the variant as value.
+    """
+    ranks, first_cases = np.unique(case_ranks, return_index=True)
+    first_cases = first_cases[ranks >= 0]
+    lengths = log.case_lengths()[first_cases]
+    sequences = [case_sequence(log, case) for case in first_cases.tolist()]
+    n_steps = max(int(lengths.max(initial=1)) - 1, 1)
+    keys, counts, sorted_durations = group_edges(*profile_occurrences(log, case_ranks, n_steps))
+    return variant_profiles(keys, calculate_edge_statistics(counts, sorted_durations), sequences, frequencies,
+                            n_steps)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from data_handling.encoded_log import EncodedLog
+from model.response_model import ElapsedTime, NextStep, TopVariant, VariantCompletions, VariantPrefix
+from retrieval.variant_engine import Variants, count_variants
+
+TRIE_FILES = {
+    "codes": "variant_trie_codes.npy",
+    "parents": "variant_trie_parents.npy",
+    "child_offsets": "variant_trie_child_offsets.npy",
+    "case_counts": "variant_trie_case_counts.npy",
+    "end_counts": "variant_trie_end_counts.npy",
+    "best_end_counts": "variant_trie_best_end_counts.npy",
+    "elapsed_means": "variant_trie_elapsed_means.npy",
+    "elapsed_stdevs": "variant_trie_elapsed_stdevs.npy",
+    "elapsed_mins": "variant_trie_elapsed_mins.npy",
+    "elapsed_maxs": "variant_trie_elapsed_maxs.npy",
+    "end_durations": "variant_trie_end_durations.npy",
+}
+
+
+@dataclass(frozen=True)
+class VariantTrie:
+    """
+    Prefix tree of the variants of a log. Each node is a prefix of at least one variant, the root (node 0)
+    the empty prefix. Nodes are numbered level by level and, within a level, by parent and activity code,
+    so the children of node n are the nodes child_offsets[n] to child_offsets[n + 1], sorted by their code.
+    For each node, case_counts holds the number of cases starting with the prefix, end_counts the number of cases
+    that end with it and best_end_counts the largest end count within its subtree.
+    The elapsed time is the time from the first event of a case to the last event of the prefix, in seconds,
+    and end_durations the mean duration of the cases ending with the prefix.
+    """
+    activities: list[str]
+    codes: npt.NDArray[np.int32]
+    parents: npt.NDArray[np.int32]
+    child_offsets: npt.NDArray[np.int64]
+    case_counts: npt.NDArray[np.int64]
+    end_counts: npt.NDArray[np.int64]
+    best_end_counts: npt.NDArray[np.int64]
+    elapsed_means: npt.NDArray[np.float64]
+    elapsed_stdevs: npt.NDArray[np.float64]
+    elapsed_mins: npt.NDArray[np.float64]
+    elapsed_maxs: npt.NDArray[np.float64]
+    end_durations: npt.NDArray[np.float64]
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.codes)
+
+    def children(self, node: int) -> range:
+        return range(int(self.child_offsets[node]), int(self.child_offsets[node + 1]))
+
+    def find(self, prefix: list[str]) -> int | None:
+        """
+        Follows a prefix from the root.
+        :param prefix: Activity names.
+        :return: Node of the prefix or None if no variant starts with it.
+        :raises ValueError: If an activity does not exist.
+        """
+        node = 0
+        for activity in prefix:
+            code = bisect_left(self.activities, activity)
+            if code == len(self.activities) or self.activities[code] != activity:
+                raise ValueError(f"Activity {activity} does not exist.")
+            children = self.children(node)
+            child = children.start + int(np.searchsorted(self.codes[children.start:children.stop], code))
+            if child == children.stop or self.codes[child] != code:
+                return None
+            node = child
+        return node
+
+    def sequence(self, node: int) -> list[str]:
+        """
+        :param node: Node of the trie.
+        :return: Activity names of the prefix of the node.
+        """
+        codes = []
+        while node > 0:
+            codes.append(int(self.codes[node]))
+            node = int(self.parents[node])
+        return [self.activities[code] for code in reversed(codes)]
+
+    def top_completions(self, node: int, k: int) -> list[int]:
+        """
+        Finds the k most frequent variants starting with the prefix of a node with a best-first search,
+        which only visits subtrees that can contain one of them.
+        :param node: Node of the prefix.
+        :param k: Number of variants.
+        :return: End nodes of the variants, from the most frequent variant on.
+        """
+        # Entries are (negative count, node, is subtree); subtrees are ordered by the best count within them.
+        queue = [(-int(self.best_end_counts[node]), node, True)]
+        completions: list[int] = []
+        while queue and len(completions) < k:
+            _, current, is_subtree = heapq.heappop(queue)
+            if not is_subtree:
+                completions.append(current)
+                continue
+            if self.end_counts[current] > 0:
+                heapq.heappush(queue, (-int(self.end_counts[current]), current, False))
+            for child in self.children(current):
+                heapq.heappush(queue, (-int(self.best_end_counts[child]), child, True))
+        return completions
+
+
+def build_variant_trie(log: EncodedLog, variants: Variants | None = None) -> VariantTrie:
+    """
+    Builds the prefix tree of the variants of a log. The tree is built level by level from one case per variant,
+    then the events of all cases are assigned to their node in one pass to aggregate the counts and durations.
+    :param log: Encoded log.
+    :param variants: Precalculated variants of the log. If None, they are calculated.
+    :return: Prefix tree of the variants.
+    """
+    if variants is None:
+        variants = count_variants(log)
+    # Variant v is case v of the sequences.
+    sequences = log.select_cases(variants.representatives)
+    sequence_codes = np.asarray(sequences.codes, dtype=np.int64)
+    sequence_lengths = sequences.case_lengths()
+    event_nodes = np.zeros(sequences.n_events, dtype=np.int64)
+    variant_nodes = np.zeros(variants.n_variants, dtype=np.int64)
+    codes, parents, level_offsets = [np.full(1, -1, dtype=np.int64)], [np.full(1, -1, dtype=np.int64)], [0, 1]
+    for depth in range(int(sequence_lengths.max(initial=0))):
+        continuing = np.flatnonzero(sequence_lengths > depth)
+        positions = sequences.case_offsets[continuing] + depth
+        keys = variant_nodes[continuing] * log.n_activities + sequence_codes[positions]
+        level_keys, inverse = np.unique(keys, return_inverse=True)
+        variant_nodes[continuing] = event_nodes[positions] = level_offsets[-1] + inverse.reshape(-1)
+        parents.append(level_keys // log.n_activities)
+        codes.append(level_keys % log.n_activities)
+        level_offsets.append(level_offsets[-1] + len(level_keys))
+    parent_array = np.concatenate(parents)
+    n_nodes = len(parent_array)
+    child_offsets = np.searchsorted(parent_array[1:], np.arange(n_nodes + 1)).astype(np.int64) + 1
+
+    variant_counts = variants.counts[np.repeat(np.arange(variants.n_variants), sequence_lengths)]
+    case_counts = np.bincount(event_nodes, weights=variant_counts, minlength=n_nodes).astype(np.int64)
+    case_counts[0] = log.n_cases
+    end_nodes = event_nodes[sequences.case_offsets[1:] - 1]
+    end_counts = np.bincount(end_nodes, weights=variants.counts, minlength=n_nodes).astype(np.int64)
+    best_end_counts = end_counts.copy()
+    for level in range(len(level_offsets) - 2, 0, -1):
+        start, end = level_offsets[level], level_offsets[level + 1]
+        np.maximum.at(best_end_counts, parent_array[start:end], best_end_counts[start:end])
+
+    # Node and elapsed time of every event of the log.
+    lengths = log.case_lengths()
+    case_starts = np.repeat(log.case_offsets[:-1], lengths)
+    depths = np.arange(log.n_events, dtype=np.int64) - case_starts
+    nodes = event_nodes[np.repeat(sequences.case_offsets[:-1][variants.case_variants], lengths) + depths]
+    timestamps = np.asarray(log.timestamps, dtype=np.int64)
+    elapsed = (timestamps - timestamps[case_starts]) / 1e9
+    counted = np.maximum(case_counts, 1)
+    means = np.bincount(nodes, weights=elapsed, minlength=n_nodes) / counted
+    squared_deviations = np.bincount(nodes, weights=(elapsed - means[nodes]) ** 2, minlength=n_nodes)
+    stdevs = np.sqrt(squared_deviations / np.maximum(case_counts - 1, 1))
+    mins = np.full(n_nodes, np.inf)
+    np.minimum.at(mins, nodes, elapsed)
+    maxs = np.full(n_nodes, -np.inf)
+    np.maximum.at(maxs, nodes, elapsed)
+    mins[0] = maxs[0] = 0.0
+    case_durations = elapsed[log.case_offsets[1:] - 1]
+    end_durations = (np.bincount(end_nodes[variants.case_variants], weights=case_durations, minlength=n_nodes)
+                     / np.maximum(end_counts, 1))
+    return VariantTrie(activities=log.activities, codes=np.concatenate(codes).astype(np.int32),
+                       parents=parent_array.astype(np.int32), child_offsets=child_offsets, case_counts=case_counts,
+                       end_counts=end_counts, best_end_counts=best_end_counts, elapsed_means=means,
+                       elapsed_stdevs=stdevs, elapsed_mins=mins, elapsed_maxs=maxs, end_durations=end_durations)
+
+
+def save_variant_trie(trie: VariantTrie, directory: Path) -> None:
+    """
+    Stores a trie next to the files of its encoded log.
+    :param trie: Trie.
+    :param directory: Directory the files are written to.
+    """
+    for field, file_name in TRIE_FILES.items():
+        np.save(directory / file_name, getattr(trie, field))
+
+
+def load_variant_trie(directory: Path, activities: list[str]) -> VariantTrie | None:
+    """
+    Loads a trie stored with save_variant_trie. The arrays are memory-mapped read only.
+    :param directory: Directory containing the files.
+    :param activities: Activity names of the log the trie was built from.
+    :return: The trie or None if no trie is stored in the directory.
+    """
+    if not all((directory / file_name).exists() for file_name in TRIE_FILES.values()):
+        return None
+    arrays = {field: np.load(directory / file_name, mmap_mode="r") for field, file_name in TRIE_FILES.items()}
+    return VariantTrie(activities=activities, **arrays)
+
+
+def variant_prefix(trie: VariantTrie, prefix: list[str]) -> VariantPrefix:
+    """
+    Describes the cases starting with a prefix and the distribution of the activity that follows it.
+    :param trie: Prefix tree of the variants.
+    :param prefix: Activity names.
+    :return: Number of cases with the prefix and ending with it, their elapsed time at the end of the prefix
+    and the share of the cases continuing with each activity, from the most frequent activity on.
+    """
+    node = trie.find(prefix)
+    if node is None:
+        return VariantPrefix(prefix=prefix, n_cases=0, n_ended=0, elapsed=None, next_steps=[])
+    n_cases = int(trie.case_counts[node])
+    children = np.arange(trie.children(node).start, trie.children(node).stop)
+    children = children[np.argsort(-trie.case_counts[children], kind="stable")]
+    next_steps = [NextStep(activity=trie.activities[int(trie.codes[child])], n_cases=int(trie.case_counts[child]),
+                           probability=int(trie.case_counts[child]) / n_cases,
+                           mean_elapsed=float(trie.elapsed_means[child]))
+                  for child in children.tolist()]
+    elapsed = ElapsedTime(mean=float(trie.elapsed_means[node]), stdev=float(trie.elapsed_stdevs[node]),
+                          min=float(trie.elapsed_mins[node]), max=float(trie.elapsed_maxs[node]))
+    return VariantPrefix(prefix=prefix, n_cases=n_cases, n_ended=int(trie.end_counts[node]), elapsed=elapsed,
+                         next_steps=next_steps)
+
+
+def variant_completions(trie: VariantTrie, prefix: list[str], k: int) -> VariantCompletions:
+    """
+    Finds the most frequent variants starting with a prefix.
+    :param trie: Prefix tree of the variants.
+    :param prefix: Activity names.
+    :param k: Number of variants.
+    :return: Number of cases with the prefix and the variants with their number of cases and mean duration.
+    """
+    if k < 1:
+        raise ValueError("The number of completions has to be at least 1.")
+    node = trie.find(prefix)
+    if node is None:
+        return VariantCompletions(prefix=prefix, n_cases=0, completions=[])
+    completions = [TopVariant(event_sequence=trie.sequence(end), frequency=int(trie.end_counts[end]),
+                              mean_duration=float(trie.end_durations[end]))
+                   for end in trie.top_completions(node, k)]
+    return VariantCompletions(prefix=prefix, n_cases=int(trie.case_counts[node]), completions=completions)
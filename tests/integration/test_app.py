@@ -1,11 +1,18 @@
+import asyncio
 import json
+import subprocess
+import sys
+import threading
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 from fastapi.testclient import TestClient
 
 import app as app_module
+from data_handling.dataset_store import DatasetStore
 from helpers.config_loader import CONFIG
 
 
@@ -83,6 +90,101 @@ def test_discover_rejects_counts_and_states(sample_data):
     assert "states and counts" in response.json()["detail"].lower()
 
 
+def test_discover_with_capped_counts(sample_data):
+    client = TestClient(app_module.app)
+
+    payload = _base_payload(sample_data)
+    payload["data"]["concept:name"] = {"1": "A", "2": "A", "3": "A", "4": "A"}
+    payload["parameters"]["add_counts"] = True
+    payload["parameters"]["max_count"] = 1
+
+    response = client.post("/discover", json=payload)
+
+    assert response.status_code == 200
+    edges = {(edge["e1"], edge["e2"]) for edge in response.json()["graph"]["connections"]}
+    assert edges == {("start_node", "A_1+"), ("A_1+", "A_1+"), ("A_1+", "end_node")}
+
+
+def test_discover_applies_filters(sample_data):
+    client = TestClient(app_module.app)
+
+    payload = _base_payload(sample_data)
+    payload["parameters"]["filters"] = {"exclude_activities": ["C"], "start_time": "2024-01-01T00:00:00"}
+    empty_payload = _base_payload(sample_data)
+    empty_payload["parameters"]["filters"] = {"min_trace_length": 3}
+
+    response = client.post("/discover", json=payload)
+    empty = client.post("/discover", json=empty_payload)
+
+    assert response.status_code == 200
+    edges = {(edge["e1"], edge["e2"]) for edge in response.json()["graph"]["connections"]}
+    assert edges == {("start_node", "A"), ("A", "B"), ("B", "end_node"), ("A", "end_node")}
+    assert response.json()["metrics"]["n_events"] == 3
+    assert empty.status_code == 400
+
+
+def test_discover_with_sampling(sample_data):
+    client = TestClient(app_module.app)
+
+    payload = _base_payload(sample_data)
+    payload["parameters"]["sampling"] = {"fraction": 1, "method": "stratified", "seed": 7}
+    invalid_payload = _base_payload(sample_data)
+    invalid_payload["parameters"]["sampling"] = {"fraction": 0}
+
+    response = client.post("/discover", json=payload)
+    exact = client.post("/discover", json=_base_payload(sample_data))
+    invalid = client.post("/discover", json=invalid_payload)
+
+    assert response.status_code == 200
+    sampling = response.json()["sampling"]
+    assert sampling["n_sampled_traces"] == sampling["n_traces"]
+    assert sampling["n_events"]["lower"] == sampling["n_events"]["upper"]
+    assert response.json()["graph"] == exact.json()["graph"]
+    assert exact.json()["sampling"] is None
+    assert invalid.status_code == 400
+
+
+def test_discover_simplifies_the_graph(sample_data):
+    client = TestClient(app_module.app)
+
+    payload = _base_payload(sample_data)
+    payload["parameters"]["simplification"] = {"max_nodes": 1}
+    invalid_payload = _base_payload(sample_data)
+    invalid_payload["parameters"]["simplification"] = {"max_edges": 0}
+
+    response = client.post("/discover", json=payload)
+    invalid = client.post("/discover", json=invalid_payload)
+
+    assert response.status_code == 200
+    nodes = {node for edge in response.json()["graph"]["connections"] for node in (edge["e1"], edge["e2"])}
+    assert nodes in ({"start_node", "A", "B", "end_node"}, {"start_node", "A", "C", "end_node"})
+    assert invalid.status_code == 400
+
+
+def test_discover_rejects_invalid_bodies(sample_data):
+    client = TestClient(app_module.app)
+
+    wrong_type = _base_payload(sample_data)
+    wrong_type["data"]["concept:name"]["1"] = 1
+    missing_source = {"parameters": {}}
+
+    assert client.post("/discover", json=wrong_type).status_code == 400
+    assert client.post("/discover", json=missing_source).status_code == 422
+    assert client.post("/discover", content=b"{").status_code == 400
+
+
+def test_discover_rejects_max_count_below_one(sample_data):
+    client = TestClient(app_module.app)
+
+    payload = _base_payload(sample_data)
+    payload["parameters"]["add_counts"] = True
+    payload["parameters"]["max_count"] = 0
+
+    response = client.post("/discover", json=payload)
+
+    assert response.status_code == 400
+
+
 def test_discover_posts_callback(sample_data, monkeypatch):
     client = TestClient(app_module.app)
     calls: list[dict] = []
@@ -154,4 +256,349 @@ def test_discover_with_sepsis_log():
     if "active_events" in CONFIG["exclude"]:
         assert metrics["active_events"] is None
     else:
-        assert set(metrics["active_events"]) == {"yearly", "monthly", "weekly"}
+        assert set(metrics["active_events"]) == {"yearly", "quarterly", "monthly", "weekly"}
+
+
+def test_discover_out_of_core_with_uploaded_log(sample_data, tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, "out_of_core", {
+        "data_directory": str(tmp_path / "data"),
+        "spill_directory": str(tmp_path / "spill"),
+        "memory_budget_mb": 1,
+    })
+    client = TestClient(app_module.app)
+    rows = ["case:concept:name,concept:name,time:timestamp"] + [
+        f"{sample_data['case:concept:name'][key]},{sample_data['concept:name'][key]},"
+        f"{sample_data['time:timestamp'][key]}"
+        for key in sample_data["concept:name"]
+    ]
+
+    upload = client.post("/uploads", content="\n".join(rows).encode())
+    response = client.post("/discover/out-of-core", json={
+        "path": upload.json()["path"],
+        "parameters": {"n_top_variants": 2},
+        "id": "out-of-core",
+    })
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["id"] == "out-of-core"
+    edge_frequencies = {(edge["e1"], edge["e2"]): edge["frequency"] for edge in payload["graph"]["connections"]}
+    assert edge_frequencies[("start_node", "A")] == 2
+    assert edge_frequencies[("A", "B")] == 1
+    assert payload["metrics"]["n_traces"] == 2
+    assert payload["metrics"]["max_trace_duration"] == 172800.0
+
+
+def test_uploads_above_the_maximum_size_are_rejected_and_deleted(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, "out_of_core", {
+        "data_directory": str(tmp_path / "data"),
+        "spill_directory": str(tmp_path / "spill"),
+        "memory_budget_mb": 1,
+        "max_upload_mb": 1,
+    })
+    client = TestClient(app_module.app)
+
+    declared = client.post("/uploads", content=b"x" * (2 * 2 ** 20))
+    streamed = client.post("/uploads", content=iter([b"x" * 2 ** 19] * 4))
+    accepted = client.post("/uploads", content=iter([b"x" * 2 ** 19] * 2))
+
+    assert declared.status_code == streamed.status_code == 413
+    assert accepted.status_code == 200
+    assert [file.name for file in (tmp_path / "data").iterdir()] == [accepted.json()["path"]]
+
+
+def test_discover_out_of_core_rejects_paths_outside_data_directory(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, "out_of_core", {
+        "data_directory": str(tmp_path / "data"),
+        "spill_directory": str(tmp_path / "spill"),
+        "memory_budget_mb": 1,
+    })
+    client = TestClient(app_module.app)
+
+    response = client.post("/discover/out-of-core", json={"path": "../secret.csv", "parameters": {}})
+
+    assert response.status_code == 400
+
+
+def test_discover_file_with_xes_log(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, "out_of_core", {
+        "data_directory": str(tmp_path / "data"),
+        "spill_directory": str(tmp_path / "spill"),
+        "memory_budget_mb": 1,
+    })
+    (tmp_path / "data").mkdir()
+    traces = [("T1", ["A", "B"]), ("T2", ["A", "C"]), ("T3", ["A", "B"])]
+    (tmp_path / "data" / "log.xes").write_text("<log>" + "".join(
+        f'<trace><string key="patient" value="{case_id}"/>' + "".join(
+            f'<event><string key="concept:name" value="{activity}"/>'
+            f'<date key="time:timestamp" value="2024-01-0{position + 1}T00:00:00.000+00:00"/></event>'
+            for position, activity in enumerate(activities)) + "</trace>"
+        for case_id, activities in traces) + "</log>")
+    client = TestClient(app_module.app)
+
+    response = client.post("/discover/file", json={
+        "path": "log.xes",
+        "column_mapping": {"case_id": "case:patient"},
+        "parameters": {"n_top_variants": 2, "filters": {"exclude_activities": ["C"]}},
+        "id": "file",
+    })
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["id"] == "file"
+    edge_frequencies = {(edge["e1"], edge["e2"]): edge["frequency"] for edge in payload["graph"]["connections"]}
+    assert edge_frequencies == {("start_node", "A"): 3, ("A", "B"): 2, ("B", "end_node"): 2, ("A", "end_node"): 1}
+    assert payload["metrics"]["n_traces"] == 3
+
+
+def test_discover_file_rejects_unknown_formats(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, "out_of_core", {
+        "data_directory": str(tmp_path / "data"),
+        "spill_directory": str(tmp_path / "spill"),
+        "memory_budget_mb": 1,
+    })
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "log.json").write_text("{}")
+    client = TestClient(app_module.app)
+
+    response = client.post("/discover/file", json={"path": "log.json", "parameters": {}})
+
+    assert response.status_code == 400
+    assert "Unknown format" in response.json()["detail"]
+
+
+def test_discover_with_stored_dataset_and_case_filter(sample_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "dataset_store", DatasetStore(tmp_path))
+    client = TestClient(app_module.app)
+
+    created = client.post("/datasets", json={"data": sample_data})
+    dataset_id = created.json()["dataset_id"]
+    full = client.post("/discover", json={"dataset_id": dataset_id, "parameters": {"n_top_variants": 2}})
+    filtered = client.post("/discover", json={"dataset_id": dataset_id, "case_ids": ["T1"], "parameters": {}})
+    deleted = client.delete(f"/datasets/{dataset_id}")
+    missing = client.post("/discover", json={"dataset_id": dataset_id, "parameters": {}})
+
+    assert created.status_code == 200
+    assert created.json()["n_events"] == 4
+    expected = client.post("/discover", json=_base_payload(sample_data)).json()
+    assert full.json()["graph"] == expected["graph"]
+    assert full.json()["metrics"]["n_traces"] == 2
+    assert filtered.json()["metrics"]["n_traces"] == 1
+    assert deleted.status_code == 200
+    assert missing.status_code == 404
+
+
+def test_create_dataset_validates_data_and_is_admitted(sample_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "dataset_store", DatasetStore(tmp_path))
+    client = TestClient(app_module.app)
+    invalid_data = {**sample_data, "time:timestamp": {**sample_data["time:timestamp"], "0": "yesterday"}}
+
+    missing = client.post("/datasets", json={})
+    invalid = client.post("/datasets", json={"data": invalid_data})
+    monkeypatch.setattr(app_module.admission_controller, "memory_budget", 1)
+    rejected = client.post("/datasets", json={"data": sample_data})
+
+    assert missing.status_code == 422
+    assert invalid.status_code == 400
+    assert rejected.status_code == 503
+    assert not list(tmp_path.iterdir())
+
+
+def test_drill_down_into_stored_dataset(sample_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "dataset_store", DatasetStore(tmp_path))
+    client = TestClient(app_module.app)
+    dataset_id = client.post("/datasets", json={"data": sample_data}).json()["dataset_id"]
+
+    cases = client.get(f"/datasets/{dataset_id}/edges/cases", params={"source": "A", "target": "B"})
+    durations = client.get(f"/datasets/{dataset_id}/edges/durations", params={"source": "A", "target": "C"})
+    nodes = client.get(f"/datasets/{dataset_id}/nodes/cases", params={"activity": "A", "limit": 1})
+    unknown = client.get(f"/datasets/{dataset_id}/nodes/cases", params={"activity": "D"})
+    missing = client.get("/datasets/missing/nodes/cases", params={"activity": "A"})
+
+    assert cases.json()["cases"] == [{"case_id": "T1", "positions": [0]}]
+    assert durations.json()["n_occurrences"] == 1
+    assert sum(durations.json()["yearly"]["2024"]["counts"]) == 1
+    assert nodes.json()["n_cases"] == 2
+    assert len(nodes.json()["cases"]) == 1
+    assert unknown.status_code == 400
+    assert missing.status_code == 404
+
+
+def test_explore_variants_of_stored_dataset(sample_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "dataset_store", DatasetStore(tmp_path))
+    client = TestClient(app_module.app)
+    dataset_id = client.post("/datasets", json={"data": sample_data}).json()["dataset_id"]
+
+    prefix = client.get(f"/datasets/{dataset_id}/variants/prefix", params={"activity": ["A"]})
+    completions = client.get(f"/datasets/{dataset_id}/variants/completions", params={"k": 1})
+    unknown = client.get(f"/datasets/{dataset_id}/variants/prefix", params={"activity": ["A", "D"]})
+    missing = client.get("/datasets/missing/variants/completions")
+
+    assert prefix.json()["n_cases"] == 2
+    assert [step["activity"] for step in prefix.json()["next_steps"]] == ["B", "C"]
+    assert completions.json()["completions"] == [{"event_sequence": ["A", "B"], "frequency": 1,
+                                                  "mean_duration": 86_400.0}]
+    assert unknown.status_code == 400
+    assert missing.status_code == 404
+
+
+def test_discover_rejects_requests_exceeding_memory_budget(sample_data, monkeypatch):
+    monkeypatch.setattr(app_module.admission_controller, "memory_budget", 1)
+    client = TestClient(app_module.app)
+
+    response = client.post("/discover", json=_base_payload(sample_data))
+    metrics = client.get("/metrics").json()
+
+    assert response.status_code == 503
+    assert metrics["admission"]["rejected_too_large"] >= 1
+
+
+def test_discover_in_worker_pool(sample_data, monkeypatch):
+    monkeypatch.setitem(CONFIG, "worker_pool", {"workers": 1, "max_jobs_per_worker": 10})
+    app_module._get_worker_pool.cache_clear()
+    payload = _base_payload(sample_data)
+    payload["parameters"]["sampling"] = {"fraction": 1}
+    try:
+        with TestClient(app_module.app) as client:
+            response = client.post("/discover", json=payload)
+            metrics = client.get("/metrics").json()
+    finally:
+        app_module._get_worker_pool.cache_clear()
+
+    expected = TestClient(app_module.app).post("/discover", json=payload).json()
+    assert response.status_code == 200
+    assert response.json()["graph"] == expected["graph"]
+    assert response.json()["sampling"] == expected["sampling"]
+    assert metrics["worker_pool"]["completed"] >= 1
+    assert metrics["worker_pool"]["running"] == 0
+
+
+def test_discover_is_cancelled_after_its_deadline(sample_data, monkeypatch):
+    client = TestClient(app_module.app)
+    cancelled_before = client.get("/metrics").json()["cancellation"]["cancelled_deadline"]
+    payload = _base_payload(sample_data)
+    payload["parameters"]["timeout_seconds"] = 1e-9
+
+    response = client.post("/discover", json=payload)
+
+    assert response.status_code == 504
+    assert client.get("/metrics").json()["cancellation"]["cancelled_deadline"] == cancelled_before + 1
+    payload["parameters"]["timeout_seconds"] = 0
+    assert client.post("/discover", json=payload).status_code == 400
+    monkeypatch.setitem(CONFIG, "default_timeout_seconds", 1e-9)
+    assert client.post("/discover", json=_base_payload(sample_data)).status_code == 504
+
+
+def test_discover_is_cancelled_in_worker_pool(sample_data, monkeypatch):
+    monkeypatch.setitem(CONFIG, "worker_pool", {"workers": 1, "max_jobs_per_worker": 10})
+    app_module._get_worker_pool.cache_clear()
+    payload = _base_payload(sample_data)
+    payload["parameters"]["timeout_seconds"] = 1e-9
+    try:
+        with TestClient(app_module.app) as client:
+            response = client.post("/discover", json=payload)
+            metrics = client.get("/metrics").json()
+    finally:
+        app_module._get_worker_pool.cache_clear()
+
+    assert response.status_code == 504
+    assert metrics["worker_pool"]["running"] == 0
+
+
+def test_calculation_is_cancelled_when_the_client_disconnects(monkeypatch):
+    class DisconnectingRequest:
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 1
+
+    monkeypatch.setattr(app_module, "DISCONNECT_POLL_SECONDS", 0)
+    token = app_module.CancellationToken()
+
+    asyncio.run(app_module._cancel_on_disconnect(DisconnectingRequest(), token))
+
+    assert token.reason() == "disconnected"
+
+
+def test_health_endpoint_reports_ready_after_warm_up():
+    app_module.warm_up.warm_up()
+    client = TestClient(app_module.app)
+
+    response = client.get("/health")
+
+    assert response.json()["ready"] is True
+
+
+def test_identical_concurrent_requests_are_calculated_once(sample_data, monkeypatch):
+    release = threading.Event()
+    calculations = []
+    execute_pipeline = app_module._execute_pipeline
+
+    def slow_execute_pipeline(*args):
+        calculations.append(1)
+        release.wait(5)
+        return execute_pipeline(*args)
+
+    monkeypatch.setattr(app_module, "_execute_pipeline", slow_execute_pipeline)
+    client = TestClient(app_module.app)
+    coalesced_before = client.get("/metrics").json()["coalescing"]["coalesced"]
+    payloads = [{**_base_payload(sample_data), "id": str(request_id)} for request_id in range(3)]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        first = executor.submit(client.post, "/discover", json=payloads[0])
+        while not calculations:
+            time.sleep(0.01)
+        others = [executor.submit(client.post, "/discover", json=payload) for payload in payloads[1:]]
+        while client.get("/metrics").json()["coalescing"]["coalesced"] < coalesced_before + 2:
+            time.sleep(0.01)
+        release.set()
+        responses = [future.result().json() for future in [first, *others]]
+
+    assert len(calculations) == 1
+    assert [response["id"] for response in responses] == ["0", "1", "2"]
+    assert responses[1]["graph"] == responses[0]["graph"]
+    assert responses[2]["metrics"] == responses[0]["metrics"]
+
+
+def test_discover_returns_layout(sample_data):
+    client = TestClient(app_module.app)
+    payload = _base_payload(sample_data)
+    payload["parameters"]["layout"] = {"layer_spacing": 100}
+
+    response = client.post("/discover", json=payload)
+
+    assert response.status_code == 200
+    body = response.json()
+    nodes = {connection[key] for connection in body["graph"]["connections"] for key in ("e1", "e2")}
+    assert {position["node"] for position in body["layout"]["nodes"]} == nodes
+    assert {position["x"] for position in body["layout"]["nodes"]} == {0, 100, 200, 300}
+
+
+def test_discover_rejects_invalid_layout(sample_data):
+    client = TestClient(app_module.app)
+    payload = _base_payload(sample_data)
+    payload["parameters"]["layout"] = {"node_spacing": 0}
+
+    response = client.post("/discover", json=payload)
+
+    assert response.status_code == 400
+
+
+def test_discover_does_not_import_pm4py_or_matplotlib(sample_data):
+    # Other tests import pm4py, so the request is sent in a fresh interpreter.
+    script = """
+import json, sys, time
+from fastapi.testclient import TestClient
+import app
+with TestClient(app.app) as client:
+    assert client.post("/discover", json=json.load(sys.stdin)).status_code == 200
+    while not client.get("/health").json()["ready"]:
+        time.sleep(0.05)
+print(json.dumps(sorted({module.split(".")[0] for module in sys.modules} & {"matplotlib", "pm4py"})))
+"""
+    output = subprocess.run([sys.executable, "-c", script], input=json.dumps(_base_payload(sample_data)),  # noqa: S603
+                            cwd=Path(app_module.__file__).parent, capture_output=True, text=True, check=True).stdout
+
+    assert json.loads(output.strip().splitlines()[-1]) == []
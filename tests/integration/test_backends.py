@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from data_handling.data_transformation import (
+    add_counts,
+    add_counts_to_log,
+    add_states,
+    add_states_to_log,
+    transform_dict,
+)
+from data_handling.encoded_log import decode_log, encode_log
+from helpers.config_loader import CONFIG
+from model.input_model import InputParameters
+from retrieval.backends import get_backend
+from retrieval.pipeline import run_pipeline
+
+
+@pytest.fixture()
+def sepsis_df():
+    data_path = Path(__file__).resolve().parents[1] / "test_logs" / "sepsis.json"
+    with data_path.open() as file:
+        return transform_dict(json.load(file))
+
+
+@pytest.mark.parametrize("parameters", [
+    {},
+    {"add_counts": True, "max_count": 2},
+    {"state_changing_events": ["CRP", "Leucocytes"]},
+    {"reduce_complexity_by": 0.5, "add_counts": True},
+])
+def test_backends_return_the_same_results(sepsis_df, monkeypatch, parameters):
+    monkeypatch.setitem(CONFIG, "exclude", [])
+    params = InputParameters(start_node_name="START", end_node_name="END", n_top_variants=5,
+                             active_events={"positive_events": ["ER Registration"], "negative_events": ["Release A"],
+                                            "singular_events": ["CRP"]}, **parameters)
+
+    expected = run_pipeline(sepsis_df, params, backend=get_backend("pandas"))
+    actual = run_pipeline(sepsis_df, params, backend=get_backend("columnar"))
+
+    assert actual[0].model_dump() == expected[0].model_dump()
+    assert actual[1].model_dump() == expected[1].model_dump()
+
+
+def test_transformations_of_encoded_logs_match_dataframes(sepsis_df):
+    log = encode_log(sepsis_df)
+
+    counted = decode_log(add_counts_to_log(log, 3))
+    with_states = decode_log(add_states_to_log(log, ["CRP", "Leucocytes"]))
+
+    assert counted["concept:name"].tolist() == add_counts(decode_log(log), 3)["concept:name"].tolist()
+    assert with_states["concept:name"].tolist() == add_states(decode_log(log), ["CRP", "Leucocytes"])[
+        "concept:name"].tolist()
+
+
+def test_backend_is_selected_in_config(monkeypatch):
+    monkeypatch.setitem(CONFIG, "pipeline_backend", "columnar")
+
+    assert get_backend() is get_backend("columnar")
+    with pytest.raises(ValueError, match="Unknown pipeline backend"):
+        get_backend("polars")
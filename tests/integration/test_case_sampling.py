@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling.complexity_reduction import reduce_dataframe
+from data_handling.encoded_log import decode_log, encode_log
+from model.input_model import SamplingParameters
+from retrieval.case_sampling import estimate_totals, sample_cases, scale_to_population
+from retrieval.metrics_retrieval import get_metrics
+from retrieval.process_model_retrieval import get_process_model
+
+
+def _sample_log(n_cases: int = 40):
+    rows = []
+    for case in range(n_cases):
+        activities = ["A", "B"] if case % 4 else ["A", "C", "B", "B"]
+        rows += [(f"T{case}", activity, pd.Timestamp("2024-01-01") + pd.Timedelta(hours=case + position))
+                 for position, activity in enumerate(activities)]
+    return encode_log(pd.DataFrame(rows, columns=["case:concept:name", "concept:name", "time:timestamp"]))
+
+
+@pytest.mark.parametrize("method", ["uniform", "stratified"])
+def test_sample_cases_is_reproducible_and_keeps_the_fraction(method):
+    log = _sample_log()
+    parameters = SamplingParameters(fraction=0.25, method=method, seed=3)
+
+    first = sample_cases(log, parameters)
+    second = sample_cases(log, parameters)
+
+    assert first.log.case_ids == second.log.case_ids
+    assert first.log.n_cases == 10
+    assert first.n_population == 40
+    assert first.log.case_ids == [case_id for case_id in log.case_ids if case_id in set(first.log.case_ids)]
+
+
+def test_stratified_sample_keeps_the_share_of_trace_lengths():
+    log = _sample_log()
+
+    sample = sample_cases(log, SamplingParameters(fraction=0.5, method="stratified", seed=0))
+
+    assert sorted(sample.log.case_lengths().tolist()) == [2] * 15 + [4] * 5
+    assert sample.population_sizes.tolist() == [30, 10]
+
+
+def test_estimate_totals_is_exact_for_a_full_sample():
+    log = _sample_log()
+    sample = sample_cases(log, SamplingParameters(fraction=1))
+
+    estimates, variances = estimate_totals(sample, sample.strata, log.event_case_indices(),
+                                           np.asarray(log.codes, dtype=np.int64))
+
+    assert estimates.tolist() == [40, 50, 10]
+    assert variances.tolist() == [0, 0, 0]
+
+
+def test_scale_to_population_estimates_frequencies_with_intervals():
+    log = _sample_log()
+    sample = sample_cases(log, SamplingParameters(fraction=0.5, method="stratified", seed=1, confidence=0.9))
+    data = decode_log(sample.log)
+    graph = get_process_model(data, "start_node", "end_node")
+    metrics = get_metrics(data, None, 2)
+
+    summary = scale_to_population(graph, metrics, data, sample, "start_node", "end_node")
+
+    frequencies = {(connection.e1, connection.e2): connection.frequency for connection in graph.connections}
+    assert frequencies == {("start_node", "A"): 40, ("A", "B"): 30, ("A", "C"): 10, ("C", "B"): 10,
+                           ("B", "B"): 10, ("B", "end_node"): 40}
+    assert summary.n_traces == 40
+    assert summary.n_sampled_traces == 20
+    assert summary.n_events.estimate == pytest.approx(100)
+    assert metrics.n_traces == 40
+    if metrics.event_frequency_distr is not None:
+        assert metrics.event_frequency_distr == {"B": 50, "A": 40, "C": 10}
+    for interval in summary.edge_frequencies:
+        assert interval.lower <= interval.estimate <= interval.upper
+
+
+def test_scale_to_population_reports_uncertainty_for_uniform_samples():
+    log = _sample_log()
+    sample = sample_cases(log, SamplingParameters(fraction=0.5, seed=1))
+    data = decode_log(sample.log)
+    graph = get_process_model(data, "start_node", "end_node")
+
+    summary = scale_to_population(graph, get_metrics(data, None, 2), data, sample, "start_node", "end_node")
+
+    intervals = {(interval.e1, interval.e2): interval for interval in summary.edge_frequencies}
+    assert intervals["start_node", "A"].lower == intervals["start_node", "A"].upper == 40
+    assert intervals["A", "C"].lower < intervals["A", "C"].estimate < intervals["A", "C"].upper
+
+
+def test_scale_to_population_estimates_the_traces_left_by_the_complexity_reduction():
+    log = _sample_log()
+    sample = sample_cases(log, SamplingParameters(fraction=0.5, method="stratified", seed=1))
+    data = reduce_dataframe(decode_log(sample.log), 0.5)
+    graph = get_process_model(data, "start_node", "end_node")
+    metrics = get_metrics(data, None, 2)
+
+    summary = scale_to_population(graph, metrics, data, sample, "start_node", "end_node")
+
+    assert summary.n_traces == metrics.n_traces == 30
+    assert summary.n_sampled_traces == 20
+    assert summary.n_events.estimate == pytest.approx(60)
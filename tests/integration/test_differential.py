@@ -0,0 +1,422 @@
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+from pm4py.statistics.variants.pandas.get import get_variants_count
+
+from data_handling.activity_time_index import build_activity_time_index
+from data_handling.complexity_reduction import reduce_dataframe
+from data_handling.data_transformation import add_states, add_states_to_log, remove_counts
+from data_handling.encoded_log import decode_log, encode_log
+from helpers.config_loader import CONFIG
+from model.input_model import ActiveEventParameters, InputParameters
+from model.response_model import Metrics
+from retrieval.backends import get_backend
+from retrieval.metrics_retrieval import (
+    calculate_active_events,
+    calculate_monthly_bins,
+    calculate_quarterly_bins,
+    calculate_weekly_bins,
+    calculate_yearly_bins,
+    get_metrics,
+)
+from retrieval.pipeline import run_pipeline
+from retrieval.process_model_retrieval import (
+    get_process_model,
+    get_process_model_from_log,
+    get_process_model_with_pm4py,
+)
+from retrieval.variant_engine import count_variants
+
+# Differential tests: every accelerated implementation is compared with the pm4py and pandas implementation
+# it replaced on randomly generated logs. Seeds are fixed so failures can be reproduced.
+SEEDS = range(12)
+ACTIVITIES = ["A", "B", "C", "D", "E", "F"]
+# Bins of the active events before the activity time index, by their first start and their length.
+# The previous implementation did not reset the weekly and monthly starts to midnight and repeated the first bin,
+# both of which were fixed along with it; quarterly bins did not exist and are built the same way.
+REFERENCE_BINS = {
+    "yearly": (lambda timestamp: pd.Timestamp(year=timestamp.year, month=1, day=1), relativedelta(years=1)),
+    "quarterly": (lambda timestamp: pd.Timestamp(year=timestamp.year, month=(timestamp.month - 1) // 3 * 3 + 1, day=1),
+                  relativedelta(months=3)),
+    "monthly": (lambda timestamp: pd.Timestamp(year=timestamp.year, month=timestamp.month, day=1),
+                relativedelta(months=1)),
+    "weekly": (lambda timestamp: (timestamp - pd.Timedelta(days=timestamp.weekday())).normalize(),
+               relativedelta(weeks=1)),
+}
+# Upper bound of the time of the accelerated implementations relative to the implementations they replaced.
+# They are 1.5 to 15 times faster, so the bound only fails if one of them is slower than its reference.
+MAX_TIME_RATIO = 1.0
+
+
+def _random_log(seed, n_cases=60, max_length=8, interleaved=True):
+    """
+    Generates a log with few activities, so traces share variants and repeat activities,
+    with single-event traces and with events of the same trace at the same time.
+    The variants of pm4py and the previous implementation of add_states are only correct
+    if the events of each trace are stored consecutively, so logs compared with them are not interleaved.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, max_length + 1, size=n_cases)
+    lengths[rng.random(n_cases) < 0.15] = 1
+    case_ids = np.repeat([f"c{i}" for i in range(n_cases)], lengths)
+    probabilities = rng.dirichlet(np.ones(len(ACTIVITIES)) * 0.5)
+    activities = rng.choice(ACTIVITIES, size=len(case_ids), p=probabilities)
+    # Steps of whole hours, a third of them zero, so events of a trace often share their timestamp.
+    steps = rng.integers(0, 3, size=len(case_ids)) * rng.integers(0, 200, size=len(case_ids))
+    case_starts = np.repeat(rng.integers(0, 400 * 24, size=n_cases), lengths)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    cumulative = np.cumsum(steps)
+    hours = case_starts + cumulative - cumulative[offsets] + steps[offsets]
+    data = pd.DataFrame({"case:concept:name": case_ids, "concept:name": activities,
+                         "time:timestamp": pd.Timestamp("2023-11-20") + pd.to_timedelta(hours, unit="h")})
+    if not interleaved:
+        return data
+    # Interleaves the traces while keeping the order of the events of each trace.
+    return data.sort_values("time:timestamp", kind="stable").reset_index(drop=True)
+
+
+def _add_states_by_grouping(data, state_changing_events):
+    # Implementation of add_states before the segmented kernels.
+    data = data.copy()
+    data["counts"] = data[data["concept:name"].isin(state_changing_events)].groupby(
+        ["case:concept:name", "concept:name"]).cumcount() + 1
+    state_frame = pd.get_dummies(data["concept:name"]).mul(data["counts"], axis=0).replace(0, np.nan)
+    state_frame = state_frame.dropna(axis=1, how="all")
+    first_rows = data.groupby('case:concept:name').cumcount().eq(0)
+    state_frame.loc[first_rows] = state_frame.loc[first_rows].fillna(0)
+    state_frame = state_frame.ffill()
+    data["concept:name"] = data["concept:name"].astype(str) + "_" + state_frame.astype(str).to_numpy().sum(axis=1)
+    data["concept:name"] = data["concept:name"].str[:-2]
+    if len(state_changing_events) > 1:
+        last_rows = data.groupby('case:concept:name').cumcount(ascending=False).eq(0)
+        data.loc[last_rows] = remove_counts(data.loc[last_rows])
+    return data[["case:concept:name", "concept:name", "time:timestamp"]]
+
+
+def _reduce_dataframe_with_pm4py(data, percentage):
+    # Implementation of reduce_dataframe before the variant engine.
+    n_traces = data.nunique()["case:concept:name"]
+    variants = get_variants_count(data)
+    top_variants = sorted(variants.items(), key=lambda item: item[1], reverse=True)
+    needed_variants = []
+    counter = 0
+    for variant, count in top_variants:
+        if counter > percentage * n_traces:
+            break
+        needed_variants.append(list(variant))
+        counter += count
+    grouped_data = data.groupby("case:concept:name", as_index=False).agg({"concept:name": list})
+    relevant_traces = grouped_data[grouped_data["concept:name"].isin(needed_variants)]["case:concept:name"]
+    return data[data["case:concept:name"].isin(relevant_traces)]
+
+
+def _add_counts_by_grouping(data, max_count=None):
+    # Implementation of add_counts before the encoded labels, with max_count added to it.
+    data = data.copy()
+    counts = data.groupby(["case:concept:name", "concept:name"]).cumcount() + 1
+    if max_count is not None:
+        counts = counts.clip(upper=max_count)
+    suffixes = counts.astype(str) + np.where(counts == max_count, "+", "")
+    data["concept:name"] = data["concept:name"].astype(str) + "_" + suffixes
+    return data[["case:concept:name", "concept:name", "time:timestamp"]]
+
+
+def _calculate_bins_by_stepping(initial_timestamp, final_timestamp, name):
+    first_start, length = REFERENCE_BINS[name]
+    bin_start = first_start(initial_timestamp)
+    bin_starts = []
+    while bin_start <= final_timestamp:
+        bin_starts.append(bin_start)
+        bin_start = bin_start + length
+    return bin_starts
+
+
+def _calculate_bin_values(data, bin_starts, active_event_parameters):
+    # Implementation of the active events before the activity time index.
+    bin_dict = {}
+    active_events = 0
+    for i, bin_start in enumerate(bin_starts):
+        bin_end = bin_starts[i + 1] if i < len(bin_starts) - 1 else pd.Timestamp.now()
+        pre_bin_start = bin_starts[i - 1] if i > 0 else bin_start - pd.Timedelta(days=1)
+        bin_data = data[data["time:timestamp"].between(bin_start, bin_end, inclusive="left")]
+        pre_bin_data = data[data["time:timestamp"].between(pre_bin_start, bin_start, inclusive="left")]
+        active_events += len(bin_data[bin_data["concept:name"].isin(active_event_parameters.positive_events)]) - len(
+            pre_bin_data[pre_bin_data["concept:name"].isin(active_event_parameters.negative_events)])
+        bin_dict[str(bin_start)] = active_events + len(
+            bin_data[bin_data["concept:name"].isin(active_event_parameters.singular_events)])
+    return bin_dict
+
+
+def _reference_metrics(data, active_event_parameters, n_top_variants):
+    # Metrics before the variant engine and the activity time index: pm4py for the variants and the time between
+    # events, pandas groupings and the previous bins for the rest. The variant profiles, trace duration quantiles
+    # and histogram were added with the engine and are calculated from the grouped cases here.
+    grouped_data = data.groupby("case:concept:name", sort=False)
+    sequences = grouped_data["concept:name"].agg(tuple)
+    durations = (grouped_data["time:timestamp"].max() - grouped_data["time:timestamp"].min()).dt.total_seconds()
+    mean_durations = durations.groupby(sequences).mean().to_dict()
+    variants = get_variants_count(data)
+    top_variants = sorted(variants.items(), key=lambda item: item[1], reverse=True)[:n_top_variants]
+    relevant_data = data[data["case:concept:name"].isin(
+        sequences.index[sequences.isin([variant for variant, _ in top_variants])])]
+    if active_event_parameters is None:
+        active_event_parameters = ActiveEventParameters(positive_events=[], negative_events=[],
+                                                        singular_events=list(data["concept:name"].unique()))
+    trace_lengths = data["case:concept:name"].value_counts()
+    histogram_counts, histogram_edges = np.histogram(durations, bins=CONFIG["trace_duration_histogram_bins"])
+    return Metrics.model_validate({
+        "n_traces": data["case:concept:name"].nunique(),
+        "n_events": len(data),
+        "n_variants": len(variants),
+        "top_variants": {str(rank): {"event_sequence": list(variant), "frequency": frequency,
+                                     "mean_duration": mean_durations[variant]}
+                         for rank, (variant, frequency) in enumerate(top_variants)},
+        "tbe": [connection.model_dump() | {"frequency": -1}
+                for connection in get_process_model_with_pm4py(relevant_data, "START", "END").connections
+                if connection.e1 != "START" and connection.e2 != "END"],
+        "variant_profiles": {str(rank): _reference_variant_profile(data, sequences, variant, frequency)
+                             for rank, (variant, frequency) in enumerate(top_variants)},
+        "max_trace_length": trace_lengths.max(),
+        "min_trace_length": trace_lengths.min(),
+        "max_trace_duration": durations.max(),
+        "min_trace_duration": durations.min(),
+        "trace_duration_quantiles": {str(quantile): durations.quantile(quantile)
+                                     for quantile in CONFIG["trace_duration_quantiles"]},
+        "trace_duration_histogram": {"bin_edges": histogram_edges.tolist(), "counts": histogram_counts.tolist()},
+        "active_events": {name: _calculate_bin_values(data, _calculate_bins_by_stepping(
+            data["time:timestamp"].min(), data["time:timestamp"].max(), name), active_event_parameters)
+                          for name in REFERENCE_BINS},
+        "event_frequency_distr": data["concept:name"].value_counts().to_dict(),
+        "trace_length_distr": trace_lengths.astype(str).value_counts().to_dict(),
+    }).model_dump()
+
+
+def _reference_variant_profile(data, sequences, variant, frequency):
+    cases = sequences.index[[sequence == variant for sequence in sequences]]
+    timestamps = data[data["case:concept:name"].isin(cases)].groupby("case:concept:name")["time:timestamp"].agg(list)
+    nanoseconds = np.asarray(timestamps.tolist(), dtype="datetime64[ns]").astype(np.int64)
+    steps = []
+    for position in range(len(variant) - 1):
+        durations = pd.Series((nanoseconds[:, position + 1] - nanoseconds[:, position]) / 1e9)
+        cumulative_durations = pd.Series((nanoseconds[:, position + 1] - nanoseconds[:, 0]) / 1e9)
+        steps.append({"e1": variant[position], "e2": variant[position + 1], "median": durations.median(),
+                      "min": durations.min(), "max": durations.max(),
+                      "stdev": -1.0 if len(durations) == 1 else durations.std(), "mean": durations.mean(),
+                      "cumulative_median": cumulative_durations.median(),
+                      "cumulative_mean": cumulative_durations.mean()})
+    return {"event_sequence": list(variant), "frequency": frequency, "steps": steps}
+
+
+def _reference_response(data, params):
+    # Response of the service before the encoded log, with the transformations in the order app.py applied them.
+    if params.reduce_complexity_by:
+        data = _reduce_dataframe_with_pm4py(data, 1 - params.reduce_complexity_by)
+    if params.add_counts:
+        data = _add_counts_by_grouping(data, params.max_count)
+    elif params.state_changing_events:
+        data = _add_states_by_grouping(data, params.state_changing_events)
+    graph = get_process_model_with_pm4py(data, params.start_node_name, params.end_node_name)
+    return graph.model_dump(), _reference_metrics(data, params.active_events, params.n_top_variants)
+
+
+def _measure(function, runs=3):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def _assert_same(actual, expected, path="response"):
+    # pm4py accumulates sums and standard deviations in a different order than the encoded log,
+    # so they may differ from the reference in the last bits.
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            _assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for index, (actual_item, expected_item) in enumerate(zip(actual, expected, strict=True)):
+            _assert_same(actual_item, expected_item, f"{path}[{index}]")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_process_models_match_pm4py(seed):
+    data = _random_log(seed)
+    expected = get_process_model_with_pm4py(data, "START", "END").model_dump()
+
+    _assert_same(get_process_model(data, "START", "END").model_dump(), expected)
+    _assert_same(get_process_model_from_log(encode_log(data), "START", "END").model_dump(), expected)
+    _assert_same(get_process_model_from_log(encode_log(data), "START", "END", n_partitions=3).model_dump(), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_time_between_events_matches_pm4py(seed, monkeypatch):
+    monkeypatch.setitem(CONFIG, "exclude", [])
+    data = _random_log(seed)
+    # With more top variants than variants, the time between events is calculated on all cases.
+    expected = [connection.model_dump() | {"frequency": -1}
+                for connection in get_process_model_with_pm4py(data, "START", "END").connections
+                if connection.e1 != "START" and connection.e2 != "END"]
+
+    metrics = get_metrics(data, None, n_top_variants=len(data))
+
+    _assert_same([connection.model_dump() for connection in metrics.tbe], expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_variants_match_pm4py(seed):
+    data = _random_log(seed, interleaved=False)
+    variants = count_variants(encode_log(data))
+    log = encode_log(data)
+    names = np.asarray(log.activities, dtype=object)
+    counted = {}
+    for variant in variants.ranked():
+        case = log.select_cases(variants.representatives[[variant]])
+        counted[tuple(names[case.codes])] = int(variants.counts[variant])
+
+    expected = get_variants_count(data)
+    assert counted == expected
+    assert list(counted) == [variant for variant, _ in sorted(expected.items(), key=lambda item: item[1],
+                                                               reverse=True)]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("n_state_changing_events", [1, 2, 3])
+def test_states_match_grouping(seed, n_state_changing_events):
+    data = _random_log(seed, interleaved=False)
+    # The previous implementation fails if no state changing event occurs.
+    state_changing_events = list(data["concept:name"].value_counts().index[:n_state_changing_events])[::-1]
+    expected = _add_states_by_grouping(data, state_changing_events)
+
+    pd.testing.assert_frame_equal(add_states(data, state_changing_events), expected)
+    with_states = decode_log(add_states_to_log(encode_log(data), state_changing_events))
+    assert (with_states.sort_values(["case:concept:name", "time:timestamp"], kind="stable")["concept:name"].tolist()
+            == expected.sort_values(["case:concept:name", "time:timestamp"], kind="stable")["concept:name"].tolist())
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("percentage", [0.0, 0.3, 0.5, 0.9, 1.0])
+def test_reduced_dataframes_match_pm4py(seed, percentage):
+    data = _random_log(seed, interleaved=False)
+
+    pd.testing.assert_frame_equal(reduce_dataframe(data, percentage), _reduce_dataframe_with_pm4py(data, percentage))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_active_events_match_filtering(seed):
+    data = _random_log(seed)
+    rng = np.random.default_rng(seed)
+    events = list(rng.permutation(ACTIVITIES))
+    parameters = ActiveEventParameters(positive_events=events[:2], negative_events=events[2:4],
+                                       singular_events=events[4:])
+    initial_timestamp = data["time:timestamp"].min()
+    final_timestamp = data["time:timestamp"].max()
+
+    active_events = calculate_active_events(build_activity_time_index(encode_log(data), max_events=50), parameters)
+
+    for name, calculate_bins in [("yearly", calculate_yearly_bins), ("quarterly", calculate_quarterly_bins),
+                                 ("monthly", calculate_monthly_bins), ("weekly", calculate_weekly_bins)]:
+        bin_starts = _calculate_bins_by_stepping(initial_timestamp, final_timestamp, name)
+        assert calculate_bins(initial_timestamp, final_timestamp) == bin_starts, name
+        assert getattr(active_events, name) == _calculate_bin_values(data, bin_starts, parameters), name
+
+
+@pytest.mark.parametrize("seed", SEEDS[:6])
+@pytest.mark.parametrize("parameters", [
+    {},
+    {"n_top_variants": 1},
+    {"add_counts": True},
+    {"add_counts": True, "max_count": 2},
+    {"state_changing_events": 1},
+    {"state_changing_events": 2},
+    {"reduce_complexity_by": 0.4},
+    {"reduce_complexity_by": 0.6, "add_counts": True},
+    {"active_events": {"positive_events": ["A", "D"], "negative_events": ["B"], "singular_events": ["C"]}},
+])
+def test_discovery_responses_match_the_reference(seed, parameters, monkeypatch):
+    monkeypatch.setitem(CONFIG, "exclude", [])
+    data = _random_log(seed, interleaved=False)
+    if "state_changing_events" in parameters:
+        # The previous implementation fails if no state changing event occurs.
+        parameters = parameters | {"state_changing_events": list(
+            data["concept:name"].value_counts().index[:parameters["state_changing_events"]])}
+    params = InputParameters(start_node_name="START", end_node_name="END", **{"n_top_variants": 4} | parameters)
+    expected_graph, expected_metrics = _reference_response(data, params)
+
+    for backend in ["pandas", "columnar"]:
+        graph, metrics, _ = run_pipeline(data, params, backend=get_backend(backend))
+        _assert_same(graph.model_dump(), expected_graph, f"{backend}.graph")
+        _assert_same(metrics.model_dump(), expected_metrics, f"{backend}.metrics")
+
+
+@pytest.mark.parametrize("seed", SEEDS[:4])
+@pytest.mark.parametrize("parameters", [
+    {},
+    {"add_counts": True},
+    {"state_changing_events": ["A", "B"]},
+    {"reduce_complexity_by": 0.4, "add_counts": True, "max_count": 2},
+])
+def test_discovery_responses_match_between_backends(seed, parameters, monkeypatch):
+    monkeypatch.setitem(CONFIG, "exclude", [])
+    data = _random_log(seed)
+    params = InputParameters(start_node_name="START", end_node_name="END", n_top_variants=4,
+                             active_events={"positive_events": ["A"], "negative_events": ["B"],
+                                            "singular_events": ["C"]}, **parameters)
+    expected = run_pipeline(data, params, backend=get_backend("pandas"))
+
+    actual = run_pipeline(data, params, backend=get_backend("columnar"))
+    assert actual[0].model_dump() == expected[0].model_dump()
+    assert actual[1].model_dump() == expected[1].model_dump()
+
+    monkeypatch.setitem(CONFIG, "dfg_partitions", 3)
+    partitioned = run_pipeline(data, params, backend=get_backend("pandas"))
+    assert partitioned[0].model_dump() == expected[0].model_dump()
+
+
+def test_backends_match_when_the_columnar_metrics_are_chunked(monkeypatch):
+    monkeypatch.setitem(CONFIG, "exclude", [])
+    # With 1 MB, the events are processed in several chunks and the durations are spilled to several buckets.
+    monkeypatch.setitem(CONFIG, "out_of_core", CONFIG["out_of_core"] | {"memory_budget_mb": 1})
+    data = _random_log(7, n_cases=8_000, max_length=12)
+    params = InputParameters(start_node_name="START", end_node_name="END", n_top_variants=6)
+
+    expected = run_pipeline(data, params, backend=get_backend("pandas"))
+    actual = run_pipeline(data, params, backend=get_backend("columnar"))
+
+    assert actual[0].model_dump() == expected[0].model_dump()
+    assert actual[1].model_dump() == expected[1].model_dump()
+
+
+def test_large_logs_match_the_reference():
+    data = _random_log(100, n_cases=20_000, max_length=12, interleaved=False)
+
+    graph = get_process_model_from_log(encode_log(data), "START", "END")
+    _assert_same(graph.model_dump(), get_process_model_with_pm4py(data, "START", "END").model_dump())
+    pd.testing.assert_frame_equal(add_states(data, ["A", "B"]), _add_states_by_grouping(data, ["A", "B"]))
+    pd.testing.assert_frame_equal(reduce_dataframe(data, 0.5), _reduce_dataframe_with_pm4py(data, 0.5))
+
+
+@pytest.mark.benchmark
+def test_accelerated_implementations_are_faster_than_the_reference():
+    # Opt-in with pytest -m benchmark: wall clock times depend on the machine and its load.
+    # benchmarks/reference_implementations.py reports the speedups in detail.
+    data = _random_log(100, n_cases=20_000, max_length=12, interleaved=False)
+    comparisons = {
+        "process model": (lambda: get_process_model_with_pm4py(data, "START", "END"),
+                          lambda: get_process_model(data, "START", "END")),
+        "add states": (lambda: _add_states_by_grouping(data, ["A", "B"]), lambda: add_states(data, ["A", "B"])),
+        "reduce": (lambda: _reduce_dataframe_with_pm4py(data, 0.5), lambda: reduce_dataframe(data, 0.5)),
+    }
+
+    for name, (reference, optimized) in comparisons.items():
+        assert _measure(optimized) / _measure(reference) < MAX_TIME_RATIO, name
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from data_handling.edge_index import build_edge_index
+from data_handling.encoded_log import encode_log
+from retrieval.drill_down import edge_cases, edge_durations, node_cases
+
+
+def _sample_log():
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T2", "T2", "T3", "T3"],
+            "concept:name": ["A", "B", "A", "A", "B", "B", "C"],
+            "time:timestamp": pd.to_datetime([
+                "2023-12-31T00:00:00",
+                "2024-01-01T00:00:00",
+                "2024-01-03T00:00:00",
+                "2024-01-01T00:00:00",
+                "2024-01-04T00:00:00",
+                "2024-01-05T00:00:00",
+                "2024-01-06T00:00:00",
+            ]),
+        }
+    ))
+
+
+def _case_positions(result):
+    return {case.case_id: case.positions for case in result.cases}
+
+
+def test_edge_cases_contain_positions_of_each_occurrence():
+    log = _sample_log()
+    index = build_edge_index(log)
+
+    result = edge_cases(log, index, "A", "B")
+    limited = edge_cases(log, index, "A", "B", limit=1)
+
+    assert (result.n_occurrences, result.n_cases) == (2, 2)
+    assert _case_positions(result) == {"T1": [0], "T2": [0]}
+    assert limited.n_cases == 2
+    assert _case_positions(limited) == {"T1": [0]}
+    assert edge_cases(log, index, "C", "A").n_cases == 0
+
+
+def test_edge_cases_of_start_and_end_node():
+    log = _sample_log()
+    index = build_edge_index(log)
+
+    assert _case_positions(edge_cases(log, index, "start_node", "A")) == {"T1": [0], "T2": [0]}
+    assert _case_positions(edge_cases(log, index, "B", "end", end_node_name="end")) == {"T2": [1]}
+    with pytest.raises(ValueError, match="does not exist"):
+        edge_cases(log, index, "start_node", "D")
+    with pytest.raises(ValueError, match="at least 1"):
+        edge_cases(log, index, "A", "B", limit=0)
+
+
+def test_node_cases_contain_positions_of_each_event():
+    log = _sample_log()
+
+    result = node_cases(log, build_edge_index(log), "A")
+
+    assert (result.n_occurrences, result.n_cases) == (3, 2)
+    assert _case_positions(result) == {"T1": [0, 2], "T2": [0]}
+
+
+def test_edge_durations_are_counted_in_shared_bins_per_year():
+    log = _sample_log()
+
+    result = edge_durations(log, build_edge_index(log), "A", "B")
+
+    assert result.n_occurrences == 2
+    assert result.histogram.bin_edges[0] == 86_400
+    assert result.histogram.bin_edges[-1] == 3 * 86_400
+    assert sum(result.histogram.counts) == 2
+    assert result.yearly.keys() == {"2023", "2024"}
+    assert result.yearly["2023"].bin_edges == result.histogram.bin_edges
+    assert result.yearly["2023"].counts[0] == 1
+    assert result.yearly["2024"].counts[-1] == 1
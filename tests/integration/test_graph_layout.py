@@ -0,0 +1,62 @@
+import json
+from itertools import combinations
+from pathlib import Path
+
+from data_handling.data_transformation import add_counts, transform_dict
+from model.input_model import LayoutParameters
+from model.response_model import Connection, Graph
+from retrieval.graph_layout import compute_layout, layout_graph
+from retrieval.process_model_retrieval import get_process_model_partitioned
+
+
+def _graph(edges: dict[tuple[str, str], int]) -> Graph:
+    return Graph(connections=[Connection(e1=e1, e2=e2, frequency=frequency, median=-1, min=-1, max=-1, stdev=-1,
+                                         sum=-1, mean=-1) for (e1, e2), frequency in edges.items()])
+
+
+GRAPH = _graph({
+    ("start", "A"): 10, ("A", "B"): 6, ("A", "C"): 4, ("B", "D"): 6, ("C", "D"): 3, ("C", "end"): 1,
+    ("B", "C"): 1, ("D", "end"): 9, ("D", "B"): 1, ("start", "E"): 1, ("E", "end"): 1,
+})
+
+
+def _crossings(graph: Graph, positions: dict[str, tuple[float, float]]) -> int:
+    segments = [tuple(sorted((positions[c.e1], positions[c.e2]))) for c in graph.connections
+                if abs(positions[c.e1][0] - positions[c.e2][0]) == 1]
+    return sum((a[1] - b[1]) * (c[1] - d[1]) < 0 for (a, c), (b, d) in combinations(segments, 2)
+               if a[0] == b[0])
+
+
+def test_layout_places_nodes_in_layers_from_start_to_end():
+    layout = compute_layout(GRAPH, LayoutParameters(layer_spacing=100, node_spacing=10), "start", "end")
+
+    layers = {position.node: position.layer for position in layout.nodes}
+    assert layers == {"start": 0, "A": 1, "E": 1, "B": 2, "C": 2, "D": 3, "end": 4}
+    assert all(position.x == position.layer * 100 for position in layout.nodes)
+    assert sorted(position.y for position in layout.nodes if position.layer == 2) == [-5, 5]
+    assert (layout.width, layout.height) == (400, 10)
+
+
+def test_ordering_sweeps_do_not_add_crossings():
+    df = transform_dict(json.loads((Path(__file__).resolve().parents[1] / "test_logs" / "sepsis.json").read_text()))
+    graph = get_process_model_partitioned(add_counts(df, 3), "start", "end", n_partitions=1)
+
+    crossings = []
+    for sweeps in (0, 4):
+        layout = compute_layout(graph, LayoutParameters(layer_spacing=1, ordering_sweeps=sweeps), "start", "end")
+        crossings.append(_crossings(graph, {position.node: (position.layer, position.y)
+                                            for position in layout.nodes}))
+
+    assert crossings[1] < crossings[0]
+
+
+def test_layouts_of_identical_graphs_are_cached():
+    parameters = LayoutParameters()
+
+    first = layout_graph(GRAPH, parameters, "start", "end")
+    second = layout_graph(GRAPH.model_copy(deep=True), parameters, "start", "end")
+    changed = layout_graph(_graph({("start", "A"): 1, ("A", "end"): 1}), parameters, "start", "end")
+
+    assert second is first
+    assert changed is not first
+    assert [position.node for position in changed.nodes] == ["start", "A", "end"]
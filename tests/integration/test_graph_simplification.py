@@ -0,0 +1,69 @@
+from model.input_model import SimplificationParameters
+from model.response_model import Connection, Graph
+from retrieval.graph_simplification import simplify_graph
+
+
+def _graph(edges: dict[tuple[str, str], int]) -> Graph:
+    return Graph(connections=[Connection(e1=e1, e2=e2, frequency=frequency, median=-1, min=-1, max=-1, stdev=-1,
+                                         sum=-1, mean=-1) for (e1, e2), frequency in edges.items()])
+
+
+def _edges(graph: Graph) -> dict[tuple[str, str], int]:
+    return {(connection.e1, connection.e2): connection.frequency for connection in graph.connections}
+
+
+GRAPH = _graph({
+    ("start", "A"): 10, ("A", "B"): 6, ("A", "C"): 4, ("B", "D"): 6, ("C", "D"): 3, ("C", "end"): 1,
+    ("B", "C"): 1, ("D", "end"): 9, ("D", "B"): 1, ("start", "E"): 1, ("E", "end"): 1,
+})
+
+
+def _is_connected(graph: Graph) -> bool:
+    edges = _edges(graph)
+    nodes = {node for edge in edges for node in edge}
+
+    def reachable(root: str, forward: bool) -> set[str]:
+        found, stack = {root}, [root]
+        while stack:
+            node = stack.pop()
+            for e1, e2 in edges:
+                source, target = (e1, e2) if forward else (e2, e1)
+                if source == node and target not in found:
+                    found.add(target)
+                    stack.append(target)
+        return found
+
+    return reachable("start", True) == nodes == reachable("end", False)
+
+
+def test_simplify_graph_without_limits_keeps_the_graph():
+    simplified = simplify_graph(GRAPH, SimplificationParameters(), "start", "end")
+
+    assert simplified == GRAPH
+
+
+def test_min_edge_frequency_keeps_the_widest_paths():
+    simplified = simplify_graph(GRAPH, SimplificationParameters(min_edge_frequency=5), "start", "end")
+
+    assert _edges(simplified) == {("start", "A"): 10, ("A", "B"): 6, ("A", "C"): 4, ("B", "D"): 6,
+                                  ("C", "D"): 3, ("D", "end"): 9, ("start", "E"): 1, ("E", "end"): 1}
+    assert _is_connected(simplified)
+
+
+def test_max_edges_and_max_nodes_bound_the_graph_size():
+    by_edges = simplify_graph(GRAPH, SimplificationParameters(max_edges=9), "start", "end")
+    by_nodes = simplify_graph(GRAPH, SimplificationParameters(max_nodes=3), "start", "end")
+
+    assert len(by_edges.connections) == 9
+    assert ("C", "end") in _edges(by_edges)
+    assert _is_connected(by_edges)
+    assert {node for edge in _edges(by_nodes) for node in edge} == {"start", "A", "B", "D", "end"}
+    assert _is_connected(by_nodes)
+
+
+def test_top_k_edges_per_node():
+    simplified = simplify_graph(GRAPH, SimplificationParameters(top_k_edges_per_node=1), "start", "end")
+
+    assert ("B", "C") not in _edges(simplified)
+    assert ("D", "B") not in _edges(simplified)
+    assert _is_connected(simplified)
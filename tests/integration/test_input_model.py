@@ -29,3 +29,17 @@ def test_input_body_accepts_callback_url(sample_data):
 def test_input_body_requires_parameters(sample_data):
     with pytest.raises(ValidationError):
         InputBody.model_validate({"data": sample_data})
+
+
+def test_input_body_accepts_dataset_reference():
+    body = InputBody.model_validate({"dataset_id": "abc", "case_ids": ["T1"], "parameters": {}})
+
+    assert body.data is None
+    assert body.case_ids == ["T1"]
+
+
+def test_input_body_requires_exactly_one_data_source(sample_data):
+    with pytest.raises(ValidationError):
+        InputBody.model_validate({"parameters": {}})
+    with pytest.raises(ValidationError):
+        InputBody.model_validate({"data": sample_data, "dataset_id": "abc", "parameters": {}})
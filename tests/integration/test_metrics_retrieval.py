@@ -1,7 +1,21 @@
+import pandas as pd
+import pytest
+
+from data_handling.activity_time_index import build_activity_time_index
 from data_handling.data_transformation import transform_dict
+from data_handling.encoded_log import encode_log
 from helpers.config_loader import CONFIG
 from model.input_model import ActiveEventParameters
-from retrieval.metrics_retrieval import get_metrics
+from retrieval.metrics_retrieval import (
+    calculate_active_events,
+    calculate_monthly_bins,
+    calculate_quarterly_bins,
+    calculate_weekly_bins,
+    calculate_yearly_bins,
+    get_metrics,
+    summarize_cases,
+)
+from retrieval.variant_engine import count_variants
 
 
 def _assert_metric(metrics, name: str, expected):
@@ -28,6 +42,8 @@ def test_get_metrics_small_dataset(sample_data):
     _assert_metric(metrics, "min_trace_length", 2)
     _assert_metric(metrics, "max_trace_duration", 172800.0)
     _assert_metric(metrics, "min_trace_duration", 86400.0)
+    _assert_metric(metrics, "trace_duration_quantiles", pytest.approx(
+        {str(quantile): 86400.0 * (1 + quantile) for quantile in CONFIG["trace_duration_quantiles"]}))
     _assert_metric(metrics, "event_frequency_distr", {"A": 2, "B": 1, "C": 1})
     _assert_metric(metrics, "trace_length_distr", {"2": 2})
 
@@ -44,8 +60,75 @@ def test_get_metrics_small_dataset(sample_data):
         assert edges == {("A", "B"), ("A", "C")}
         assert all(edge.frequency == -1 for edge in metrics.tbe)
 
+    if "variant_profiles" in CONFIG["exclude"]:
+        assert metrics.variant_profiles is None
+    else:
+        steps = {(step.e1, step.e2): step.mean for profile in metrics.variant_profiles.values()
+                 for step in profile.steps}
+        assert steps == {("A", "B"): 86400.0, ("A", "C"): 172800.0}
+
     if "active_events" in CONFIG["exclude"]:
         assert metrics.active_events is None
     else:
         assert metrics.active_events.yearly
         assert all(isinstance(value, int) for value in metrics.active_events.yearly.values())
+
+    if "trace_duration_histogram" in CONFIG["exclude"]:
+        assert metrics.trace_duration_histogram is None
+    else:
+        histogram = metrics.trace_duration_histogram
+        assert histogram.bin_edges[0] == 86400.0
+        assert histogram.bin_edges[-1] == 172800.0
+        assert sum(histogram.counts) == 2
+        assert histogram.counts[0] == 1
+        assert histogram.counts[-1] == 1
+
+
+def test_summarize_cases(sample_data):
+    df = transform_dict(sample_data)
+    variants = count_variants(encode_log(df))
+
+    cases = summarize_cases(df, variants)
+
+    assert cases.loc["T1", "duration"] == 86400.0
+    assert cases.loc["T2", "duration"] == 172800.0
+    assert cases["length"].tolist() == [2, 2]
+    assert cases.loc["T1", "variant"] != cases.loc["T2", "variant"]
+    assert cases.loc["T2", "start"] == df["time:timestamp"].min()
+
+
+def test_calendar_bins_start_at_midnight():
+    initial = pd.Timestamp("2024-02-14T13:30:00")
+    final = pd.Timestamp("2024-04-01T00:00:00")
+
+    assert calculate_weekly_bins(initial, final)[:2] == [pd.Timestamp("2024-02-12"), pd.Timestamp("2024-02-19")]
+    assert calculate_weekly_bins(initial, final)[-1] == pd.Timestamp("2024-04-01")
+    assert calculate_monthly_bins(initial, final) == [pd.Timestamp("2024-02-01"), pd.Timestamp("2024-03-01"),
+                                                      pd.Timestamp("2024-04-01")]
+    assert calculate_quarterly_bins(initial, final) == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-04-01")]
+    assert calculate_yearly_bins(initial, final) == [pd.Timestamp("2024-01-01")]
+
+
+def test_calculate_active_events_from_index():
+    df = pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T2", "T2", "T2"],
+            "concept:name": ["Start", "End", "Start", "X", "End"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T10:00:00",
+                "2024-02-10T10:00:00",
+                "2024-01-20T10:00:00",
+                "2024-01-21T10:00:00",
+                "2024-04-02T10:00:00",
+            ]),
+        }
+    )
+    index = build_activity_time_index(encode_log(df))
+    parameters = ActiveEventParameters(positive_events=["Start"], negative_events=["End"], singular_events=["X"])
+
+    active_events = calculate_active_events(index, parameters)
+
+    assert active_events.monthly == {"2024-01-01 00:00:00": 3, "2024-02-01 00:00:00": 2,
+                                     "2024-03-01 00:00:00": 1, "2024-04-01 00:00:00": 1}
+    assert active_events.quarterly == {"2024-01-01 00:00:00": 3, "2024-04-01 00:00:00": 1}
+    assert active_events.yearly == {"2024-01-01 00:00:00": 3}
@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from data_handling.columnar_storage import spill_csv
+from data_handling.data_transformation import transform_dict
+from helpers.config_loader import CONFIG
+from model.input_model import ActiveEventParameters
+from retrieval.metrics_retrieval import get_metrics
+from retrieval.out_of_core_retrieval import get_metrics_out_of_core, get_process_model_out_of_core
+from retrieval.process_model_retrieval import get_process_model_partitioned
+
+MEMORY_BUDGET = 64 * 1024
+
+
+@pytest.fixture()
+def sepsis_df():
+    data_path = Path(__file__).resolve().parents[1] / "test_logs" / "sepsis.json"
+    with data_path.open() as file:
+        return transform_dict(json.load(file))
+
+
+@pytest.fixture()
+def spilled_sepsis(sepsis_df, tmp_path):
+    source = tmp_path / "sepsis.csv"
+    sepsis_df.to_csv(source, index=False)
+    return spill_csv(source, tmp_path / "log", MEMORY_BUDGET)
+
+
+def test_out_of_core_process_model_matches_in_memory(sepsis_df, spilled_sepsis, tmp_path):
+    expected = get_process_model_partitioned(sepsis_df, "START", "END", n_partitions=1)
+
+    graph = get_process_model_out_of_core(spilled_sepsis, "START", "END", MEMORY_BUDGET, tmp_path / "graph")
+
+    assert graph == expected
+
+
+def test_out_of_core_metrics_match_in_memory(sepsis_df, spilled_sepsis, tmp_path):
+    active_events = ActiveEventParameters(positive_events=["ER Registration"], negative_events=["Release A"],
+                                          singular_events=["CRP"])
+    expected = get_metrics(sepsis_df, active_events, n_top_variants=5)
+
+    metrics = get_metrics_out_of_core(spilled_sepsis, active_events, 5, MEMORY_BUDGET, tmp_path / "metrics")
+
+    for field in ("n_traces", "n_events", "n_variants", "max_trace_length", "min_trace_length",
+                  "max_trace_duration", "min_trace_duration", "event_frequency_distr", "trace_length_distr",
+                  "active_events"):
+        assert getattr(metrics, field) == getattr(expected, field)
+    if "top_variants" not in CONFIG["exclude"]:
+        assert [(v.frequency, v.mean_duration) for v in metrics.top_variants.values()] == pytest.approx(
+            [(v.frequency, v.mean_duration) for v in expected.top_variants.values()])
+    if "tbe" not in CONFIG["exclude"]:
+        assert {(edge.e1, edge.e2) for edge in metrics.tbe} == {(edge.e1, edge.e2) for edge in expected.tbe}
+    if "variant_profiles" not in CONFIG["exclude"]:
+        assert metrics.variant_profiles.keys() == expected.variant_profiles.keys()
+        for rank, profile in expected.variant_profiles.items():
+            assert metrics.variant_profiles[rank].event_sequence == profile.event_sequence
+            assert [step.model_dump() for step in metrics.variant_profiles[rank].steps] == pytest.approx(
+                [step.model_dump() for step in profile.steps])
+    if "trace_duration_quantiles" not in CONFIG["exclude"]:
+        assert metrics.trace_duration_quantiles == pytest.approx(expected.trace_duration_quantiles)
+    if "trace_duration_histogram" not in CONFIG["exclude"]:
+        assert metrics.trace_duration_histogram.counts == expected.trace_duration_histogram.counts
+        assert metrics.trace_duration_histogram.bin_edges == pytest.approx(expected.trace_duration_histogram.bin_edges)
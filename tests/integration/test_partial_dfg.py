@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from data_handling.data_transformation import transform_dict
+from data_handling.encoded_log import encode_log
+from retrieval.partial_dfg import compute_partial_dfg, merge_partial_dfgs, partial_dfg_to_graph
+from retrieval.process_model_retrieval import (
+    get_process_model_partitioned,
+    get_process_model_with_pm4py,
+    partition_cases,
+)
+
+
+def _sepsis_df():
+    data_path = Path(__file__).resolve().parents[1] / "test_logs" / "sepsis.json"
+    with data_path.open() as file:
+        return transform_dict(json.load(file))
+
+
+def test_partitioned_process_model_matches_pm4py():
+    df = _sepsis_df()
+
+    expected = get_process_model_with_pm4py(df, "START", "END")
+    partitioned = get_process_model_partitioned(df, "START", "END", n_partitions=1)
+
+    assert [(c.e1, c.e2, c.frequency) for c in partitioned.connections] == [
+        (c.e1, c.e2, c.frequency) for c in expected.connections
+    ]
+    for actual, reference in zip(partitioned.connections, expected.connections, strict=True):
+        for statistic in ("median", "min", "max", "stdev", "sum", "mean"):
+            assert getattr(actual, statistic) == pytest.approx(getattr(reference, statistic))
+
+
+def test_merged_partitions_are_identical_to_single_partition():
+    log = encode_log(_sepsis_df())
+
+    single = partial_dfg_to_graph(compute_partial_dfg(log), log.activities, "START", "END")
+    merged = merge_partial_dfgs([compute_partial_dfg(part) for part in partition_cases(log, 4)])
+
+    assert partial_dfg_to_graph(merged, log.activities, "START", "END") == single
+
+
+def test_merged_partitions_keep_the_sorted_durations_of_all_occurrences():
+    log = encode_log(_sepsis_df())
+    single = compute_partial_dfg(log)
+
+    # More partitions than cases with some activities, so some partial graphs lack edges.
+    merged = merge_partial_dfgs([compute_partial_dfg(part) for part in partition_cases(log, 64)])
+
+    assert merged.edge_keys.tolist() == single.edge_keys.tolist()
+    assert merged.edge_counts.tolist() == single.edge_counts.tolist()
+    assert merged.durations.tolist() == single.durations.tolist()
+
+
+def test_partition_cases_splits_cases_disjointly():
+    log = encode_log(_sepsis_df())
+
+    partitions = partition_cases(log, 3)
+
+    case_ids = [case_id for partition in partitions for case_id in partition.case_ids]
+    assert sorted(case_ids) == sorted(log.case_ids)
+    assert sum(partition.n_events for partition in partitions) == log.n_events
+
+
+def test_partitioned_process_model_uses_worker_processes(sample_data):
+    df = transform_dict(sample_data)
+
+    graph = get_process_model_partitioned(df, "START", "END", n_partitions=2)
+
+    edge_frequencies = {(edge.e1, edge.e2): edge.frequency for edge in graph.connections}
+    assert edge_frequencies == {("START", "A"): 2, ("A", "B"): 1, ("A", "C"): 1, ("B", "END"): 1, ("C", "END"): 1}
@@ -46,6 +46,7 @@ def _sample_response() -> DiscoveryResponse:
         min_trace_duration=86400.0,
         active_events=ActiveEvents(
             yearly={"2024-01-01": 2},
+            quarterly={"2024-01-01": 2},
             monthly={"2024-01-01": 2},
             weekly={"2024-01-01": 2},
         ),
@@ -123,6 +124,7 @@ def test_discovery_response_accepts_dict_payload():
             "min_trace_duration": 3600.0,
             "active_events": {
                 "yearly": {"2024-01-01": 1},
+                "quarterly": {"2024-01-01": 1},
                 "monthly": {"2024-01-01": 1},
                 "weekly": {"2024-01-01": 1},
             },
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from data_handling.encoded_log import encode_log
+from retrieval.variant_engine import count_variants
+
+
+def _sample_log():
+    cases = {
+        "T5": ["A", "B"],
+        "T1": ["A", "C"],
+        "T3": ["A", "B"],
+        "T2": ["A", "B", "C"],
+        "T4": ["A", "C"],
+        "T6": ["C"],
+    }
+    rows = [(case, activity, pd.Timestamp("2024-01-01") + pd.Timedelta(hours=position))
+            for case, activities in cases.items() for position, activity in enumerate(activities)]
+    return encode_log(pd.DataFrame(rows, columns=["case:concept:name", "concept:name", "time:timestamp"]))
+
+
+def _sequence(log, case):
+    return [log.activities[code] for code in log.codes[log.case_offsets[case]:log.case_offsets[case + 1]]]
+
+
+def test_count_variants_groups_cases_with_the_same_sequence():
+    log = _sample_log()
+
+    variants = count_variants(log)
+
+    assert variants.n_variants == 4
+    assert sorted(variants.counts.tolist()) == [1, 1, 2, 2]
+    case_order, offsets = variants.variant_cases()
+    for variant in range(variants.n_variants):
+        cases = case_order[offsets[variant]:offsets[variant + 1]]
+        assert len(cases) == variants.counts[variant]
+        assert all(_sequence(log, case) == _sequence(log, cases[0]) for case in cases)
+
+
+def test_variants_are_ranked_by_frequency_and_smallest_case_identifier():
+    log = _sample_log()
+    variants = count_variants(log)
+
+    ranked = variants.ranked()
+
+    representatives = [log.case_ids[case] for case in variants.representatives[ranked].tolist()]
+    assert representatives == ["T1", "T3", "T2", "T6"]
+    assert [_sequence(log, case) for case in variants.representatives[ranked]] == [
+        ["A", "C"], ["A", "B"], ["A", "B", "C"], ["C"]]
+    assert np.array_equal(variants.top(2), ranked[:2])
+    assert np.array_equal(variants.top(10), ranked)
+    assert len(variants.top(0)) == 0
+
+
+def test_select_keeps_cases_and_ranking_of_the_selected_variants():
+    log = _sample_log()
+    variants = count_variants(log)
+    ranked = variants.ranked()
+
+    selected = variants.select(ranked[1:3])
+
+    assert selected.case_ids == ["T5", "T3", "T2"]
+    assert selected.n_variants == 2
+    assert [selected.case_ids[case] for case in selected.representatives[selected.ranked()].tolist()] == ["T3", "T2"]
+
+
+def test_count_variants_splits_cases_whose_hashes_collide():
+    log = _sample_log()
+    # All cases get the same hashes, as if all sequences collided.
+    colliding = np.zeros((log.n_cases, 2), dtype=np.uint64)
+
+    for max_events in [None, 2]:
+        variants = count_variants(log, colliding, max_events)
+
+        assert variants.n_variants == 4
+        representatives = [log.case_ids[case] for case in variants.representatives[variants.ranked()].tolist()]
+        assert representatives == ["T1", "T3", "T2", "T6"]
+        assert variants.counts[variants.ranked()].tolist() == [2, 2, 1, 1]
+        assert np.array_equal(variants.case_variants == variants.case_variants[1],
+                              np.asarray([case in ("T1", "T4") for case in log.case_ids]))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling.encoded_log import encode_log
+from retrieval.variant_engine import count_variants
+from retrieval.variant_profiles import calculate_variant_profiles
+
+
+def _sample_log():
+    # Variants: A B C (T1, T2, T4), A C (T3).
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T2", "T2", "T2", "T3", "T3", "T4", "T4", "T4"],
+            "concept:name": ["A", "B", "C", "A", "B", "C", "A", "C", "A", "B", "C"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00", "2024-01-01T01:00:00", "2024-01-01T03:00:00",
+                "2024-01-02T00:00:00", "2024-01-02T03:00:00", "2024-01-02T04:00:00",
+                "2024-01-03T00:00:00", "2024-01-03T02:00:00",
+                "2024-01-04T00:00:00", "2024-01-04T02:00:00", "2024-01-04T08:00:00",
+            ]),
+        }
+    ))
+
+
+def _profiles(log, n_top_variants):
+    variants = count_variants(log)
+    top_variant_ids = variants.top(n_top_variants)
+    ranks = np.full(variants.n_variants, -1, dtype=np.int64)
+    ranks[top_variant_ids] = np.arange(len(top_variant_ids))
+    return calculate_variant_profiles(log, ranks[variants.case_variants], variants.counts[top_variant_ids].tolist())
+
+
+def test_profiles_describe_each_step_of_the_top_variants():
+    profiles = _profiles(_sample_log(), 2)
+
+    first, second = profiles["0"], profiles["1"]
+    assert (first.event_sequence, first.frequency) == (["A", "B", "C"], 3)
+    assert [(step.e1, step.e2) for step in first.steps] == [("A", "B"), ("B", "C")]
+    assert [(step.min, step.median, step.max, step.mean) for step in first.steps] == [
+        (3600, 7200, 3 * 3600, 7200), (3600, 2 * 3600, 6 * 3600, 3 * 3600)]
+    assert first.steps[0].stdev == pytest.approx(3600)
+    assert [(step.cumulative_median, step.cumulative_mean) for step in first.steps] == [
+        (7200, 7200), (4 * 3600, 5 * 3600)]
+    assert (second.event_sequence, second.frequency) == (["A", "C"], 1)
+    assert second.steps[0].stdev == -1
+    assert second.steps[0].cumulative_mean == 7200
+
+
+def test_profiles_match_grouping_the_traces():
+    rng = np.random.default_rng(7)
+    n_cases = 400
+    lengths = rng.integers(1, 5, size=n_cases)
+    case_ids = np.repeat([f"c{i}" for i in range(n_cases)], lengths)
+    data = pd.DataFrame({"case:concept:name": case_ids,
+                         "concept:name": rng.choice(["A", "B", "C"], size=len(case_ids), p=[0.6, 0.3, 0.1]),
+                         "time:timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(
+                             np.cumsum(rng.integers(0, 100, size=len(case_ids))), unit="min")})
+
+    profiles = _profiles(encode_log(data), 6)
+
+    data["trace"] = data.groupby("case:concept:name")["concept:name"].transform(lambda names: " ".join(names))
+    data["position"] = data.groupby("case:concept:name").cumcount()
+    grouped = data.groupby("case:concept:name")["time:timestamp"]
+    data["step"] = grouped.diff().dt.total_seconds()
+    data["cumulative"] = (data["time:timestamp"] - grouped.transform("min")).dt.total_seconds()
+    for profile in profiles.values():
+        steps = data[data["trace"] == " ".join(profile.event_sequence)].groupby("position").agg(
+            median=("step", "median"), mean=("step", "mean"), max=("step", "max"),
+            cumulative_mean=("cumulative", "mean")).iloc[1:]
+        assert len(profile.steps) == len(profile.event_sequence) - 1 == len(steps)
+        for step, (_, expected) in zip(profile.steps, steps.iterrows(), strict=True):
+            assert (step.median, step.mean, step.max, step.cumulative_mean) == pytest.approx(
+                (expected["median"], expected["mean"], expected["max"], expected["cumulative_mean"]))
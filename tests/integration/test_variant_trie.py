@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling.encoded_log import encode_log
+from retrieval.variant_trie import (
+    build_variant_trie,
+    load_variant_trie,
+    save_variant_trie,
+    variant_completions,
+    variant_prefix,
+)
+
+
+def _sample_log():
+    # Variants: A B C (T1, T2), A B (T3), A C (T4), B (T5).
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T2", "T2", "T2", "T3", "T3", "T4", "T4", "T5"],
+            "concept:name": ["A", "B", "C", "A", "B", "C", "A", "B", "A", "C", "B"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00", "2024-01-01T01:00:00", "2024-01-01T03:00:00",
+                "2024-01-02T00:00:00", "2024-01-02T03:00:00", "2024-01-02T04:00:00",
+                "2024-01-03T00:00:00", "2024-01-03T02:00:00",
+                "2024-01-04T00:00:00", "2024-01-04T05:00:00",
+                "2024-01-05T00:00:00",
+            ]),
+        }
+    ))
+
+
+def _random_log(seed, n_cases=300):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 7, size=n_cases)
+    case_ids = np.repeat([f"c{i}" for i in range(n_cases)], lengths)
+    hours = np.cumsum(rng.integers(0, 5, size=len(case_ids)))
+    return pd.DataFrame({"case:concept:name": case_ids,
+                         "concept:name": rng.choice(["A", "B", "C", "D"], size=len(case_ids), p=[0.4, 0.3, 0.2, 0.1]),
+                         "time:timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(hours, unit="h")})
+
+
+def test_prefix_statistics_and_next_steps():
+    trie = build_variant_trie(_sample_log())
+
+    root = variant_prefix(trie, [])
+    prefix = variant_prefix(trie, ["A", "B"])
+
+    assert (root.n_cases, root.n_ended) == (5, 0)
+    assert [(step.activity, step.n_cases, step.probability) for step in root.next_steps] == [("A", 4, 0.8),
+                                                                                            ("B", 1, 0.2)]
+    assert (prefix.n_cases, prefix.n_ended) == (3, 1)
+    assert prefix.elapsed.mean == pytest.approx(2 * 3600)
+    assert prefix.elapsed.stdev == pytest.approx(3600)
+    assert (prefix.elapsed.min, prefix.elapsed.max) == (3600, 3 * 3600)
+    assert [(step.activity, step.n_cases) for step in prefix.next_steps] == [("C", 2)]
+    assert prefix.next_steps[0].mean_elapsed == pytest.approx(3.5 * 3600)
+    assert variant_prefix(trie, ["C"]).n_cases == 0
+    with pytest.raises(ValueError, match="does not exist"):
+        variant_prefix(trie, ["D"])
+
+
+def test_top_completions_of_a_prefix():
+    trie = build_variant_trie(_sample_log())
+
+    completions = variant_completions(trie, ["A"], k=2)
+
+    assert completions.n_cases == 4
+    assert [(variant.event_sequence, variant.frequency) for variant in completions.completions] == [
+        (["A", "B", "C"], 2), (["A", "B"], 1)]
+    assert completions.completions[0].mean_duration == pytest.approx(3.5 * 3600)
+    assert len(variant_completions(trie, [], k=10).completions) == 4
+    with pytest.raises(ValueError):
+        variant_completions(trie, [], k=0)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_trie_matches_counting_the_cases(seed, tmp_path):
+    data = _random_log(seed)
+    save_variant_trie(build_variant_trie(encode_log(data)), tmp_path)
+    trie = load_variant_trie(tmp_path, sorted(data["concept:name"].unique()))
+    grouped = data.groupby("case:concept:name", sort=False)
+    traces = grouped["concept:name"].agg(tuple)
+    durations = grouped["time:timestamp"].agg(lambda timestamps: (timestamps.max() - timestamps.min()).total_seconds())
+    expected = pd.DataFrame({"trace": traces, "duration": durations}).groupby("trace")["duration"].agg(
+        ["count", "mean"]).sort_values("count", ascending=False, kind="stable")
+
+    completions = variant_completions(trie, [], k=len(expected)).completions
+
+    assert [variant.frequency for variant in completions] == expected["count"].tolist()
+    for variant in completions:
+        assert variant.frequency == expected.loc[[tuple(variant.event_sequence)], "count"].iloc[0]
+        assert variant.mean_duration == pytest.approx(expected.loc[[tuple(variant.event_sequence)], "mean"].iloc[0])
+    for prefix in (["A"], ["B", "A"], ["A", "A", "C"]):
+        starting = traces[traces.map(lambda trace, prefix=prefix: list(trace[:len(prefix)]) == prefix)]
+        assert variant_prefix(trie, prefix).n_cases == len(starting)
+        assert variant_completions(trie, prefix, k=1).n_cases == len(starting)
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from data_handling.activity_time_index import (
+    NS_PER_DAY,
+    build_activity_time_index,
+    load_activity_time_index,
+    save_activity_time_index,
+)
+from data_handling.encoded_log import encode_log
+
+
+def _sample_log():
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T2", "T2"],
+            "concept:name": ["A", "B", "A", "A", "C"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T08:00:00",
+                "2024-01-01T23:59:59",
+                "2024-01-03T00:00:00",
+                "2024-01-02T12:00:00",
+                "2024-01-05T00:00:00",
+            ]),
+        }
+    ))
+
+
+def _day(date: str) -> int:
+    return pd.Timestamp(date).value // NS_PER_DAY
+
+
+def test_activity_time_index_counts_events_between_days():
+    index = build_activity_time_index(_sample_log())
+    edges = np.asarray([_day("2024-01-01"), _day("2024-01-02"), _day("2024-01-04"), _day("2024-01-10")])
+
+    assert index.n_days == 5
+    assert list(index.count_events(["A"], edges)) == [1, 2, 0]
+    assert list(index.count_events(["A", "B", "C"], edges)) == [2, 2, 1]
+    assert list(index.count_events([], edges)) == [0, 0, 0]
+
+
+def test_activity_time_index_ignores_days_outside_the_log():
+    index = build_activity_time_index(_sample_log())
+    edges = np.asarray([_day("2023-01-01"), _day("2023-12-31"), _day("2025-01-01")])
+
+    assert list(index.count_events(["A", "B", "C"], edges)) == [0, 5]
+
+
+def test_activity_time_index_in_chunks_matches_single_pass():
+    log = _sample_log()
+
+    chunked = build_activity_time_index(log, max_events=2)
+
+    single_pass = build_activity_time_index(log)
+    assert np.array_equal(chunked.days, single_pass.days)
+    assert np.array_equal(chunked.activity_offsets, single_pass.activity_offsets)
+    assert np.array_equal(chunked.cumulative_counts, single_pass.cumulative_counts)
+
+
+def test_activity_time_index_roundtrip(tmp_path):
+    log = _sample_log()
+    index = build_activity_time_index(log)
+
+    save_activity_time_index(index, tmp_path)
+    loaded = load_activity_time_index(tmp_path, log.activities)
+
+    assert np.array_equal(loaded.days, index.days)
+    assert np.array_equal(loaded.activity_offsets, index.activity_offsets)
+    assert np.array_equal(loaded.cumulative_counts, index.cumulative_counts)
+    assert loaded.first_day == index.first_day
+    assert loaded.first_timestamp == index.first_timestamp
+    assert load_activity_time_index(tmp_path / "missing", log.activities) is None
+
+
+def test_activity_time_index_size_is_bounded_by_the_events():
+    # Two events 300 years apart: a dense matrix of activities and days would have more than 100_000 columns.
+    log = encode_log(pd.DataFrame({"case:concept:name": ["T1", "T2"], "concept:name": ["A", "B"],
+                                   "time:timestamp": pd.to_datetime(["1900-01-01", "2200-01-01"])}))
+
+    index = build_activity_time_index(log)
+
+    assert index.n_days > 100_000
+    assert len(index.days) == 2
+    assert index.activity_offsets.tolist() == [0, 1, 2]
+    assert list(index.count_events(["A", "B"], np.asarray([_day("1899-01-01"), _day("2000-01-01"),
+                                                           _day("2250-01-01")]))) == [1, 1]
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from helpers.admission_control import AdmissionController, AdmissionRejected, RequestCost, estimate_cost
+from helpers.cancellation import CancellationToken, Cancelled
+
+
+def _controller(**kwargs) -> AdmissionController:
+    settings = {"memory_budget": 100, "cpu_slots": 2, "max_queue_length": 1, "queue_timeout_seconds": 0.05}
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+
+def test_estimate_cost_grows_with_states():
+    plain = estimate_cost(1000, 50)
+    states = estimate_cost(1000, 50, n_state_activities=2)
+    counts = estimate_cost(1000, 50, add_counts=True)
+
+    assert plain.memory < states.memory
+    assert plain.memory < counts.memory
+
+
+def test_large_states_requests_are_admitted():
+    # States only use one column per state changing event, not one per activity.
+    controller = _controller(memory_budget=4096 * 2 ** 20)
+    cost = estimate_cost(1_000_000, 100, n_state_activities=2)
+
+    with controller.admit(cost):
+        assert controller.metrics().running == 1
+
+    assert cost.memory < estimate_cost(1_000_000, 100).memory * 2
+    assert controller.metrics().rejected_too_large == 0
+
+
+def test_admit_tracks_running_requests():
+    controller = _controller()
+
+    with controller.admit(RequestCost(memory=60)):
+        assert controller.metrics().running == 1
+        assert controller.metrics().memory_in_use == 60
+
+    assert controller.metrics().running == 0
+    assert controller.metrics().admitted == 1
+
+
+def test_admit_rejects_requests_exceeding_budget():
+    controller = _controller()
+
+    with pytest.raises(AdmissionRejected) as exc_info, controller.admit(RequestCost(memory=101)):
+        pass
+
+    assert exc_info.value.status_code == 503
+    assert controller.metrics().rejected_too_large == 1
+
+
+def test_admit_times_out_when_budget_is_used():
+    controller = _controller()
+
+    with controller.admit(RequestCost(memory=60)):
+        with pytest.raises(AdmissionRejected) as exc_info, controller.admit(RequestCost(memory=60)):
+            pass
+
+    assert exc_info.value.status_code == 503
+    assert controller.metrics().rejected_timeout == 1
+    assert controller.metrics().queue_depth == 0
+
+
+def test_admit_rejects_when_queue_is_full():
+    controller = _controller(queue_timeout_seconds=5)
+    waiting = threading.Event()
+    release = threading.Event()
+
+    def queued_request():
+        waiting.set()
+        with controller.admit(RequestCost(memory=60)):
+            pass
+
+    with controller.admit(RequestCost(memory=60)):
+        thread = threading.Thread(target=queued_request)
+        thread.start()
+        waiting.wait()
+        while controller.metrics().queue_depth == 0:
+            release.wait(0.01)
+        with pytest.raises(AdmissionRejected) as exc_info, controller.admit(RequestCost(memory=10)):
+            pass
+    thread.join()
+
+    assert exc_info.value.status_code == 429
+    assert controller.metrics().rejected_queue_full == 1
+    assert controller.metrics().admitted == 2
+
+
+def test_cancelled_requests_leave_the_queue():
+    controller = _controller(queue_timeout_seconds=5)
+    token = CancellationToken()
+    timer = threading.Timer(0.05, token.cancel)
+
+    with controller.admit(RequestCost(memory=60)):
+        timer.start()
+        with pytest.raises(Cancelled, match="disconnected"), controller.admit(RequestCost(memory=60), token):
+            pass
+
+    assert controller.metrics().queue_depth == 0
+    assert controller.metrics().rejected_timeout == 0
+
+
+def test_queued_requests_stop_waiting_at_their_deadline():
+    controller = _controller(queue_timeout_seconds=5)
+    token = CancellationToken(deadline=time.time() + 0.05)
+
+    with controller.admit(RequestCost(memory=60)):
+        with pytest.raises(Cancelled, match="deadline"), controller.admit(RequestCost(memory=60), token):
+            pass
+
+    assert controller.metrics().queue_depth == 0
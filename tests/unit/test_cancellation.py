@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from helpers.cancellation import (
+    CancellationStatistics,
+    CancellationToken,
+    Cancelled,
+    attached_token,
+    cancellation_scope,
+    checkpoint,
+)
+
+
+def test_tokens_are_cancelled_by_their_deadline_or_explicitly():
+    token = CancellationToken()
+    token.check()
+
+    token.set_timeout(-1)
+    assert token.reason() == "deadline"
+    token.set_timeout(None)
+    assert token.reason() is None
+    token.cancel()
+
+    with pytest.raises(Cancelled) as error:
+        token.check()
+    assert (error.value.reason, error.value.status_code) == ("disconnected", 499)
+
+
+def test_checkpoints_check_the_token_of_the_current_scope():
+    token = CancellationToken(deadline=time.time() + 60)
+
+    checkpoint()
+    with cancellation_scope(token):
+        checkpoint()
+        token.cancel("deadline")
+        with pytest.raises(Cancelled, match="deadline"):
+            checkpoint()
+        with cancellation_scope(None):
+            checkpoint()
+    checkpoint()
+
+
+def test_shared_tokens_are_cancelled_in_attached_tokens():
+    token = CancellationToken(deadline=time.time() + 60)
+
+    with token.shared() as handle, attached_token(handle) as attached:
+        assert attached.deadline == token.deadline
+        assert attached.reason() is None
+        token.cancel()
+        assert attached.reason() == "disconnected"
+
+
+def test_tokens_are_cancelled_while_and_after_they_are_shared():
+    token = CancellationToken()
+    token.cancel("deadline")
+
+    with token.shared() as handle, attached_token(handle) as attached:
+        assert attached.reason() == "deadline"
+    token.cancel()
+
+    assert token.reason() == "disconnected"
+
+
+def test_statistics_estimate_saved_time_from_completed_calculations():
+    statistics = CancellationStatistics()
+    statistics.record_cancelled("deadline", 100, 1.0)
+    statistics.record_completed(100, 2.0)
+    statistics.record_completed(300, 6.0)
+
+    statistics.record_cancelled("disconnected", 1000, 5.0)
+    statistics.record_cancelled("deadline", 10, 5.0)
+
+    metrics = statistics.metrics()
+    assert (metrics.completed, metrics.cancelled_deadline, metrics.cancelled_disconnected) == (2, 2, 1)
+    assert metrics.seconds_until_cancelled == 11.0
+    assert metrics.estimated_seconds_saved == 15.0
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling.columnar_storage import iter_case_chunks, load_encoded_log, save_encoded_log, spill_csv
+from data_handling.encoded_log import encode_log
+
+
+def _sample_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T2", "T1", "T3", "T2", "T1"],
+            "concept:name": ["B", "A", "C", "A", "B", "A"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00",
+                "2024-01-01T01:00:00",
+                "2024-01-02T00:00:00",
+                "2024-01-02T01:00:00",
+                "2024-01-03T00:00:00",
+                "2024-01-04T00:00:00",
+            ]),
+        }
+    )
+
+
+def _assert_logs_equal(actual, expected):
+    assert actual.activities == expected.activities
+    assert actual.case_ids == expected.case_ids
+    assert np.array_equal(actual.codes, expected.codes)
+    assert np.array_equal(actual.timestamps, expected.timestamps)
+    assert np.array_equal(actual.case_offsets, expected.case_offsets)
+    assert np.array_equal(actual.case_first_positions, expected.case_first_positions)
+
+
+def test_save_and_load_encoded_log_roundtrip(tmp_path):
+    log = encode_log(_sample_df())
+
+    save_encoded_log(log, tmp_path)
+
+    _assert_logs_equal(load_encoded_log(tmp_path), log)
+
+
+def test_spill_csv_matches_in_memory_encoding(tmp_path):
+    df = _sample_df()
+    source = tmp_path / "log.csv"
+    df.to_csv(source, index=False)
+
+    spilled = spill_csv(source, tmp_path / "spill", memory_budget=1)
+
+    _assert_logs_equal(spilled, encode_log(df))
+    assert isinstance(spilled.codes, np.memmap)
+
+
+def test_spill_csv_rejects_unsorted_events(tmp_path):
+    df = _sample_df()
+    df.loc[5, "time:timestamp"] = pd.Timestamp("2023-01-01")
+    source = tmp_path / "log.csv"
+    df.to_csv(source, index=False)
+
+    with pytest.raises(ValueError):
+        spill_csv(source, tmp_path / "spill", memory_budget=1024)
+
+
+def test_iter_case_chunks_keeps_cases_whole():
+    log = encode_log(_sample_df())
+
+    chunks = list(iter_case_chunks(log, max_events=2))
+
+    assert [chunk.case_ids for chunk in chunks] == [["T1"], ["T2"], ["T3"]]
+    assert sum(chunk.n_events for chunk in chunks) == log.n_events
+    assert list(chunks[1].case_offsets) == [0, 2]
@@ -37,6 +37,28 @@ def test_add_counts_numbers_events_per_trace():
     assert list(counted.columns) == ["case:concept:name", "concept:name", "time:timestamp"]
 
 
+def test_add_counts_folds_counts_above_cap():
+    df = pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T1", "T2", "T2"],
+            "concept:name": ["A", "A", "B", "A", "A", "A"],
+            "time:timestamp": [
+                "2024-01-01T00:00:00",
+                "2024-01-02T00:00:00",
+                "2024-01-03T00:00:00",
+                "2024-01-04T00:00:00",
+                "2024-01-01T00:00:00",
+                "2024-01-02T00:00:00",
+            ],
+        }
+    )
+
+    counted = add_counts(df, max_count=2)
+
+    assert list(counted["concept:name"]) == ["A_1", "A_2+", "B_1", "A_2+", "A_1", "A_2+"]
+    assert list(remove_counts(counted)["concept:name"]) == ["A", "A", "B", "A", "A", "A"]
+
+
 def test_add_states_adds_state_suffixes():
     df = pd.DataFrame(
         {
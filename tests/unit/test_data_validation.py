@@ -1,6 +1,8 @@
+import pandas as pd
 import pytest
 
-from data_handling.data_validation import validate_data
+from data_handling.data_transformation import transform_dict
+from data_handling.data_validation import validate_and_transform, validate_data
 
 
 def _valid_data():
@@ -64,3 +66,30 @@ def test_validate_data_rejects_unsorted_events():
 
     with pytest.raises(ValueError):
         validate_data(data)
+
+
+def test_validate_and_transform_matches_transform_dict():
+    data = _valid_data()
+    data["case:concept:name"] = {"2": "T1", "1": "T1"}
+
+    pd.testing.assert_frame_equal(validate_and_transform(data), transform_dict(_valid_data()))
+
+
+@pytest.mark.parametrize(("change", "error"), [
+    (lambda data: data.update(wrong=data.pop("concept:name")), ValueError),
+    (lambda data: data.update({"concept:name": ["A", "B"]}), TypeError),
+    (lambda data: data.update({"case:concept:name": {"1": "T1"}}), ValueError),
+    (lambda data: data.update({"case:concept:name": {"1": "T1", "3": "T1"}}), ValueError),
+    (lambda data: data["concept:name"].update({"2": 2}), TypeError),
+    (lambda data: data["time:timestamp"].update({"2": "2024-01-02T00:00:00+01:00"}), ValueError),
+    (lambda data: data["time:timestamp"].update({"2": "yesterday"}), ValueError),
+    (lambda data: data["time:timestamp"].update({"1": "2024-01-03 00:00:00"}), ValueError),
+])
+def test_validate_and_transform_rejects_what_validate_data_rejects(change, error):
+    data = _valid_data()
+    change(data)
+
+    with pytest.raises(error):
+        validate_data(data)
+    with pytest.raises(error):
+        validate_and_transform(data)
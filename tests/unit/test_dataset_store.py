@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling.dataset_store import DatasetStore, select_case_ids
+from data_handling.edge_index import INDEX_FILES
+from data_handling.encoded_log import encode_log
+from retrieval.variant_trie import TRIE_FILES
+
+
+def _sample_log():
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T2", "T3"],
+            "concept:name": ["A", "B", "A", "C"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00",
+                "2024-01-02T00:00:00",
+                "2024-01-03T00:00:00",
+                "2024-01-04T00:00:00",
+            ]),
+        }
+    ))
+
+
+def test_dataset_store_persists_memory_mapped_log(tmp_path):
+    store = DatasetStore(tmp_path)
+    log = _sample_log()
+
+    dataset_id = store.add(log)
+    loaded = DatasetStore(tmp_path).load(dataset_id)
+
+    assert isinstance(loaded.codes, np.memmap)
+    assert loaded.case_ids == log.case_ids
+    assert np.array_equal(loaded.timestamps, log.timestamps)
+
+
+def test_dataset_store_keeps_activity_time_index(tmp_path):
+    log = _sample_log()
+    dataset_id = DatasetStore(tmp_path).add(log)
+
+    index = DatasetStore(tmp_path).time_index(dataset_id)
+
+    assert index.activities == log.activities
+    assert index.n_days == 4
+    assert int(index.cumulative_counts[-1]) == log.n_events
+
+
+def test_dataset_store_builds_missing_indexes_when_used(tmp_path):
+    store = DatasetStore(tmp_path, build_indexes=False)
+    dataset_id = store.add(_sample_log())
+    files = {path.name for path in (tmp_path / dataset_id).iterdir()}
+
+    edge_index = store.edge_index(dataset_id)
+    trie = store.variant_trie(dataset_id)
+
+    assert not files & set(INDEX_FILES.values())
+    assert not files & set(TRIE_FILES.values())
+    assert edge_index.activity_occurrences(0).tolist() == [0, 2]
+    assert trie.find(["A", "B"]) is not None
+    assert not [path for path in (tmp_path / dataset_id).iterdir() if path.name.startswith(".")]
+    reopened = DatasetStore(tmp_path)
+    assert isinstance(reopened.edge_index(dataset_id).edge_positions, np.memmap)
+    assert isinstance(reopened.variant_trie(dataset_id).case_counts, np.memmap)
+
+
+def test_dataset_store_delete_removes_dataset(tmp_path):
+    store = DatasetStore(tmp_path)
+    dataset_id = store.add(_sample_log())
+
+    store.delete(dataset_id)
+
+    assert not store.exists(dataset_id)
+    with pytest.raises(KeyError):
+        store.load(dataset_id)
+
+
+def test_dataset_store_rejects_ids_outside_directory(tmp_path):
+    store = DatasetStore(tmp_path / "store")
+
+    assert not store.exists("../store")
+    with pytest.raises(KeyError):
+        store.load("../store")
+
+
+def test_select_case_ids_keeps_requested_cases():
+    selected = select_case_ids(_sample_log(), ["T3", "T1"])
+
+    assert selected.case_ids == ["T1", "T3"]
+    assert selected.n_events == 3
+
+
+def test_select_case_ids_rejects_unknown_cases():
+    with pytest.raises(ValueError):
+        select_case_ids(_sample_log(), ["T4"])
+
+
+def test_select_case_ids_with_stored_index(tmp_path):
+    store = DatasetStore(tmp_path)
+    dataset_id = store.add(_sample_log())
+
+    index = DatasetStore(tmp_path).case_id_index(dataset_id)
+    selected = select_case_ids(store.load(dataset_id), ["T3", "T1", "T3"], index)
+
+    assert isinstance(index.sorted_case_ids, np.memmap)
+    assert selected.case_ids == ["T1", "T3"]
+    with pytest.raises(ValueError, match="2 of the requested"):
+        select_case_ids(store.load(dataset_id), ["T1", "T0", "T9"], index)
+
+
+def test_dataset_store_closes_least_recently_used_datasets(tmp_path):
+    store = DatasetStore(tmp_path, max_open=2)
+    first, second, third = (store.add(_sample_log()) for _ in range(3))
+
+    store.time_index(first)
+    store.load(second)
+    store.load(first)
+    store.case_id_index(third)
+
+    assert list(store._opened) == [first, third]
+    assert first in store._time_indexes
+    assert third in store._case_id_indexes
+    assert store.load(second).n_events == _sample_log().n_events
+    assert list(store._opened) == [third, second]
+    assert first not in store._time_indexes
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from data_handling.edge_index import build_edge_index, load_edge_index, save_edge_index
+from data_handling.encoded_log import encode_log
+
+
+def _sample_log():
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T2", "T2", "T3"],
+            "concept:name": ["A", "B", "A", "A", "B", "B"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00",
+                "2024-01-02T00:00:00",
+                "2024-01-03T00:00:00",
+                "2024-01-01T00:00:00",
+                "2024-01-04T00:00:00",
+                "2024-01-05T00:00:00",
+            ]),
+        }
+    ))
+
+
+def test_edge_index_groups_occurrences_by_edge_and_activity():
+    index = build_edge_index(_sample_log())
+
+    assert index.edge_positions.dtype == np.int32
+    assert index.edge_occurrences(0, 1).tolist() == [0, 3]
+    assert index.edge_occurrences(1, 0).tolist() == [1]
+    assert index.edge_occurrences(1, 1).tolist() == []
+    assert index.activity_occurrences(0).tolist() == [0, 2, 3]
+    assert index.activity_occurrences(1).tolist() == [1, 4, 5]
+
+
+def test_edge_index_is_stored_memory_mapped(tmp_path):
+    index = build_edge_index(_sample_log())
+
+    save_edge_index(index, tmp_path)
+    loaded = load_edge_index(tmp_path, index.n_activities)
+
+    assert loaded is not None
+    assert isinstance(loaded.edge_positions, np.memmap)
+    assert loaded.edge_occurrences(0, 1).tolist() == [0, 3]
+    assert load_edge_index(tmp_path / "missing", index.n_activities) is None
+
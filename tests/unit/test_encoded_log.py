@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from data_handling.encoded_log import decode_log, encode_log
+
+
+def _sample_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "case:concept:name": ["T2", "T1", "T2", "T1", "T3"],
+            "concept:name": ["B", "A", "C", "B", "A"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00",
+                "2024-01-02T00:00:00",
+                "2024-01-03T00:00:00",
+                "2024-01-04T00:00:00",
+                "2024-01-05T00:00:00",
+            ]),
+        }
+    )
+
+
+def test_encode_log_groups_events_by_case():
+    log = encode_log(_sample_df())
+
+    assert log.case_ids == ["T2", "T1", "T3"]
+    assert log.activities == ["A", "B", "C"]
+    assert list(log.case_offsets) == [0, 2, 4, 5]
+    assert list(log.codes) == [1, 2, 0, 1, 0]
+    assert list(log.case_first_positions) == [0, 1, 4]
+
+
+def test_select_cases_keeps_activity_codes():
+    log = encode_log(_sample_df())
+
+    selected = log.select_cases(np.array([2, 0]))
+
+    assert selected.case_ids == ["T3", "T2"]
+    assert selected.activities == log.activities
+    assert list(selected.case_offsets) == [0, 1, 3]
+    assert list(selected.codes) == [0, 1, 2]
+
+
+def test_decode_log_restores_events():
+    df = _sample_df()
+
+    decoded = decode_log(encode_log(df))
+
+    expected = df.sort_values("case:concept:name", key=lambda col: col.map({"T2": 0, "T1": 1, "T3": 2}),
+                              kind="stable")
+    assert list(decoded["case:concept:name"]) == list(expected["case:concept:name"])
+    assert list(decoded["concept:name"]) == list(expected["concept:name"])
+    assert list(decoded["time:timestamp"]) == list(expected["time:timestamp"])
+
+
+def test_select_events_removes_empty_cases():
+    log = encode_log(_sample_df())
+
+    selected = log.select_events(np.asarray([False, False, True, True, False]))
+
+    assert selected.case_ids == ["T1"]
+    assert list(selected.case_offsets) == [0, 2]
+    assert [selected.activities[code] for code in selected.codes] == ["A", "B"]
+    assert list(selected.case_first_positions) == [1]
@@ -0,0 +1,112 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling.encoded_log import encode_log
+from data_handling.event_log_import import detect_format, import_event_log, read_xes_chunks
+from model.input_model import ColumnMapping
+
+XES_LOG = """<?xml version="1.0" encoding="UTF-8" ?>
+<log xes.version="1.0" xmlns="http://www.xes-standard.org/">
+  <global scope="event">
+    <string key="concept:name" value="__INVALID__"/>
+  </global>
+  <string key="concept:name" value="log"/>
+  <trace>
+    <string key="concept:name" value="T1"/>
+    <event>
+      <string key="concept:name" value="B"/>
+      <date key="time:timestamp" value="2024-01-01T01:00:00.000+01:00"/>
+      <string key="org:resource" value="R1"/>
+    </event>
+    <event>
+      <string key="concept:name" value="C"/>
+      <date key="time:timestamp" value="2024-01-02T00:00:00.000+00:00"/>
+    </event>
+  </trace>
+  <trace>
+    <string key="concept:name" value="T2"/>
+    <event>
+      <string key="concept:name" value="A"/>
+      <date key="time:timestamp" value="2024-01-01T01:00:00.000+00:00"/>
+    </event>
+  </trace>
+  <trace>
+    <event>
+      <string key="concept:name" value="A"/>
+      <date key="time:timestamp" value="2024-01-03T00:00:00.000+00:00"/>
+    </event>
+    <string key="concept:name" value="T3"/>
+  </trace>
+</log>
+"""
+
+
+def _expected_log():
+    return encode_log(pd.DataFrame({
+        "case:concept:name": ["T1", "T1", "T2", "T3"],
+        "concept:name": ["B", "C", "A", "A"],
+        "time:timestamp": pd.to_datetime(["2024-01-01T00:00:00", "2024-01-02T00:00:00", "2024-01-01T01:00:00",
+                                          "2024-01-03T00:00:00"]),
+    }))
+
+
+def _assert_logs_equal(actual, expected):
+    assert actual.activities == expected.activities
+    assert actual.case_ids == expected.case_ids
+    assert np.array_equal(actual.codes, expected.codes)
+    assert np.array_equal(actual.timestamps, expected.timestamps)
+    assert np.array_equal(actual.case_offsets, expected.case_offsets)
+
+
+def test_import_xes(tmp_path):
+    source = tmp_path / "log.xes"
+    source.write_text(XES_LOG)
+
+    _assert_logs_equal(import_event_log(source, tmp_path / "spill", 2 ** 20), _expected_log())
+
+
+def test_import_compressed_xes_in_chunks_of_traces(tmp_path):
+    source = tmp_path / "log.xes.gz"
+    with gzip.open(source, "wt") as file:
+        file.write(XES_LOG)
+
+    chunks = list(read_xes_chunks(source, ColumnMapping(), chunk_size=1))
+
+    assert [chunk["case:concept:name"].tolist() for chunk in chunks] == [["T1", "T1"], ["T2"], ["T3"]]
+    _assert_logs_equal(import_event_log(source, tmp_path / "spill", 512), _expected_log())
+
+
+def test_import_csv_with_column_mapping(tmp_path):
+    source = tmp_path / "log.csv"
+    source.write_text("patient,step,time,other\n"
+                      "T2,A,2024-01-01T01:00:00,x\n"
+                      "T1,B,2024-01-01T00:00:00,x\n"
+                      "T1,C,2024-01-02T00:00:00,x\n"
+                      "T3,A,2024-01-03T00:00:00,x\n")
+    mapping = ColumnMapping(case_id="patient", activity="step", timestamp="time")
+
+    log = import_event_log(source, tmp_path / "spill", 2 ** 20, column_mapping=mapping)
+
+    expected = _expected_log()
+    assert log.case_ids == ["T2", "T1", "T3"]
+    _assert_logs_equal(log.select_cases(np.array([1, 0, 2])), expected)
+
+
+def test_import_rejects_invalid_files(tmp_path):
+    (tmp_path / "log.xes").write_text("<log><trace>")
+    (tmp_path / "missing.csv").write_text("case,concept:name,time:timestamp\nT1,A,2024-01-01T00:00:00\n")
+    (tmp_path / "unsorted.csv").write_text("case:concept:name,concept:name,time:timestamp\n"
+                                           "T1,A,2024-01-02T00:00:00\nT1,B,2024-01-01T00:00:00\n")
+
+    with pytest.raises(ValueError, match="not a valid xes file"):
+        import_event_log(tmp_path / "log.xes", tmp_path / "spill", 2 ** 20)
+    with pytest.raises(ValueError):
+        import_event_log(tmp_path / "missing.csv", tmp_path / "spill", 2 ** 20)
+    with pytest.raises(ValueError, match="not sorted"):
+        import_event_log(tmp_path / "unsorted.csv", tmp_path / "spill", 2 ** 20)
+    with pytest.raises(ValueError, match="Unknown format"):
+        detect_format(tmp_path / "log.json")
+    assert detect_format(tmp_path / "log.XES.gz") == "xes"
@@ -0,0 +1,66 @@
+from datetime import UTC, datetime
+
+import pandas as pd
+
+from data_handling.encoded_log import decode_log, encode_log
+from data_handling.log_filter import filter_log
+from model.input_model import FilterParameters
+
+
+def _sample_log():
+    return encode_log(pd.DataFrame(
+        {
+            "case:concept:name": ["T1", "T1", "T1", "T2", "T2", "T3"],
+            "concept:name": ["A", "B", "C", "A", "C", "B"],
+            "time:timestamp": pd.to_datetime([
+                "2024-01-01T00:00:00",
+                "2024-01-05T00:00:00",
+                "2024-01-10T00:00:00",
+                "2024-01-06T00:00:00",
+                "2024-01-07T00:00:00",
+                "2024-01-20T00:00:00",
+            ]),
+        }
+    ))
+
+
+def _traces(log):
+    df = decode_log(log)
+    return df.groupby("case:concept:name", sort=False)["concept:name"].agg(list).to_dict()
+
+
+def test_filter_log_without_filters_keeps_log():
+    log = _sample_log()
+
+    assert _traces(filter_log(log, FilterParameters())) == _traces(log)
+
+
+def test_filter_log_time_modes():
+    start = datetime(2024, 1, 4)
+    end = datetime(2024, 1, 15)
+
+    intersecting = filter_log(_sample_log(), FilterParameters(start_time=start, end_time=end))
+    contained = filter_log(_sample_log(), FilterParameters(start_time=start, end_time=end, time_mode="contained"))
+    events = filter_log(_sample_log(), FilterParameters(start_time=start, end_time=end, time_mode="events"))
+
+    assert _traces(intersecting) == {"T1": ["A", "B", "C"], "T2": ["A", "C"]}
+    assert _traces(contained) == {"T2": ["A", "C"]}
+    assert _traces(events) == {"T1": ["B", "C"], "T2": ["A", "C"]}
+
+
+def test_filter_log_with_timezone_aware_bounds():
+    filters = FilterParameters(start_time=datetime(2024, 1, 19, 23, tzinfo=UTC), time_mode="events")
+
+    assert _traces(filter_log(_sample_log(), filters)) == {"T3": ["B"]}
+
+
+def test_filter_log_activities_and_trace_lengths():
+    log = _sample_log()
+
+    included = filter_log(log, FilterParameters(include_activities=["A", "B"]))
+    excluded = filter_log(log, FilterParameters(exclude_activities=["B"], min_trace_length=2))
+    bounded = filter_log(log, FilterParameters(max_trace_length=2))
+
+    assert _traces(included) == {"T1": ["A", "B"], "T2": ["A"], "T3": ["B"]}
+    assert _traces(excluded) == {"T1": ["A", "C"], "T2": ["A", "C"]}
+    assert _traces(bounded) == {"T2": ["A", "C"], "T3": ["B"]}
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from data_handling.request_parsing import parse_input_body
+
+
+def _body(**fields) -> bytes:
+    return json.dumps({"parameters": {"n_top_variants": 3}, **fields}).encode()
+
+
+def test_parse_input_body_returns_request_and_data():
+    data = {
+        "concept:name": {"1": "A", "2": "B"},
+        "case:concept:name": {"1": "T1", "2": "T1"},
+        "time:timestamp": {"1": "2024-01-01T00:00:00", "2": "2024-01-02T00:00:00"},
+    }
+
+    request, events = parse_input_body(_body(data=data, id="request"))
+
+    assert request.parameters.n_top_variants == 3
+    assert request.id == "request"
+    assert request.data is None
+    assert events is not None
+    assert events["concept:name"].tolist() == ["A", "B"]
+
+
+def test_parse_input_body_without_data():
+    request, events = parse_input_body(_body(dataset_id="abc"))
+
+    assert request.dataset_id == "abc"
+    assert events is None
+
+
+def test_parse_input_body_validates_the_envelope():
+    with pytest.raises(ValidationError):
+        parse_input_body(_body())
+    with pytest.raises(ValidationError):
+        parse_input_body(json.dumps({"dataset_id": "abc", "parameters": {"n_top_variants": "many"}}).encode())
+    with pytest.raises(ValueError):
+        parse_input_body(b"{")
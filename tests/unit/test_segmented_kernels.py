@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_handling import segmented_kernels
+from data_handling.data_transformation import add_states, remove_counts
+from data_handling.segmented_kernels import (
+    case_segments,
+    segment_min_max,
+    segmented_cumsum,
+    segments_sorted,
+)
+
+
+def _random_segments(seed):
+    rng = np.random.default_rng(seed)
+    case_codes = rng.integers(0, 20, size=300)
+    case_codes = np.unique(case_codes, return_inverse=True)[1].astype(np.int64)
+    values = rng.integers(0, 5, size=300).astype(np.int64)
+    return case_codes, values
+
+
+def _add_states_by_grouping(data, state_changing_events):
+    # Implementation of add_states before the segmented kernels, used as reference.
+    data = data.copy()
+    data["counts"] = data[data["concept:name"].isin(state_changing_events)].groupby(
+        ["case:concept:name", "concept:name"]).cumcount() + 1
+    state_frame = pd.get_dummies(data["concept:name"]).mul(data["counts"], axis=0).replace(0, np.nan)
+    state_frame = state_frame.dropna(axis=1, how="all")
+    first_rows = data.groupby('case:concept:name').cumcount().eq(0)
+    state_frame.loc[first_rows] = state_frame.loc[first_rows].fillna(0)
+    state_frame = state_frame.ffill()
+    data["concept:name"] = data["concept:name"].astype(str) + "_" + state_frame.astype(str).to_numpy().sum(axis=1)
+    data["concept:name"] = data["concept:name"].str[:-2]
+    if len(state_changing_events) > 1:
+        last_rows = data.groupby('case:concept:name').cumcount(ascending=False).eq(0)
+        data.loc[last_rows] = remove_counts(data.loc[last_rows])
+    return data[["case:concept:name", "concept:name", "time:timestamp"]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_loop_and_numpy_kernels_agree(seed):
+    case_codes, values = _random_segments(seed)
+    order, offsets = case_segments(case_codes)
+    ordered = values[order]
+
+    for sorted_values in (ordered, np.sort(ordered)):
+        assert (segmented_kernels._segments_sorted_loop(sorted_values, offsets)
+                == segmented_kernels._segments_sorted_numpy(sorted_values, offsets))
+    for loop, vectorized in zip(segmented_kernels._segment_min_max_loop(ordered, offsets),
+                                segmented_kernels._segment_min_max_numpy(ordered, offsets), strict=True):
+        np.testing.assert_array_equal(loop, vectorized)
+    np.testing.assert_array_equal(segmented_kernels._segmented_cumsum_loop(ordered, offsets),
+                                  segmented_kernels._segmented_cumsum_numpy(ordered, offsets))
+
+
+def test_kernels_match_grouping():
+    case_codes, values = _random_segments(7)
+    order, offsets = case_segments(case_codes)
+    grouped = pd.Series(values).groupby(case_codes)
+
+    minima, maxima = segment_min_max(values[order], offsets)
+
+    np.testing.assert_array_equal(minima, grouped.min().to_numpy())
+    np.testing.assert_array_equal(maxima, grouped.max().to_numpy())
+    sums = np.empty(len(values), dtype=np.int64)
+    sums[order] = segmented_cumsum(values[order], offsets)
+    np.testing.assert_array_equal(sums, grouped.cumsum().to_numpy())
+    assert segments_sorted(values[order], offsets) == grouped.apply(lambda group: group.is_monotonic_increasing).all()
+
+
+def test_segments_sorted_ignores_case_boundaries():
+    offsets = np.array([0, 2, 4], dtype=np.int64)
+
+    assert segments_sorted(np.array([5, 6, 1, 2], dtype=np.int64), offsets)
+    assert not segments_sorted(np.array([5, 6, 2, 1], dtype=np.int64), offsets)
+    assert segments_sorted(np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64))
+
+
+def test_kernel_backend_is_selected_by_availability():
+    assert segmented_kernels.kernel_backend() in {"numba", "numpy"}
+
+
+@pytest.mark.parametrize("state_changing_events", [["S"], ["S", "A"], ["S", "A", "missing"]])
+def test_add_states_matches_grouping(state_changing_events):
+    rng = np.random.default_rng(3)
+    n_events = 400
+    case_ids = np.sort(rng.integers(0, 40, size=n_events))
+    df = pd.DataFrame({
+        "case:concept:name": [f"T{case}" for case in case_ids],
+        "concept:name": rng.choice(["A", "B", "S", "X_y"], size=n_events),
+        "time:timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(n_events), unit="h"),
+    })
+
+    expected = _add_states_by_grouping(df, state_changing_events)
+
+    pd.testing.assert_frame_equal(add_states(df, state_changing_events), expected)
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from data_handling.encoded_log import encode_log
+from data_handling.shared_log import attach_log, share_log
+
+
+def test_share_log_round_trip():
+    log = encode_log(pd.DataFrame({
+        "case:concept:name": ["T2", "Ü1", "T2", "Ü1"],
+        "concept:name": ["B", "A", "C", "B"],
+        "time:timestamp": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]),
+    }))
+
+    block, handle = share_log(log)
+    try:
+        attached = attach_log(handle)
+    finally:
+        block.close()
+        block.unlink()
+
+    assert attached.case_ids == log.case_ids
+    assert attached.activities == log.activities
+    assert attached.codes.tolist() == log.codes.tolist()
+    assert attached.timestamps.tolist() == log.timestamps.tolist()
+    assert attached.case_offsets.tolist() == log.case_offsets.tolist()
+    assert attached.case_first_positions.tolist() == log.case_first_positions.tolist()
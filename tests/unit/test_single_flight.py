@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helpers.cancellation import CancellationToken, Cancelled
+from helpers.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_the_same_key_share_one_result():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def calculate():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(single_flight.run, "key", calculate)
+        while single_flight.metrics().in_flight == 0:
+            time.sleep(0.01)
+        followers = [executor.submit(single_flight.run, "key", calculate) for _ in range(2)]
+        while single_flight.metrics().coalesced < 2:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in [leader, *followers]]
+
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    assert len({id(result) for result, _ in results}) == 1
+    metrics = single_flight.metrics()
+    assert (metrics.in_flight, metrics.started, metrics.coalesced) == (0, 1, 2)
+
+
+def test_calls_after_completion_and_with_other_keys_run_again():
+    single_flight = SingleFlight()
+
+    assert single_flight.run("a", lambda: 1) == (1, False)
+    assert single_flight.run("a", lambda: 2) == (2, False)
+    assert single_flight.run("b", lambda: 3) == (3, False)
+    assert single_flight.metrics().started == 3
+
+
+def test_exceptions_are_raised_for_every_caller():
+    single_flight = SingleFlight()
+
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        single_flight.run("key", fail)
+    assert single_flight.metrics().in_flight == 0
+
+
+def test_cancelled_callers_stop_waiting_for_a_shared_call():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    token = CancellationToken()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(single_flight.run, "key", lambda: release.wait(5))
+        while single_flight.metrics().in_flight == 0:
+            time.sleep(0.01)
+        follower = executor.submit(single_flight.run, "key", lambda: None, token)
+        while single_flight.metrics().coalesced == 0:
+            time.sleep(0.01)
+        token.cancel()
+
+        with pytest.raises(Cancelled, match="disconnected"):
+            follower.result(timeout=2)
+        assert not leader.done()
+        release.set()
+        assert leader.result() == (True, False)
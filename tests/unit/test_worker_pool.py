@@ -0,0 +1,51 @@
+import os
+
+from helpers.worker_pool import WorkerPool
+
+
+def _square(value: int) -> tuple[int, int]:
+    return os.getpid(), value * value
+
+
+def test_worker_pool_runs_jobs_in_other_processes_and_recycles_workers():
+    pool = WorkerPool(n_workers=1, max_jobs_per_worker=2)
+    try:
+        results = [pool.run(_square, value) for value in range(4)]
+        metrics = pool.metrics()
+    finally:
+        pool.shutdown()
+
+    assert [square for _, square in results] == [0, 1, 4, 9]
+    pids = [pid for pid, _ in results]
+    assert os.getpid() not in pids
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+    assert metrics.completed == 4
+    assert metrics.running == 0
+    assert metrics.workers == []
+
+
+def test_worker_pool_reports_utilization_per_worker():
+    pool = WorkerPool(n_workers=1, max_jobs_per_worker=10)
+    try:
+        pool.start()
+        pool.run(_square, 3)
+        metrics = pool.metrics()
+    finally:
+        pool.shutdown()
+
+    assert len(metrics.workers) == 1
+    assert metrics.workers[0].jobs == 2
+    assert 0 <= metrics.workers[0].utilization <= 1
+
+
+def test_worker_pool_start_runs_one_start_job_in_each_worker():
+    pool = WorkerPool(n_workers=3, max_jobs_per_worker=10)
+    try:
+        pool.start()
+        metrics = pool.metrics()
+    finally:
+        pool.shutdown()
+
+    assert metrics.completed == 3
+    assert [worker.jobs for worker in metrics.workers] == [1, 1, 1]
+    assert all(worker.busy_seconds == 0 for worker in metrics.workers)